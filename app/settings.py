@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'modules.channel',
     'modules.customer',
@@ -33,6 +34,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'modules.base.middleware.ServerTimingMiddleware',
+    'modules.base.middleware.RepeatedQueryMiddleware',
+    'modules.base.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,10 +77,77 @@ DATABASES = {
         'PORT': env('DATABASE_PORT'),
         'OPTIONS': {
             'connect_timeout': 10,
-        }
+        },
+        # Persistent connections, used when the pool is off. Pooling requires CONN_MAX_AGE = 0.
+        'CONN_MAX_AGE': 0 if env.bool('DATABASE_POOL', default=False) else env.int('DATABASE_CONN_MAX_AGE', default=0),
+        'CONN_HEALTH_CHECKS': env.bool('DATABASE_CONN_HEALTH_CHECKS', default=True),
+    }
+}
+
+# With the pool, CONN_HEALTH_CHECKS makes it check each connection on checkout, so one
+# dropped by the server is replaced instead of handed out.
+if env.bool('DATABASE_POOL', default=False):
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+        # Seconds a connection may stay idle above min_size, and may live at all, before it is closed.
+        'max_idle': env.float('DATABASE_POOL_MAX_IDLE', default=300),
+        'max_lifetime': env.float('DATABASE_POOL_MAX_LIFETIME', default=3600),
+        # Seconds a request waits for a free connection before failing.
+        'timeout': env.float('DATABASE_POOL_TIMEOUT', default=10),
     }
+
+# Read replica for catalog and reporting reads. Any field left unset is taken from the primary,
+# so pointing DATABASE_REPLICA_HOST at the primary itself exercises the routing locally.
+if env('DATABASE_REPLICA_HOST', default=None):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': env('DATABASE_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': env('DATABASE_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': env('DATABASE_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': env('DATABASE_REPLICA_HOST'),
+        'PORT': env('DATABASE_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['modules.base.routers.ReplicaRouter']
+
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+# Seconds a client keeps reading from the primary after a write.
+REPLICA_LAG = env.float('DATABASE_REPLICA_LAG', default=2)
+# App labels or app.model labels read from the replica.
+REPLICA_MODELS = env.list(
+    'DATABASE_REPLICA_MODELS',
+    default=['product', 'channel', 'store', 'order.salesdailyrollup', 'order.skusalesdailyrollup'],
+)
+
+# Cache. Invalidation (menu snapshots, catalog versions, the in-process registries below)
+# goes through the default cache, so any deployment with more than one process, or that
+# runs catalog commands next to the web workers, needs a shared CACHE_URL (redis or
+# memcached); with locmem every process only sees its own invalidations.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
 }
 
+STORE_REGISTRY_CHECK_INTERVAL = env.float('STORE_REGISTRY_CHECK_INTERVAL', default=5.0)
+CHANNEL_LOCATOR_CHECK_INTERVAL = env.float('CHANNEL_LOCATOR_CHECK_INTERVAL', default=5.0)
+DELIVERY_ZONES_CHECK_INTERVAL = env.float('DELIVERY_ZONES_CHECK_INTERVAL', default=5.0)
+# Grid cell of the delivery zone index, in degrees (0.01 is about 1 km).
+DELIVERY_ZONE_CELL_SIZE = env.float('DELIVERY_ZONE_CELL_SIZE', default=0.01)
+
+# Serve the home, channel and product views with their async versions (run under ASGI).
+# Needs DATABASE_CONN_MAX_AGE above 0 or DATABASE_POOL, see modules/channel/checks.py.
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+MENU_SNAPSHOT_CACHE = env('MENU_SNAPSHOT_CACHE', default='default')
+# Snapshots are rebuilt on every catalog change; the timeout bounds how long a process that
+# missed an invalidation (see Cache above) serves an old menu.
+MENU_SNAPSHOT_TIMEOUT = env.int('MENU_SNAPSHOT_TIMEOUT', default=300)
+
+# Template fragments of the channel page; keys carry the catalog version, so the timeout only bounds memory.
+FRAGMENT_CACHE = env('FRAGMENT_CACHE', default='default')
+FRAGMENT_CACHE_TIMEOUT = env.int('FRAGMENT_CACHE_TIMEOUT', default=3600)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,4 +183,41 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+RENDITION_WORKERS = env.int('RENDITION_WORKERS', default=2)
+
+# Orders
+ORDER_INGESTION_TOKEN = env('ORDER_INGESTION_TOKEN', default=None)
+ORDER_INGESTION_MAX_ORDERS = env.int('ORDER_INGESTION_MAX_ORDERS', default=500)
+ORDER_RETENTION_MONTHS = env.int('ORDER_RETENTION_MONTHS', default=24)
+ORDER_ARCHIVE_DIR = env('ORDER_ARCHIVE_DIR', default=str(BASE_DIR / 'archives' / 'orders'))
+
+# Request timing
+REQUEST_TIMING_ENABLED = env.bool('REQUEST_TIMING_ENABLED', default=True)
+# The Server-Timing header shows database timings and query counts to every client.
+REQUEST_TIMING_HEADER = env.bool('REQUEST_TIMING_HEADER', default=False)
+REQUEST_TIMING_LOG_SAMPLE_RATE = env.float('REQUEST_TIMING_LOG_SAMPLE_RATE', default=0.01)
+REQUEST_TIMING_SLOW_MS = env.float('REQUEST_TIMING_SLOW_MS', default=500)
+REQUEST_TIMING_SLOW_QUERIES = env.int('REQUEST_TIMING_SLOW_QUERIES', default=5)
+
+# Repeated (N+1) query detection: off, log or raise
+QUERY_REPEAT_DETECTION = env('QUERY_REPEAT_DETECTION', default='off')
+QUERY_REPEAT_THRESHOLD = env.int('QUERY_REPEAT_THRESHOLD', default=5)
+QUERY_REPEAT_LOG_SAMPLE_RATE = env.float('QUERY_REPEAT_LOG_SAMPLE_RATE', default=0.05)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'modules': {
+            'handlers': ['console'],
+            'level': env('LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -21,6 +21,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('orders/', include('modules.order.urls', namespace='order')),
     path('', include('modules.channel.urls', namespace='channel')),
 ]
 
@@ -0,0 +1,25 @@
+import time
+
+from django.core.cache import cache
+
+
+def _initial_version() -> int:
+    # Seeded from the clock so an evicted key never rewinds to a version a worker has already seen.
+    return int(time.time() * 1000)
+
+
+def get_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key: str) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Callable, Iterable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Model, prefetch_related_objects
+
+
+def _run(func: Callable[[], Any]) -> Any:
+    try:
+        return func()
+    finally:
+        # Each worker thread has its own connection; release it as the request cycle would,
+        # which keeps it open with CONN_MAX_AGE or hands it back to the pool (see channel.E001).
+        close_old_connections()
+
+
+async def run_concurrently(*funcs: Callable[[], Any]) -> list:
+    """
+    Runs blocking ORM callables at the same time, each in a worker thread with its
+    own database connection, and returns their results in order. The async ORM
+    runs every query of a request on one thread, so it cannot overlap them.
+    """
+    return await asyncio.gather(*(sync_to_async(_run, thread_sensitive=False)(func) for func in funcs))
+
+
+async def aprefetch_concurrently(objects: Iterable[Model], groups: Iterable[list]) -> None:
+    """
+    Runs each group of prefetch lookups on `objects` concurrently. Lookups that
+    depend on each other (e.g. "additives" and "additives__additive__info") must share a group.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    for obj in objects:
+        # Set up front so concurrent prefetches do not each replace the other's cache dict.
+        obj.__dict__.setdefault('_prefetched_objects_cache', {})
+    await run_concurrently(*(
+        lambda group=group: prefetch_related_objects(objects, *group) for group in groups
+    ))
@@ -1,17 +1,65 @@
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
-from django.db.models import Model
+from django.db.models import Model, OuterRef, Prefetch, Subquery, prefetch_related_objects
 from django.utils.translation import get_language
 
 from modules.store.models import Store
 
 
+def get_info_cache_attr(related_name: str, store_code: str) -> str:
+    return f'_{related_name}_{store_code}_cache'
+
+
 def get_field_from_info(obj: Model, related_name: str, field_name: str, store_code: str = None) -> Optional[Any]:
-    current_language = get_language()
-    store = Store.get_by_code_or_default(store_code or current_language)
+    store_code = store_code or get_language()
+
+    cache_attr = get_info_cache_attr(related_name, store_code)
+    if cache_attr in obj.__dict__:
+        related_objs = obj.__dict__[cache_attr]
+        related_obj = related_objs[0] if related_objs else None
+    else:
+        store = Store.get_by_code_or_default(store_code)
+        related_obj = getattr(obj, related_name).filter(store=store).first()
 
-    related_obj = getattr(obj, related_name).filter(store=store).first()
     if not related_obj:
         return None
 
     return getattr(related_obj, field_name, None)
+
+
+def info_prefetch(lookup: str, info_model: type[Model], store_code: str = None) -> Prefetch:
+    """
+    Loads the info rows of the active store for every object reached by `lookup`
+    in one query; `get_field_from_info` then reads them from memory.
+    """
+    store_code = store_code or get_language()
+    store = Store.get_by_code_or_default(store_code)
+    related_name = lookup.rsplit('__', 1)[-1]
+
+    return Prefetch(
+        lookup,
+        queryset=info_model.objects.filter(store=store),
+        to_attr=get_info_cache_attr(related_name, store_code),
+    )
+
+
+def prefetch_info(objects: Iterable[Model], *lookups: tuple[str, type[Model]], store_code: str = None) -> list:
+    objects = list(objects)
+    prefetch_related_objects(
+        objects,
+        *[info_prefetch(lookup, info_model, store_code) for lookup, info_model in lookups],
+    )
+    return objects
+
+
+def info_subquery(
+    info_model: type[Model],
+    related_field: str,
+    field_name: str = 'name',
+    store_code: str = None,
+    outer_ref: str = 'pk',
+) -> Subquery:
+    store = Store.get_by_code_or_default(store_code or get_language())
+    return Subquery(
+        info_model.objects.filter(**{related_field: OuterRef(outer_ref)}, store=store).values(field_name)[:1]
+    )
@@ -0,0 +1,157 @@
+import heapq
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Optional
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_VALUES = re.compile(r'\bVALUES\s*(?:\([^()]*\)\s*,?\s*)+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    Normalizes a query so that queries differing only in their parameters,
+    IN list lengths or number of inserted rows share one fingerprint.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES.sub('VALUES (...) ', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+active_wrappers: ContextVar[tuple[Callable, ...]] = ContextVar('active_wrappers', default=())
+current_metrics: ContextVar[Optional['RequestMetrics']] = ContextVar('current_metrics', default=None)
+
+
+def _dispatch(execute, sql, params, many, context):
+    for wrapper in reversed(active_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_dispatch(connection, **kwargs) -> None:
+    # Inserted first: connection.execute_wrapper() removes its wrapper with pop().
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _dispatch)
+
+
+def install_dispatch(**kwargs) -> None:
+    for alias in connections:
+        _install_dispatch(connections[alias])
+
+
+# request_started runs in the thread that serves the sync parts of the request,
+# which under ASGI is not the thread the middleware runs in.
+connection_created.connect(_install_dispatch, dispatch_uid='modules.base.instrumentation')
+request_started.connect(install_dispatch, dispatch_uid='modules.base.instrumentation')
+
+
+@contextmanager
+def wrap_queries(*wrappers: Callable):
+    """
+    Runs every query of the current context through `wrappers` (execute_wrapper
+    callables), on every alias and in the threads that sync_to_async starts from
+    this context, which connection.execute_wrapper() alone does not cover.
+    """
+    install_dispatch()
+    token = active_wrappers.set(active_wrappers.get() + wrappers)
+    try:
+        yield
+    finally:
+        active_wrappers.reset(token)
+
+
+@dataclass
+class RequestMetrics:
+    """
+    Timings of one request, in seconds. Every query text is kept when
+    `keep_queries` is set, otherwise only the `keep_slowest` slowest ones (a
+    heap), so unsampled requests pay for two clock reads per query and a bounded list.
+    """
+    keep_queries: bool = False
+    keep_slowest: int = 0
+    sampled: bool = False
+    query_count: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    queries: list[tuple[float, str]] = field(default_factory=list)
+    _template_depth: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            # Queries may come from several threads at once (see run_concurrently).
+            with self._lock:
+                self.query_count += 1
+                self.db_time += duration
+                if self.keep_queries:
+                    self.queries.append((duration, sql))
+                elif len(self.queries) < self.keep_slowest:
+                    heapq.heappush(self.queries, (duration, sql))
+                elif self.keep_slowest and duration > self.queries[0][0]:
+                    heapq.heapreplace(self.queries, (duration, sql))
+
+    @contextmanager
+    def activate(self):
+        token = current_metrics.set(self)
+        try:
+            with wrap_queries(self):
+                yield self
+        finally:
+            current_metrics.reset(token)
+
+    def slowest_queries(self, limit: int) -> list[dict]:
+        totals = {}
+        for duration, sql in self.queries:
+            fingerprint = fingerprint_sql(sql)
+            count, total, slowest = totals.get(fingerprint, (0, 0.0, 0.0))
+            totals[fingerprint] = (count + 1, total + duration, max(slowest, duration))
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'fingerprint': fingerprint, 'count': count, 'total_ms': round(total * 1000, 3), 'max_ms': round(slowest * 1000, 3)}
+            for fingerprint, (count, total, slowest) in ranked
+        ]
+
+
+_original_render = Template.render
+
+
+def _timed_render(self, context=None, request=None):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return _original_render(self, context, request)
+
+    # Templates rendered from inside another template are already counted by the outer one.
+    metrics._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        metrics._template_depth -= 1
+        if not metrics._template_depth:
+            metrics.template_time += time.perf_counter() - started
+
+
+def install_template_timing() -> None:
+    """
+    Times every render of a Django template; a no-op outside an instrumented request.
+    """
+    Template.render = _timed_render
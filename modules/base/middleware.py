@@ -0,0 +1,170 @@
+import json
+import logging
+import math
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import RequestMetrics, install_template_timing, wrap_queries
+from .repeated_queries import RepeatedQueriesError, RepeatedQueryDetector
+from .routers import PinState, pin_state
+
+timing_logger = logging.getLogger('modules.timing')
+queries_logger = logging.getLogger('modules.queries')
+
+
+class _SyncAndAsyncMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class ServerTimingMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Measures query count, database time, template render time and the time
+    spent in the view (with the middleware below this one) for every request,
+    adds them to a Server-Timing header and logs a sample of the requests,
+    plus every slow one, with the fingerprints of their slowest queries.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = settings.REQUEST_TIMING_LOG_SAMPLE_RATE
+        self.slow_seconds = settings.REQUEST_TIMING_SLOW_MS / 1000
+        install_template_timing()
+
+    def get_metrics(self) -> RequestMetrics:
+        sampled = random.random() < self.sample_rate
+        # Slow requests are logged even when unsampled, with the slowest of their queries.
+        keep_slowest = settings.REQUEST_TIMING_SLOW_QUERIES if self.slow_seconds > 0 else 0
+        return RequestMetrics(keep_queries=sampled, keep_slowest=keep_slowest, sampled=sampled)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self.get_metrics()
+        started = time.perf_counter()
+        with metrics.activate():
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = self.get_metrics()
+        started = time.perf_counter()
+        with metrics.activate():
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics: RequestMetrics, view_time: float):
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.query_count} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.2f}',
+                f'view;dur={view_time * 1000:.2f}',
+            ])
+
+        slow = self.slow_seconds > 0 and view_time >= self.slow_seconds
+        if metrics.sampled or slow:
+            timing_logger.info(json.dumps({
+                'event': 'request_timing',
+                'method': request.method,
+                'path': request.path,
+                'view': getattr(request.resolver_match, 'view_name', None),
+                'status': response.status_code,
+                'slow': slow,
+                'view_ms': round(view_time * 1000, 3),
+                'db_ms': round(metrics.db_time * 1000, 3),
+                'template_ms': round(metrics.template_time * 1000, 3),
+                'queries': metrics.query_count,
+                'slowest_queries': metrics.slowest_queries(settings.REQUEST_TIMING_SLOW_QUERIES),
+            }))
+        return response
+
+
+class RepeatedQueryMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Opt-in N+1 detection. QUERY_REPEAT_DETECTION = "log" logs a sampled share of
+    the requests that repeat a query QUERY_REPEAT_THRESHOLD times or more, with
+    the code and template line issuing it; "raise" fails those requests instead,
+    for development and test runs.
+    """
+
+    def __init__(self, get_response):
+        self.mode = settings.QUERY_REPEAT_DETECTION
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = 1.0 if self.mode == 'raise' else settings.QUERY_REPEAT_LOG_SAMPLE_RATE
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        detector = RepeatedQueryDetector(settings.QUERY_REPEAT_THRESHOLD)
+        with wrap_queries(detector):
+            response = self.get_response(request)
+        return self.finish(request, response, detector)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        detector = RepeatedQueryDetector(settings.QUERY_REPEAT_THRESHOLD)
+        with wrap_queries(detector):
+            response = await self.get_response(request)
+        return self.finish(request, response, detector)
+
+    def finish(self, request, response, detector: RepeatedQueryDetector):
+        repeated = detector.repeated
+        if repeated and self.mode == 'raise':
+            raise RepeatedQueriesError(repeated)
+        if repeated:
+            queries_logger.warning(json.dumps({
+                'event': 'repeated_queries',
+                'method': request.method,
+                'path': request.path,
+                'view': getattr(request.resolver_match, 'view_name', None),
+                'queries': [query.as_dict() for query in repeated],
+            }))
+        return response
+
+
+class ReplicaPinningMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Keeps a client on the primary database for REPLICA_LAG seconds after any
+    request of theirs wrote, so they read their own writes, using a cookie.
+    """
+    cookie_name = 'db_primary_pin'
+
+    def __init__(self, get_response):
+        if settings.REPLICA_DATABASE is None:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with pin_state(PinState(pinned=self.cookie_name in request.COOKIES)) as state:
+            response = self.get_response(request)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        with pin_state(PinState(pinned=self.cookie_name in request.COOKIES)) as state:
+            response = await self.get_response(request)
+        return self.finish(response, state)
+
+    def finish(self, response, state: PinState):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, '1', max_age=math.ceil(settings.REPLICA_LAG), httponly=True, samesite='Lax'
+            )
+        return response
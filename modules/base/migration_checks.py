@@ -0,0 +1,43 @@
+from django.db import IntegrityError
+from django.db.models import Count
+
+# Duplicated values listed per field set before the message is cut short.
+MAX_LISTED = 20
+
+
+def require_unique(app_label: str, unique: dict[str, list[tuple[str, ...]]]):
+    """
+    RunPython code for a migration about to make fields unique, given as
+    {model name: [field names, ...]}. Stops the migration with every duplicated
+    value listed, instead of a bare IntegrityError from the first constraint, so
+    they can be merged or renamed first.
+    """
+
+    def check(apps, schema_editor):
+        problems = []
+        for model_name, field_sets in unique.items():
+            for fields in field_sets:
+                problems += _find_duplicates(apps.get_model(app_label, model_name), fields)
+
+        if problems:
+            raise IntegrityError(
+                'Duplicated values have to be merged or renamed before migrating:\n' + '\n'.join(problems)
+            )
+
+    return check
+
+
+def _find_duplicates(model, fields: tuple[str, ...]) -> list[str]:
+    duplicates = (
+        model.objects.values(*fields).order_by(*fields)
+        .annotate(rows=Count('pk')).filter(rows__gt=1)
+    )
+    total = duplicates.count()
+    if not total:
+        return []
+    listed = [
+        f'{"/".join(str(row[name]) for name in fields)} ({row["rows"]} rows)'
+        for row in duplicates[:MAX_LISTED]
+    ]
+    more = f' and {total - MAX_LISTED} more' if total > MAX_LISTED else ''
+    return [f'{model._meta.db_table} ({", ".join(fields)}): {", ".join(listed)}{more}']
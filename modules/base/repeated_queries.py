@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+from django.template.base import TokenType
+
+from . import instrumentation
+from .instrumentation import fingerprint_sql, wrap_queries
+
+_DJANGO_TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+_OWN_FILES = {__file__, instrumentation.__file__}
+
+
+@dataclass
+class RepeatedQuery:
+    fingerprint: str
+    count: int
+    call_site: list[str]
+    template: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            'fingerprint': self.fingerprint,
+            'count': self.count,
+            'call_site': self.call_site,
+            'template': self.template,
+        }
+
+    def __str__(self):
+        lines = [f'{self.count} x {self.fingerprint}']
+        if self.template:
+            lines.append(f'  template: {self.template}')
+        lines += [f'  at {frame}' for frame in self.call_site]
+        return '\n'.join(lines)
+
+
+class RepeatedQueriesError(AssertionError):
+    def __init__(self, repeated: list[RepeatedQuery]):
+        super().__init__('Repeated queries detected:\n' + '\n'.join(str(query) for query in repeated))
+        self.repeated = repeated
+
+
+def _is_project_file(filename: str) -> bool:
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and filename not in _OWN_FILES
+    )
+
+
+def _call_site(depth: int) -> tuple[list[str], Optional[str]]:
+    """
+    Returns the innermost `depth` frames of project code issuing the current
+    query, and the template line being rendered when the query came from a template.
+    """
+    frames, template = [], None
+    frame = sys._getframe(2)
+    while frame is not None and (len(frames) < depth or template is None):
+        filename = frame.f_code.co_filename
+        if template is None and filename.endswith(_DJANGO_TEMPLATE_BASE) and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                tag = f'{{{{ {token.contents} }}}}' if token.token_type == TokenType.VAR else f'{{% {token.contents} %}}'
+                template = f'{origin.template_name or origin.name}:{token.lineno} {tag}'
+        elif len(frames) < depth and _is_project_file(filename):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            frames.append(f'{path}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames, template
+
+
+@dataclass
+class RepeatedQueryDetector:
+    """
+    Connection execute_wrapper counting queries by fingerprint. The call site is
+    captured only when a fingerprint reaches `threshold`, so the cost below it is
+    one fingerprint per query.
+    """
+    threshold: int
+    depth: int = 4
+    counts: Counter = field(default_factory=Counter)
+    sites: dict[str, tuple[list[str], Optional[str]]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __call__(self, execute, sql, params, many, context):
+        fingerprint = fingerprint_sql(sql)
+        with self._lock:
+            self.counts[fingerprint] += 1
+            reached = self.counts[fingerprint] == self.threshold
+        if reached:
+            self.sites[fingerprint] = _call_site(self.depth)
+        return execute(sql, params, many, context)
+
+    @property
+    def repeated(self) -> list[RepeatedQuery]:
+        return sorted(
+            (RepeatedQuery(fingerprint, self.counts[fingerprint], *site) for fingerprint, site in self.sites.items()),
+            key=lambda query: query.count,
+            reverse=True,
+        )
+
+
+@contextmanager
+def detect_repeated_queries(threshold: int = None, raise_error: bool = True):
+    """
+    Test helper: fails with RepeatedQueriesError when any query fingerprint runs
+    `threshold` times or more inside the block.
+
+        with detect_repeated_queries(threshold=3):
+            client.get(url)
+    """
+    detector = RepeatedQueryDetector(threshold or settings.QUERY_REPEAT_THRESHOLD)
+    with wrap_queries(detector):
+        yield detector
+    if raise_error and detector.repeated:
+        raise RepeatedQueriesError(detector.repeated)
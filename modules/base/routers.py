@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class PinState:
+    # Set when the client wrote within the replica lag (see ReplicaPinningMiddleware).
+    pinned: bool = False
+    wrote: bool = False
+
+
+# A fresh state is set for every request. Outside requests (commands, workers)
+# the default state lives as long as the thread, so a write pins it for good.
+_state: ContextVar[Optional[PinState]] = ContextVar('replica_pin_state', default=None)
+
+
+def get_pin_state() -> PinState:
+    state = _state.get()
+    if state is None:
+        state = PinState()
+        _state.set(state)
+    return state
+
+
+@contextmanager
+def pin_state(state: PinState):
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def read_from_primary():
+    """
+    Sends every read inside the block to the primary, e.g. to load data that is
+    cached until the next invalidation and must not come from a lagging replica.
+    """
+    return pin_state(PinState(pinned=True))
+
+
+def _is_replicated(model) -> bool:
+    labels = settings.REPLICA_MODELS
+    return model._meta.app_label in labels or model._meta.label_lower in labels
+
+
+class ReplicaRouter:
+    """
+    Reads catalog and reporting models (REPLICA_MODELS) from the replica, unless
+    the request or thread has written, the client wrote less than REPLICA_LAG
+    seconds ago, or a transaction is open on the primary. Writes go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = get_pin_state()
+        if (
+            settings.REPLICA_DATABASE is None
+            or state.pinned
+            or state.wrote
+            or not _is_replicated(model)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return settings.REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints):
+        get_pin_state().wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.REPLICA_DATABASE:
+            return False
+        return None
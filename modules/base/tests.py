@@ -0,0 +1,236 @@
+import json
+import math
+import os
+from itertools import chain
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from modules.channel.choices import ChannelStatus
+from modules.channel.models import Channel
+from modules.product.models import Category, CategoryInfo, Product, ProductInfo
+from modules.store.models import Store
+from modules.store.registry import store_registry
+from .forms import get_field_from_info, prefetch_info
+from .instrumentation import RequestMetrics, wrap_queries
+from .middleware import RepeatedQueryMiddleware, ReplicaPinningMiddleware
+from .repeated_queries import RepeatedQueriesError, detect_repeated_queries
+from .routers import PinState, pin_state, read_from_primary
+
+REPLICA = 'replica'
+
+# Without DATABASE_REPLICA_HOST, the alias app/settings.py would add, pointed at
+# the primary. It is added on import so the test runner sets it up as a mirror.
+if REPLICA not in connections.settings:
+    connections.settings[REPLICA] = {**connections.settings['default'], 'TEST': {'MIRROR': 'default'}}
+
+
+@override_settings(DATABASE_ROUTERS=['modules.base.routers.ReplicaRouter'], REPLICA_DATABASE=REPLICA)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The replica alias mirrors the default database in tests, so replica reads
+    see the rows written through the primary.
+    """
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def tearDownClass(cls):
+        # Only the pool of the default alias is closed before the test database is dropped.
+        if connections[REPLICA].vendor == 'postgresql':
+            connections[REPLICA].close_pool()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.aliases = []
+        with pin_state(PinState()):
+            Store.objects.create(code='test', name='Test')
+
+    def record(self, execute, sql, params, many, context):
+        self.aliases.append(context['connection'].alias)
+        return execute(sql, params, many, context)
+
+    def read(self) -> list[str]:
+        # Aliases the read went to; a new connection runs setup queries first.
+        self.aliases.clear()
+        with wrap_queries(self.record):
+            self.assertEqual(list(Store.objects.filter(code='test').values_list('name', flat=True)), ['Test'])
+        return sorted(set(self.aliases))
+
+    def test_reads_go_to_replica(self):
+        with pin_state(PinState()):
+            self.assertEqual(self.read(), [REPLICA])
+
+    def test_write_pins_reads_to_primary(self):
+        with pin_state(PinState()) as state:
+            Store.objects.filter(code='test').update(is_default=False)
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.read(), ['default'])
+
+    def test_read_from_primary(self):
+        with pin_state(PinState()), read_from_primary():
+            self.assertEqual(self.read(), ['default'])
+
+    def test_atomic_block_reads_from_primary(self):
+        with pin_state(PinState()), transaction.atomic():
+            self.assertEqual(self.read(), ['default'])
+
+    def test_middleware_sets_cookie_after_write(self):
+        def get_response(request):
+            Store.objects.create(code='de', name='DE')
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(get_response)(RequestFactory().post('/'))
+        cookie = response.cookies[ReplicaPinningMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], math.ceil(settings.REPLICA_LAG))
+
+    def test_middleware_without_write_sets_no_cookie(self):
+        def get_response(request):
+            self.assertEqual(self.read(), [REPLICA])
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(get_response)(RequestFactory().get('/'))
+        self.assertNotIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+    def test_middleware_cookie_pins_reads_to_primary(self):
+        def get_response(request):
+            self.assertEqual(self.read(), ['default'])
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES[ReplicaPinningMiddleware.cookie_name] = '1'
+        response = ReplicaPinningMiddleware(get_response)(request)
+        self.assertNotIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+
+class RequestMetricsTests(SimpleTestCase):
+
+    def run_queries(self, metrics: RequestMetrics, durations: list[float]) -> None:
+        # Two clock reads per query: started, then finished `duration` later.
+        clock = list(chain.from_iterable((0.0, duration) for duration in durations))
+        with mock.patch('modules.base.instrumentation.time.perf_counter', side_effect=clock):
+            for index in range(len(durations)):
+                metrics(lambda *args: None, f'SELECT {index}', None, False, {})
+
+    def test_unsampled_request_keeps_slowest_queries(self):
+        metrics = RequestMetrics(keep_slowest=2)
+        self.run_queries(metrics, [0.1, 0.5, 0.3, 0.4, 0.2])
+        self.assertEqual(metrics.query_count, 5)
+        self.assertAlmostEqual(metrics.db_time, 1.5)
+        self.assertEqual(sorted(metrics.queries), [(0.4, 'SELECT 3'), (0.5, 'SELECT 1')])
+
+    def test_sampled_request_keeps_every_query(self):
+        metrics = RequestMetrics(keep_queries=True, keep_slowest=2)
+        self.run_queries(metrics, [0.1, 0.5, 0.3])
+        self.assertEqual(len(metrics.queries), 3)
+
+    def test_no_query_kept(self):
+        metrics = RequestMetrics()
+        self.run_queries(metrics, [0.1, 0.5])
+        self.assertEqual(metrics.queries, [])
+
+
+class RepeatedQueryTests(TransactionTestCase):
+    """
+    A loop reading a relation of each row repeats one query per row unless the
+    relation is prefetched.
+    """
+
+    def setUp(self):
+        for index in range(4):
+            channel = Channel.objects.create(
+                code=f'channel-{index}', name=f'Channel {index}', status=ChannelStatus.online, city='Prague',
+                phone='123', base_language='en', currency='CZK',
+            )
+            channel.delivery_zones.create(name=f'Zone {index}', vertices=b'')
+
+    def list_zones(self, queryset) -> list[str]:
+        return [zone.name for channel in queryset for zone in channel.delivery_zones.all()]
+
+    def test_loop_without_prefetch_raises(self):
+        with self.assertRaises(RepeatedQueriesError) as error:
+            with detect_repeated_queries(threshold=3):
+                self.list_zones(Channel.objects.all())
+        [query] = error.exception.repeated
+        self.assertEqual(query.count, 4)
+        self.assertIn('delivery_zone', query.fingerprint)
+        self.assertTrue(query.call_site[0].startswith(os.path.join('modules', 'base', 'tests.py')))
+
+    def test_prefetched_loop_passes(self):
+        with detect_repeated_queries(threshold=3) as detector:
+            self.assertEqual(len(self.list_zones(Channel.objects.prefetch_related('delivery_zones'))), 4)
+        self.assertEqual(detector.repeated, [])
+
+    def test_template_line_is_reported(self):
+        template = Template('{% for channel in channels %}{{ channel.delivery_zones.first.name }}{% endfor %}')
+        with detect_repeated_queries(threshold=3, raise_error=False) as detector:
+            template.render(Context({'channels': Channel.objects.all()}))
+        [query] = detector.repeated
+        self.assertTrue(query.template.endswith(':1 {{ channel.delivery_zones.first.name }}'))
+
+    def get_response(self, request) -> HttpResponse:
+        return HttpResponse(','.join(self.list_zones(Channel.objects.all())))
+
+    @override_settings(QUERY_REPEAT_DETECTION='raise', QUERY_REPEAT_THRESHOLD=3)
+    def test_middleware_raises(self):
+        with self.assertRaises(RepeatedQueriesError):
+            RepeatedQueryMiddleware(self.get_response)(RequestFactory().get('/'))
+
+    @override_settings(QUERY_REPEAT_DETECTION='log', QUERY_REPEAT_THRESHOLD=3, QUERY_REPEAT_LOG_SAMPLE_RATE=1.0)
+    def test_middleware_logs(self):
+        with self.assertLogs('modules.queries', 'WARNING') as logs:
+            response = RepeatedQueryMiddleware(self.get_response)(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        [record] = logs.records
+        self.assertEqual(json.loads(record.getMessage())['queries'][0]['count'], 4)
+
+
+class InfoTranslationTests(TransactionTestCase):
+    """
+    Names read through get_field_from_info, with and without the info rows prefetched.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        english, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+        polish = Store.objects.create(code='pl', name='PL')
+        self.pasta, self.pizza = Category.objects.create(code='pasta'), Category.objects.create(code='pizza')
+        CategoryInfo.objects.create(category=self.pasta, store=english, name='Pasta')
+        CategoryInfo.objects.create(category=self.pizza, store=english, name='Pizza')
+        CategoryInfo.objects.create(category=self.pizza, store=polish, name='Pizza PL')
+        product = Product.objects.create(sku='margherita', category=self.pizza)
+        ProductInfo.objects.create(product=product, store=polish, name='Margherita PL', description='')
+        # Loads the registry, so the counts below are of info queries only.
+        store_registry.all()
+
+    def names(self, categories: list[Category], store_code: str) -> list:
+        return [get_field_from_info(category, 'info', 'name', store_code) for category in categories]
+
+    def test_prefetched_names_need_no_query(self):
+        categories = prefetch_info(Category.objects.order_by('code'), ('info', CategoryInfo), store_code='pl')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(categories, 'pl'), [None, 'Pizza PL'])
+
+    def test_other_store_falls_back_to_one_query_per_object(self):
+        categories = prefetch_info(Category.objects.order_by('code'), ('info', CategoryInfo), store_code='pl')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.names(categories, 'en'), ['Pasta', 'Pizza'])
+
+    def test_unknown_store_reads_the_default_store(self):
+        self.assertEqual(self.names([self.pasta, self.pizza], 'de'), ['Pasta', 'Pizza'])
+        categories = prefetch_info(Category.objects.order_by('code'), ('info', CategoryInfo), store_code='de')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(categories, 'de'), ['Pasta', 'Pizza'])
+
+    def test_nested_lookup(self):
+        categories = Category.objects.filter(pk=self.pizza.pk)
+        [category] = prefetch_info(categories, ('products__info', ProductInfo), store_code='pl')
+        with self.assertNumQueries(0):
+            [product] = category.products.all()
+            self.assertEqual(get_field_from_info(product, 'info', 'name', 'pl'), 'Margherita PL')
+            self.assertIsNone(get_field_from_info(product, 'info', 'missing', 'pl'))
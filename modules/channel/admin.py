@@ -1,5 +1,41 @@
+from django import forms
 from django.contrib import admin
-from .models import Channel
+from django.core.exceptions import ValidationError
+
+from .geometry import validate_polygon
+from .models import Channel, DeliveryZone
+
+
+class DeliveryZoneForm(forms.ModelForm):
+    polygon = forms.JSONField(help_text='List of [latitude, longitude] vertices.')
+
+    class Meta:
+        model = DeliveryZone
+        fields = ('name', 'priority', 'active')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['polygon'] = [list(point) for point in self.instance.polygon]
+
+    def clean_polygon(self):
+        value = self.cleaned_data['polygon']
+        if not isinstance(value, list) or not all(
+            isinstance(point, list) and len(point) == 2
+            and all(isinstance(coordinate, (int, float)) and not isinstance(coordinate, bool) for coordinate in point)
+            for point in value
+        ):
+            raise ValidationError('Expected a list of [latitude, longitude] pairs.')
+        points = [(float(latitude), float(longitude)) for latitude, longitude in value]
+        validate_polygon(points)
+        self.instance.polygon = points
+        return points
+
+
+class DeliveryZoneInline(admin.TabularInline):
+    model = DeliveryZone
+    form = DeliveryZoneForm
+    extra = 0
 
 
 @admin.register(Channel)
@@ -7,4 +43,4 @@ class ChannelAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'code', 'status', 'created_at')
     search_fields = ('name', 'status', 'created_at')
     list_filter = ('created_at',)
-
+    inlines = (DeliveryZoneInline,)
@@ -0,0 +1,79 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+from django.views.decorators.cache import cache_control
+from django.views.generic import TemplateView
+
+from modules.store.models import Store
+from .models import Channel
+from .payloads import aload_product_detail, build_product_payload, get_product_currency, get_product_validators
+from .snapshots import aget_menu_snapshot
+from .views import get_fragment_context
+
+
+class AsyncHomeView(TemplateView):
+    template_name = "channel/list.html"
+
+    async def get(self, request, *args, **kwargs):
+        channels = [channel async for channel in Channel.objects.filter(active=True)]
+        if len(channels) == 1:
+            return redirect('channel:detail', pk=channels[0].id)
+        return self.render_to_response(self.get_context_data(channels=channels, **kwargs))
+
+
+class AsyncChannelDetailView(TemplateView):
+    template_name = "channel/view.html"
+
+    async def get(self, request, *args, **kwargs):
+        category_id = request.GET.get('category', None)
+        if category_id and not category_id.isdigit():
+            raise Http404
+
+        store = await sync_to_async(Store.get_by_code_or_default)(get_language())
+        snapshot = await aget_menu_snapshot(kwargs.get('pk'), int(category_id) if category_id else None, store)
+        if snapshot is None:
+            raise Http404
+
+        fragment_context = await sync_to_async(get_fragment_context)(snapshot['channel']['id'], store)
+        return self.render_to_response(self.get_context_data(
+            products=snapshot['products'],
+            channel=snapshot['channel'],
+            categories=snapshot['categories'],
+            selected_category=snapshot['selected_category'],
+            **fragment_context,
+            **kwargs,
+        ))
+
+
+@cache_control(no_cache=True)
+async def product_detail(request, pk):
+    store_code = get_language()
+    get_validators = sync_to_async(get_product_validators)
+    if request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since'):
+        # A revalidation usually ends in a 304, so the product is only loaded when it changed.
+        validators = await get_validators(pk, store_code)
+        product = None
+    else:
+        validators, product = await asyncio.gather(get_validators(pk, store_code), aload_product_detail(pk, store_code))
+    if validators is None:
+        raise Http404
+
+    etag, last_modified = quote_etag(validators[0]), validators[1]
+    response = get_conditional_response(request, etag, int(last_modified.timestamp()))
+    if response is None:
+        product = product or await aload_product_detail(pk, store_code)
+        if product is None:
+            raise Http404
+        payload = await sync_to_async(build_product_payload, thread_sensitive=False)(
+            product, get_product_currency(product), store_code
+        )
+        response = JsonResponse(payload)
+
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    return response
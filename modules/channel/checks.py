@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, register
+from django.db import connections
+
+
+@register()
+def check_async_views_connections(app_configs, **kwargs):
+    """
+    The async views run their queries in several worker threads at once, each
+    with its own connection, so without persistent or pooled connections every
+    request would open and close a few.
+    """
+    if not settings.ASYNC_VIEWS:
+        return []
+    errors = []
+    for alias in connections:
+        database = connections.settings[alias]
+        if database['CONN_MAX_AGE'] == 0 and not database['OPTIONS'].get('pool'):
+            errors.append(Error(
+                f'ASYNC_VIEWS needs persistent or pooled connections on database "{alias}".',
+                hint='Set DATABASE_CONN_MAX_AGE above 0 or DATABASE_POOL=True.',
+                id='channel.E001',
+            ))
+    return errors
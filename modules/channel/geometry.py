@@ -0,0 +1,68 @@
+import struct
+from typing import Sequence
+
+from django.core.exceptions import ValidationError
+
+# Polygons are stored in microdegrees, the precision of Channel coordinates.
+SCALE = 1_000_000
+
+Point = tuple[float, float]
+
+
+def encode_polygon(points: Sequence[Point]) -> bytes:
+    """
+    Packs a ring of (latitude, longitude) vertices into 8 bytes per vertex, as
+    little-endian int32 microdegrees. The ring is closed implicitly.
+    """
+    if len(points) > 1 and tuple(points[0]) == tuple(points[-1]):
+        points = points[:-1]
+    values = [round(value * SCALE) for point in points for value in point]
+    return struct.pack(f'<{len(values)}i', *values)
+
+
+def decode_polygon(data: bytes) -> list[Point]:
+    values = struct.unpack(f'<{len(data) // 4}i', data)
+    return [(values[index] / SCALE, values[index + 1] / SCALE) for index in range(0, len(values), 2)]
+
+
+def validate_polygon(points: Sequence[Point]) -> None:
+    if len(set(points)) < 3:
+        raise ValidationError('A zone needs at least 3 distinct vertices.')
+    for latitude, longitude in points:
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError(f'Vertex ({latitude}, {longitude}) is out of range.')
+
+
+def polygon_bounds(points: Sequence[Point]) -> tuple[float, float, float, float]:
+    latitudes = [point[0] for point in points]
+    longitudes = [point[1] for point in points]
+    return min(latitudes), min(longitudes), max(latitudes), max(longitudes)
+
+
+def polygon_area(points: Sequence[Point]) -> float:
+    """
+    Area in square degrees, only meant for comparing zones with each other.
+    """
+    total = 0.0
+    for index, (latitude, longitude) in enumerate(points):
+        next_latitude, next_longitude = points[index - 1]
+        total += longitude * next_latitude - next_longitude * latitude
+    return abs(total) / 2
+
+
+def polygon_contains(points: Sequence[Point], latitude: float, longitude: float) -> bool:
+    """
+    Even-odd ray casting. Polygons are planar in degrees, so a zone must not
+    cross the antimeridian.
+    """
+    inside = False
+    previous_latitude, previous_longitude = points[-1]
+    for current_latitude, current_longitude in points:
+        if (current_latitude > latitude) != (previous_latitude > latitude):
+            crossing = current_longitude + (latitude - current_latitude) * (previous_longitude - current_longitude) / (
+                previous_latitude - current_latitude
+            )
+            if longitude < crossing:
+                inside = not inside
+        previous_latitude, previous_longitude = current_latitude, current_longitude
+    return inside
@@ -0,0 +1,142 @@
+import heapq
+import math
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+from modules.base.cache import bump_version, get_version
+from modules.base.routers import read_from_primary
+from .models import Channel
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+    """
+    Point on the unit sphere. Straight-line distance between these vectors grows
+    with the great-circle distance, and they do not wrap at the antimeridian.
+    """
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    return math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat)
+
+
+def chord_to_km(chord: float) -> float:
+    return 2 * math.asin(min(chord / 2, 1.0)) * EARTH_RADIUS_KM
+
+
+class KDTree:
+    """
+    Static 3-d tree over unit vectors, kept in a flat list: the node of the range
+    [lo, hi) is its middle item, split on axis depth % 3, with its smaller half
+    on the left and its larger half on the right.
+    """
+
+    def __init__(self, items: list[tuple[tuple[float, float, float], object]]):
+        self.items = list(items)
+        self._build(0, len(self.items), 0)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, lo: int, hi: int, depth: int) -> None:
+        if hi - lo < 2:
+            return
+        axis = depth % 3
+        self.items[lo:hi] = sorted(self.items[lo:hi], key=lambda item: item[0][axis])
+        mid = (lo + hi) // 2
+        self._build(lo, mid, depth + 1)
+        self._build(mid + 1, hi, depth + 1)
+
+    def nearest(self, point: tuple[float, float, float], k: int) -> list[tuple[float, object]]:
+        """
+        The k items closest to `point`, as (chord distance, value), closest first.
+        """
+        if k <= 0:
+            return []
+        # Max-heap of the best k so far, as (-squared distance, index).
+        best = []
+        items = self.items
+
+        def search(lo: int, hi: int, depth: int) -> None:
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            node = items[mid][0]
+            distance = (point[0] - node[0]) ** 2 + (point[1] - node[1]) ** 2 + (point[2] - node[2]) ** 2
+            if len(best) < k:
+                heapq.heappush(best, (-distance, mid))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, mid))
+
+            delta = point[depth % 3] - node[depth % 3]
+            if delta < 0:
+                search(lo, mid, depth + 1)
+                if len(best) < k or delta * delta < -best[0][0]:
+                    search(mid + 1, hi, depth + 1)
+            else:
+                search(mid + 1, hi, depth + 1)
+                if len(best) < k or delta * delta < -best[0][0]:
+                    search(lo, mid, depth + 1)
+
+        search(0, len(items), 0)
+        return [(math.sqrt(-distance), items[index][1]) for distance, index in sorted(best, reverse=True)]
+
+
+class ChannelLocator:
+    """
+    K-d tree over the active channels that have coordinates, held in process
+    memory. Reloaded when another process bumps the version, at most every
+    CHANNEL_LOCATOR_CHECK_INTERVAL seconds, which needs a cache shared by the
+    processes (CACHE_URL).
+    """
+    version_key = 'channel:locator:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._tree = KDTree([])
+
+    def _load(self, version: int) -> None:
+        with read_from_primary():
+            channels = list(Channel.objects.filter(active=True).order_by('pk'))
+        self._tree = KDTree([
+            (to_unit_vector(float(channel.latitude), float(channel.longitude)), channel)
+            for channel in channels
+            if channel.latitude is not None and channel.longitude is not None
+        ])
+        self._version = version
+
+    def _ensure_loaded(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < settings.CHANNEL_LOCATOR_CHECK_INTERVAL:
+            return
+
+        version = get_version(self.version_key)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+        self._checked_at = now
+
+    def nearest(
+        self, latitude: float, longitude: float, limit: int = 1, max_distance: Optional[float] = None
+    ) -> list[tuple[Channel, float]]:
+        """
+        Active channels closest to the point, as (channel, distance in km), closest first.
+        """
+        self._ensure_loaded()
+        found = self._tree.nearest(to_unit_vector(latitude, longitude), limit)
+        located = [(channel, chord_to_km(chord)) for chord, channel in found]
+        if max_distance is not None:
+            located = [(channel, distance) for channel, distance in located if distance <= max_distance]
+        return located
+
+    def invalidate(self) -> None:
+        bump_version(self.version_key)
+        self._version = None
+
+
+channel_locator = ChannelLocator()
@@ -0,0 +1,88 @@
+import copy
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from .benchmark_views import percentile
+
+MODES = ('new', 'persistent', 'pool')
+
+
+def get_mode_settings(mode: str, base: dict, options: dict) -> dict:
+    settings_dict = copy.deepcopy(base)
+    settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_MAX_AGE'] = 600 if mode == 'persistent' else 0
+    # With the pool, Django turns this into a check on every checkout.
+    settings_dict['CONN_HEALTH_CHECKS'] = mode != 'new'
+    if mode == 'pool':
+        settings_dict['OPTIONS']['pool'] = {
+            'min_size': options['pool_min_size'],
+            'max_size': options['pool_max_size'],
+        }
+    return settings_dict
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the database connection overhead of a request cycle: request_started, '
+        'one trivial query, request_finished. Compares a new connection per request, '
+        'persistent connections and the connection pool, and reports JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--mode', action='append', choices=MODES, dest='modes')
+        parser.add_argument('--database', default='default', help='Alias whose settings are benchmarked.')
+        parser.add_argument('--pool-min-size', type=int, default=2)
+        parser.add_argument('--pool-max-size', type=int, default=10)
+
+    def run_mode(self, alias: str, requests: int) -> dict:
+        connection = connections[alias]
+        backend_pid = 'SELECT pg_backend_pid()' if connection.vendor == 'postgresql' else 'SELECT 1'
+        durations, backends = [], set()
+        for _ in range(requests):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute(backend_pid)
+                backends.add(cursor.fetchone()[0])
+            request_finished.send(sender=self.__class__)
+            durations.append((time.perf_counter() - started) * 1000)
+
+        durations.sort()
+        return {
+            'requests': requests,
+            'p50_ms': round(percentile(durations, 50), 3),
+            'p95_ms': round(percentile(durations, 95), 3),
+            'p99_ms': round(percentile(durations, 99), 3),
+            'mean_ms': round(statistics.fmean(durations), 3),
+            # Distinct server processes served the requests, i.e. physical connections opened.
+            'server_connections': len(backends) if connection.vendor == 'postgresql' else None,
+        }
+
+    def handle(self, *args, **options):
+        base = connections.settings[options['database']]
+        modes = options['modes'] or list(MODES)
+        if 'pool' in modes and base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError('The pool mode needs the PostgreSQL backend.')
+
+        report = {'database': options['database'], 'modes': {}}
+        for mode in modes:
+            alias = f'benchmark_{mode}'
+            connections.settings[alias] = get_mode_settings(mode, base, options)
+            try:
+                self.run_mode(alias, 1)
+                report['modes'][mode] = self.run_mode(alias, options['requests'])
+            finally:
+                connection = connections[alias]
+                connection.close()
+                if mode == 'pool':
+                    connection.close_pool()
+                del connections[alias]
+                del connections.settings[alias]
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,134 @@
+import json
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from modules.base.instrumentation import RequestMetrics, wrap_queries
+from modules.channel.models import Channel
+from modules.order.models import Order
+from modules.product.choices import ProductStatus
+from modules.product.models import CategoryChannel, Product
+
+
+def percentile(values: list[float], rank: float) -> float:
+    """
+    Nearest-rank percentile of sorted `values`.
+    """
+    index = max(0, min(len(values) - 1, round(rank / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(durations: list[float], query_counts: list[int], statuses: Counter) -> dict:
+    durations = sorted(duration * 1000 for duration in durations)
+    return {
+        'requests': len(durations),
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+        'p99_ms': round(percentile(durations, 99), 3),
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'max_ms': round(durations[-1], 3),
+        'queries': {
+            'min': min(query_counts),
+            'max': max(query_counts),
+            'mean': round(statistics.fmean(query_counts), 2),
+        },
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests the storefront views in-process through the test client and reports '
+        'p50/p95/p99 latency and query counts per endpoint as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per endpoint.')
+        parser.add_argument('--endpoint', action='append', choices=('home', 'channel', 'product'), dest='endpoints')
+        parser.add_argument('--clear-cache', action='store_true', help='Clear every configured cache first.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the report to this file instead of stdout.')
+
+    def get_targets(self, rng: random.Random) -> dict:
+        channels = list(Channel.objects.filter(active=True).values_list('pk', flat=True))
+        if not channels:
+            raise CommandError('No active channel, run seed_data first.')
+        links = list(CategoryChannel.objects.filter(channel__in=channels).values_list('channel_id', 'category_id'))
+        products = list(Product.objects.filter(status=ProductStatus.online).values_list('pk', flat=True)[:10000])
+        if not products:
+            raise CommandError('No online product to request.')
+
+        def channel_url():
+            if links and rng.random() < 0.8:
+                channel_id, category_id = rng.choice(links)
+                return f'{reverse("channel:detail", args=[channel_id])}?category={category_id}'
+            return reverse('channel:detail', args=[rng.choice(channels)])
+
+        return {
+            'home': lambda: reverse('channel:home'),
+            'channel': channel_url,
+            'product': lambda: reverse('channel:product-detail', args=[rng.choice(products)]),
+        }
+
+    def run_endpoint(self, client: Client, url_factory, requests: int, warmup: int) -> dict:
+        for _ in range(warmup):
+            client.get(url_factory())
+
+        durations, query_counts, statuses = [], [], Counter()
+        for _ in range(requests):
+            url = url_factory()
+            # Counts the queries of every alias, including the threads async views hand them to.
+            metrics = RequestMetrics()
+            with wrap_queries(metrics):
+                started = time.perf_counter()
+                response = client.get(url)
+                durations.append(time.perf_counter() - started)
+            query_counts.append(metrics.query_count)
+            statuses[response.status_code] += 1
+        return summarize(durations, query_counts, statuses)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        if options['clear_cache']:
+            for alias in settings.CACHES:
+                caches[alias].clear()
+
+        rng = random.Random(options['seed'])
+        targets = self.get_targets(rng)
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'channels': Channel.objects.count(),
+                'products': Product.objects.count(),
+                'orders': Order.objects.count(),
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+            },
+            'endpoints': {},
+        }
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            client = Client()
+            for name in options['endpoints'] or list(targets):
+                report['endpoints'][name] = self.run_endpoint(
+                    client, targets[name], options['requests'], options['warmup']
+                )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
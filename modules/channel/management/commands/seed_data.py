@@ -0,0 +1,27 @@
+from dataclasses import fields
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.channel.seeding import Seeder, SeedError, SeedOptions
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a synthetic catalog and order history for benchmarking. '
+        'Every object code starts with "seed-<seed>-", so several datasets can coexist.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = SeedOptions()
+        for field in fields(SeedOptions):
+            parser.add_argument(
+                f'--{field.name.replace("_", "-")}', type=int, default=getattr(defaults, field.name),
+                help=f'Default: {getattr(defaults, field.name)}.',
+            )
+
+    def handle(self, *args, **options):
+        seed_options = SeedOptions(**{field.name: options[field.name] for field in fields(SeedOptions)})
+        try:
+            Seeder(seed_options, log=self.stdout.write).run()
+        except SeedError as error:
+            raise CommandError(error)
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+from modules.base.migration_checks import require_unique
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channel', '0003_deliveryzone'),
+    ]
+
+    operations = [
+        migrations.RunPython(require_unique('channel', {'Channel': [('code',)]}), migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='channel',
+            name='code',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
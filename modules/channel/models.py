@@ -2,10 +2,11 @@ from django.core.exceptions import ValidationError
 from django.db import models
 
 from modules.channel.choices import ChannelStatus
+from modules.channel.geometry import decode_polygon, encode_polygon
 
 
 class Channel(models.Model):
-    code = models.CharField(max_length=255)
+    code = models.CharField(max_length=255, unique=True)
     name = models.CharField(max_length=255)
     status = models.CharField(
         max_length=50,
@@ -34,3 +35,30 @@ class Channel(models.Model):
 
     class Meta:
         db_table = "channel"
+
+
+class DeliveryZone(models.Model):
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name='delivery_zones')
+    name = models.CharField(max_length=255)
+    # Ring of (latitude, longitude) vertices, packed by modules.channel.geometry.encode_polygon.
+    vertices = models.BinaryField()
+    # Of several zones holding an address, the lowest priority wins, then the smallest zone.
+    priority = models.IntegerField(default=0)
+    active = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def polygon(self) -> list[tuple[float, float]]:
+        return decode_polygon(bytes(self.vertices))
+
+    @polygon.setter
+    def polygon(self, points: list[tuple[float, float]]) -> None:
+        self.vertices = encode_polygon(points)
+
+    class Meta:
+        db_table = "channel_delivery_zone"
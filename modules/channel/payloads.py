@@ -0,0 +1,148 @@
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Model, OuterRef, Prefetch, Subquery
+from django.db.models.aggregates import Aggregate
+from django.utils.translation import get_language
+
+from modules.base.concurrency import aprefetch_concurrently
+from modules.base.forms import get_field_from_info, info_prefetch
+from modules.channel.models import Channel
+from modules.product.models import (
+    Additive,
+    AdditiveInfo,
+    CategoryChannel,
+    Product,
+    ProductAdditive,
+    ProductInfo,
+    ProductMediaGallery,
+    ProductVariant,
+)
+from modules.product.renditions import get_rendition_urls
+
+
+def product_detail_prefetch_groups(store_code: str = None) -> list[list]:
+    """
+    The prefetches of product_detail_prefetches, grouped so that no group depends
+    on another and the groups can run concurrently.
+    """
+    return [
+        [info_prefetch('info', ProductInfo, store_code)],
+        [Prefetch('variants', queryset=ProductVariant.objects.order_by('pk'))],
+        [Prefetch('media', queryset=ProductMediaGallery.objects.order_by('priority', 'pk'))],
+        [
+            Prefetch('additives', queryset=ProductAdditive.objects.select_related('additive').order_by('pk')),
+            info_prefetch('additives__additive__info', AdditiveInfo, store_code),
+        ],
+    ]
+
+
+def product_detail_prefetches(store_code: str = None) -> list:
+    return [lookup for group in product_detail_prefetch_groups(store_code) for lookup in group]
+
+
+def category_channels_prefetch() -> Prefetch:
+    return Prefetch('category__channels', queryset=CategoryChannel.objects.select_related('channel').order_by('pk'))
+
+
+def build_product_payload(product: Product, currency: str, store_code: str = None) -> dict:
+    return {
+        'sku': product.sku,
+        'name': get_field_from_info(product, 'info', 'name', store_code),
+        'description': get_field_from_info(product, 'info', 'description', store_code),
+        'variants': [
+            {'id': variant.id, 'price': str(variant.price), 'code': variant.code}
+            for variant in product.variants.all()
+        ],
+        'currency': currency,
+        'images': [media.image.url for media in product.media.all()],
+        'image_renditions': [
+            get_rendition_urls(media.image, 'large', media.rendered_image) for media in product.media.all()
+        ],
+        'ingredients': [
+            {
+                'code': link.additive.code,
+                'name': get_field_from_info(link.additive, 'info', 'name', store_code),
+                'price': str(link.additive.price),
+                'image': link.additive.image.url if link.additive.image else None,
+                'thumbnail': get_rendition_urls(link.additive.image, 'thumb', link.additive.rendered_image),
+            }
+            for link in product.additives.all()
+        ],
+    }
+
+
+def product_detail_queryset(store_code: str = None):
+    return Product.objects.select_related('category').prefetch_related(
+        *product_detail_prefetches(store_code),
+        category_channels_prefetch(),
+    )
+
+
+async def aload_product_detail(pk: int, store_code: str = None) -> Optional[Product]:
+    """
+    Async counterpart of product_detail_queryset().get(pk=pk): the product row
+    first, then its variants, media, info, additives and channels concurrently.
+    """
+    product = await Product.objects.select_related('category').filter(pk=pk).afirst()
+    if product is None:
+        return None
+    groups = await sync_to_async(product_detail_prefetch_groups)(store_code)
+    await aprefetch_concurrently([product], [*groups, [category_channels_prefetch()]])
+    return product
+
+
+def get_product_currency(product: Product) -> Optional[str]:
+    links = product.category.channels.all()
+    return links[0].channel.currency if links else None
+
+
+def _related_aggregate(model: type[Model], product_path: str, aggregate: Aggregate, outer: str = 'pk') -> Subquery:
+    return Subquery(
+        model.objects.filter(**{product_path: OuterRef(outer)})
+        .order_by()
+        .values(product_path)
+        .annotate(value=aggregate)
+        .values('value')
+    )
+
+
+def get_product_validators(pk: int, store_code: str = None) -> Optional[tuple[str, datetime]]:
+    """
+    Returns (etag, last_modified) for the product_detail payload of `pk`,
+    computed in one query from the rows the payload is built from.
+    Row counts are part of the ETag so deleted rows change it as well; the
+    rendition worker touches updated_at when the image URLs switch to renditions.
+    """
+    state = Product.objects.filter(pk=pk).annotate(
+        info_updated_at=_related_aggregate(ProductInfo, 'product', Max('updated_at')),
+        info_count=_related_aggregate(ProductInfo, 'product', Count('pk')),
+        variants_updated_at=_related_aggregate(ProductVariant, 'product', Max('updated_at')),
+        variants_count=_related_aggregate(ProductVariant, 'product', Count('pk')),
+        media_updated_at=_related_aggregate(ProductMediaGallery, 'product', Max('updated_at')),
+        media_count=_related_aggregate(ProductMediaGallery, 'product', Count('pk')),
+        additives_updated_at=_related_aggregate(ProductAdditive, 'product', Max('updated_at')),
+        additives_count=_related_aggregate(ProductAdditive, 'product', Count('pk')),
+        additive_updated_at=_related_aggregate(Additive, 'products__product', Max('updated_at')),
+        additive_info_updated_at=_related_aggregate(AdditiveInfo, 'additive__products__product', Max('updated_at')),
+        channels_updated_at=_related_aggregate(CategoryChannel, 'category', Max('updated_at'), 'category_id'),
+        channels_count=_related_aggregate(CategoryChannel, 'category', Count('pk'), 'category_id'),
+        channel_updated_at=_related_aggregate(Channel, 'categories__category', Max('updated_at'), 'category_id'),
+    ).values(
+        'updated_at',
+        'info_updated_at', 'info_count',
+        'variants_updated_at', 'variants_count',
+        'media_updated_at', 'media_count',
+        'additives_updated_at', 'additives_count',
+        'additive_updated_at', 'additive_info_updated_at',
+        'channels_updated_at', 'channels_count',
+        'channel_updated_at',
+    ).first()
+    if not state:
+        return None
+
+    last_modified = max(value for value in state.values() if isinstance(value, datetime))
+    fingerprint = f'{pk}:{store_code or get_language()}:' + ':'.join(str(value) for value in state.values())
+    return hashlib.md5(fingerprint.encode()).hexdigest(), last_modified
@@ -0,0 +1,416 @@
+import math
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from typing import Callable, Iterator
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Model
+from django.utils import timezone
+from PIL import Image
+
+from modules.customer.models import Customer
+from modules.order.choices import OrderAddressType, OrderStatus, OrderType
+from modules.order.models import Order, OrderAddress, OrderItem, OrderItemAdditive, OrderItemVariant, OrderPackage
+from modules.order.rollups import apply_orders
+from modules.product.choices import ProductStatus
+from modules.product.models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    CategoryInfo,
+    Package,
+    PackageInfo,
+    Product,
+    ProductAdditive,
+    ProductInfo,
+    ProductMediaGallery,
+    ProductVariant,
+    ProductVariantInfo,
+)
+from modules.product.pricing import price_tables
+from modules.product.versions import catalog_versions
+from modules.store.models import Store
+from modules.store.registry import store_registry
+from .choices import ChannelStatus
+from .locator import channel_locator
+from .geometry import encode_polygon
+from .models import Channel, DeliveryZone
+from .snapshots import rebuild_snapshots
+from .zones import delivery_zones
+
+CITIES = [
+    ('Warszawa', 52.2297, 21.0122),
+    ('Kraków', 50.0647, 19.9450),
+    ('Wrocław', 51.1079, 17.0385),
+    ('Gdańsk', 54.3520, 18.6466),
+    ('Poznań', 52.4064, 16.9252),
+    ('Łódź', 51.7592, 19.4560),
+]
+
+ORDER_STATUS_WEIGHTS = {
+    OrderStatus.complete: 70,
+    OrderStatus.delivered: 15,
+    OrderStatus.processing: 5,
+    OrderStatus.pending_payment: 3,
+    OrderStatus.canceled: 5,
+    OrderStatus.not_delivered: 2,
+}
+
+
+class SeedError(Exception):
+    pass
+
+
+@dataclass
+class SeedOptions:
+    stores: int = 2
+    channels: int = 3
+    categories: int = 8
+    products_per_category: int = 25
+    variants_per_product: int = 3
+    additives: int = 30
+    additives_per_product: int = 5
+    media_per_product: int = 2
+    customers: int = 1000
+    orders: int = 10000
+    items_per_order: int = 3
+    days: int = 365
+    seed: int = 0
+    batch_size: int = 2000
+
+
+@contextmanager
+def explicit_timestamps(*models: type[Model]):
+    """
+    Lets bulk_create keep the created_at/updated_at values set on the objects,
+    so seeded orders can be spread over the past.
+    """
+    fields = [
+        field for model in models for field in model._meta.fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _placeholder_images(count: int, rng: random.Random) -> list[str]:
+    names = []
+    for index in range(count):
+        name = f'product_images/seed/placeholder-{index}.jpg'
+        if not default_storage.exists(name):
+            buffer = BytesIO()
+            color = tuple(rng.randrange(256) for _ in range(3))
+            Image.new('RGB', (800, 800), color).save(buffer, 'JPEG', quality=80)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def _price(rng: random.Random, low: int, high: int) -> Decimal:
+    return Decimal(rng.randrange(low * 100, high * 100)) / 100
+
+
+def _zone_polygon(latitude: float, longitude: float, radius: float, sides: int = 12) -> list[tuple[float, float]]:
+    # Roughly round on the ground: a degree of longitude shrinks with the latitude.
+    stretch = 1 / math.cos(math.radians(latitude))
+    return [
+        (latitude + radius * math.sin(angle), longitude + radius * stretch * math.cos(angle))
+        for angle in (2 * math.pi * index / sides for index in range(sides))
+    ]
+
+
+class Seeder:
+    """
+    Generates a synthetic catalog and order history with bulk inserts. Codes are
+    prefixed with "seed-" so a dataset can be recognised and seeded on top of.
+    """
+
+    def __init__(self, options: SeedOptions, log: Callable[[str], None] = print):
+        self.options = options
+        self.log = log
+        self.rng = random.Random(options.seed)
+        # Separate, so that address positions leave the rest of a seeded dataset unchanged.
+        self.address_rng = random.Random(options.seed)
+        self.channel_points = {}
+
+    def run(self) -> None:
+        with transaction.atomic():
+            self.seed_catalog()
+        self.refresh_derived_data()
+        self.seed_orders()
+
+    def seed_stores(self) -> list[Store]:
+        codes = [code for code, _ in settings.LANGUAGES]
+        codes += [f'seed-{index}' for index in range(max(0, self.options.stores - len(codes)))]
+        existing = set(Store.objects.values_list('code', flat=True))
+        Store.objects.bulk_create([
+            Store(code=code, name=code.upper(), is_default=False)
+            for code in codes[:self.options.stores] if code not in existing
+        ])
+        stores = list(Store.objects.filter(code__in=codes[:self.options.stores]).order_by('pk'))
+        self.log(f'stores: {len(stores)}')
+        return stores
+
+    def seed_catalog(self) -> None:
+        rng, options = self.rng, self.options
+        prefix = f'seed-{options.seed}'
+        if Category.objects.filter(code__startswith=f'{prefix}-').exists():
+            raise SeedError(f'A dataset with seed {options.seed} already exists, pass another --seed.')
+        stores = self.seed_stores()
+
+        channels = []
+        for index in range(options.channels):
+            city, latitude, longitude = CITIES[index % len(CITIES)]
+            channels.append(Channel(
+                code=f'{prefix}-channel-{index}',
+                name=f'{city} #{index}',
+                status=ChannelStatus.online,
+                city=city,
+                address=f'ul. Testowa {index + 1}',
+                latitude=Decimal(f'{latitude + rng.uniform(-0.1, 0.1):.6f}'),
+                longitude=Decimal(f'{longitude + rng.uniform(-0.1, 0.1):.6f}'),
+                phone=f'+48{rng.randrange(10 ** 8, 10 ** 9)}',
+                base_language=stores[0].code,
+                currency='PLN',
+            ))
+        channels = Channel.objects.bulk_create(channels)
+        DeliveryZone.objects.bulk_create([
+            DeliveryZone(
+                channel=channel, name=f'{channel.name} delivery',
+                vertices=encode_polygon(_zone_polygon(float(channel.latitude), float(channel.longitude), 0.1)),
+            )
+            for channel in channels
+        ])
+        self.log(f'channels: {len(channels)}')
+
+        packages = Package.objects.bulk_create([
+            Package(code=f'{prefix}-package-{index}', price=_price(rng, 0, 3) + Decimal('0.50'))
+            for index in range(3)
+        ])
+        PackageInfo.objects.bulk_create([
+            PackageInfo(package=package, store=store, name=f'Package {index} ({store.code})')
+            for index, package in enumerate(packages) for store in stores
+        ])
+
+        images = _placeholder_images(min(10, max(1, options.media_per_product * 3)), rng)
+        additives = Additive.objects.bulk_create([
+            Additive(code=f'{prefix}-additive-{index}', price=_price(rng, 1, 8), image=rng.choice(images))
+            for index in range(options.additives)
+        ], batch_size=options.batch_size)
+        AdditiveInfo.objects.bulk_create([
+            AdditiveInfo(additive=additive, store=store, name=f'Additive {index} ({store.code})')
+            for index, additive in enumerate(additives) for store in stores
+        ], batch_size=options.batch_size)
+        self.log(f'additives: {len(additives)}')
+
+        categories = Category.objects.bulk_create([
+            Category(code=f'{prefix}-category-{index}') for index in range(options.categories)
+        ])
+        CategoryInfo.objects.bulk_create([
+            CategoryInfo(category=category, store=store, name=f'Category {index} ({store.code})')
+            for index, category in enumerate(categories) for store in stores
+        ], batch_size=options.batch_size)
+        CategoryChannel.objects.bulk_create([
+            CategoryChannel(category=category, channel=channel) for category in categories for channel in channels
+        ], batch_size=options.batch_size)
+        self.log(f'categories: {len(categories)}')
+
+        for category_index, category in enumerate(categories):
+            products = Product.objects.bulk_create([
+                Product(
+                    sku=f'{prefix}-{category_index}-{index}',
+                    category=category,
+                    status=ProductStatus.online if rng.random() < 0.95 else ProductStatus.offline,
+                )
+                for index in range(options.products_per_category)
+            ], batch_size=options.batch_size)
+            ProductInfo.objects.bulk_create([
+                ProductInfo(
+                    product=product, store=store,
+                    name=f'Product {product.sku} ({store.code})',
+                    description=f'Description of {product.sku}.',
+                )
+                for product in products for store in stores
+            ], batch_size=options.batch_size)
+            variants = ProductVariant.objects.bulk_create([
+                ProductVariant(
+                    product=product, code=f'V{index}', package=rng.choice(packages),
+                    price=_price(rng, 10, 30) + index * 5,
+                )
+                for product in products for index in range(options.variants_per_product)
+            ], batch_size=options.batch_size)
+            ProductVariantInfo.objects.bulk_create([
+                ProductVariantInfo(product_variant=variant, store=store, name=f'Size {variant.code}')
+                for variant in variants for store in stores
+            ], batch_size=options.batch_size)
+            ProductMediaGallery.objects.bulk_create([
+                ProductMediaGallery(product=product, image=rng.choice(images), priority=index)
+                for product in products for index in range(options.media_per_product)
+            ], batch_size=options.batch_size)
+            ProductAdditive.objects.bulk_create([
+                ProductAdditive(product=product, additive=additive)
+                for product in products
+                for additive in rng.sample(additives, min(options.additives_per_product, len(additives)))
+            ], batch_size=options.batch_size)
+        self.log(f'products: {options.categories * options.products_per_category}')
+
+    def refresh_derived_data(self) -> None:
+        # bulk_create sends no signals, so everything the signals maintain is refreshed here.
+        batch_size = self.options.batch_size
+        product_ids = list(
+            Product.objects.filter(sku__startswith=f'seed-{self.options.seed}-').values_list('pk', flat=True)
+        )
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            Product.refresh_price_range(chunk)
+            Product.refresh_preview_media(chunk)
+        store_registry.invalidate()
+        channel_locator.invalidate()
+        delivery_zones.invalidate()
+        price_tables.invalidate()
+        rebuild_snapshots(channel_ids=Channel.objects.values_list('pk', flat=True))
+        # Only now, so fragments cached under the new version come from the new snapshots.
+        catalog_versions.bump_all()
+        self.log('price ranges, previews and menu snapshots refreshed')
+
+    def _customers(self) -> list[int]:
+        options = self.options
+        Customer.objects.bulk_create([
+            Customer(
+                first_name=f'First{index}',
+                last_name=f'Last{index}',
+                email=f'seed-{options.seed}-{index}@example.invalid',
+                registered_at=timezone.now() - timedelta(days=self.rng.randrange(options.days + 1)),
+            )
+            for index in range(options.customers)
+        ], batch_size=options.batch_size, ignore_conflicts=True)
+        return list(
+            Customer.objects.filter(email__startswith=f'seed-{options.seed}-').values_list('pk', flat=True)
+        )
+
+    def _order_batches(self, channels: list[int], customers: list[int]) -> Iterator[list]:
+        rng, options = self.rng, self.options
+        variants, additives = {}, {}
+        for channel_id in channels:
+            table = price_tables.get(channel_id)
+            variants[channel_id] = list(table.variants.items())
+            for (sku, _), additive in table.additives.items():
+                additives.setdefault((channel_id, sku), []).append(additive)
+        channels = [channel_id for channel_id in channels if variants[channel_id]]
+
+        statuses, weights = list(ORDER_STATUS_WEIGHTS), list(ORDER_STATUS_WEIGHTS.values())
+        now = timezone.now()
+        batch = []
+        for index in range(options.orders):
+            channel_id = rng.choice(channels)
+            lines = []
+            for (sku, _), price in rng.sample(variants[channel_id], min(options.items_per_order, len(variants[channel_id]))):
+                available = additives.get((channel_id, sku), [])
+                lines.append((sku, rng.randint(1, 3), price, rng.sample(available, min(rng.randint(0, 2), len(available)))))
+            created_at = now - timedelta(seconds=rng.randrange(options.days * 86400))
+            batch.append((index, channel_id, rng.choice(customers), created_at, rng.choices(statuses, weights)[0], lines))
+            if len(batch) == options.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _address_point(self, channel_id: int) -> tuple[Decimal, Decimal]:
+        # Spread around the channel so that some addresses fall outside its delivery zone.
+        latitude, longitude = self.channel_points[channel_id]
+        return (
+            Decimal(f'{latitude + self.address_rng.gauss(0, 0.06):.6f}'),
+            Decimal(f'{longitude + self.address_rng.gauss(0, 0.09):.6f}'),
+        )
+
+    def _write_orders(self, batch: list) -> None:
+        prefix = f'seed-{self.options.seed}-order'
+        orders, addresses, items, variants, additives = [], [], [], [], []
+        for index, channel_id, customer_id, created_at, status, lines in batch:
+            total = sum(
+                (qty * (price.price + price.package_price + sum((a.price for a in chosen), Decimal(0)))
+                 for _, qty, price, chosen in lines),
+                Decimal(0),
+            )
+            order = Order(
+                channel_id=channel_id, customer_id=customer_id, code=f'{prefix}-{index}',
+                first_name='Seed', last_name='Customer', email='seed@example.invalid',
+                status=status, type=OrderType.online, total_amount=total,
+                created_at=created_at, updated_at=created_at,
+            )
+            orders.append((order, lines, self._address_point(channel_id)))
+
+        with explicit_timestamps(Order, OrderAddress, OrderItem, OrderItemVariant, OrderItemAdditive, OrderPackage):
+            Order.objects.bulk_create([order for order, _, _ in orders])
+            for order, lines, (latitude, longitude) in orders:
+                addresses.append(OrderAddress(
+                    order=order, type=OrderAddressType.shipping, first_name='Seed', last_name='Customer',
+                    street='ul. Testowa 1', city='Warszawa', country='PL', postcode='00-001', phone='+48123456789',
+                    latitude=latitude, longitude=longitude, order_created_at=order.created_at,
+                    created_at=order.created_at, updated_at=order.created_at,
+                ))
+                for sku, qty, price, chosen in lines:
+                    item = OrderItem(
+                        order=order, sku=sku, qty=qty, order_created_at=order.created_at,
+                        created_at=order.created_at, updated_at=order.created_at,
+                    )
+                    items.append((item, price, chosen))
+            OrderAddress.objects.bulk_create(addresses)
+            OrderItem.objects.bulk_create([item for item, _, _ in items])
+
+            for item, price, chosen in items:
+                variant = OrderItemVariant(
+                    order_item=item, code=price.code, name=price.name or price.code, price=price.price,
+                    order_created_at=item.order_created_at,
+                    created_at=item.created_at, updated_at=item.created_at,
+                )
+                variants.append((variant, price))
+                additives += [
+                    OrderItemAdditive(
+                        order_item=item, name=additive.name or additive.code, price=additive.price,
+                        order_created_at=item.order_created_at,
+                        created_at=item.created_at, updated_at=item.created_at,
+                    )
+                    for additive in chosen
+                ]
+            OrderItemVariant.objects.bulk_create([variant for variant, _ in variants])
+            OrderItemAdditive.objects.bulk_create(additives)
+            OrderPackage.objects.bulk_create([
+                OrderPackage(
+                    order_item_variant=variant, code=price.package_code,
+                    name=price.package_name or price.package_code, price=price.package_price,
+                    order_created_at=variant.order_created_at,
+                    created_at=variant.created_at, updated_at=variant.created_at,
+                )
+                for variant, price in variants
+            ])
+        apply_orders([order.pk for order, _, _ in orders])
+
+    def seed_orders(self) -> None:
+        if not self.options.orders:
+            return
+        points = Channel.objects.filter(code__startswith=f'seed-{self.options.seed}-').values_list('pk', 'latitude', 'longitude')
+        self.channel_points = {pk: (float(latitude), float(longitude)) for pk, latitude, longitude in points}
+        channels = list(self.channel_points)
+        customers = self._customers()
+        written = 0
+        for batch in self._order_batches(channels, customers):
+            with transaction.atomic():
+                self._write_orders(batch)
+            written += len(batch)
+            if written % (self.options.batch_size * 25) == 0 or written == self.options.orders:
+                self.log(f'orders: {written}/{self.options.orders}')
@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from modules.product.models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    CategoryInfo,
+    Product,
+    ProductAdditive,
+    ProductExcludeChannel,
+    ProductInfo,
+)
+from modules.product.renditions import renditions_ready
+from modules.product.signals import product_refreshed
+from .locator import channel_locator
+from .models import Channel, DeliveryZone
+from .snapshots import delete_snapshots, schedule_rebuild
+from .zones import delivery_zones
+
+
+def _category_channel_ids(category_id: int) -> list[int]:
+    return list(CategoryChannel.objects.filter(category_id=category_id).values_list('channel_id', flat=True))
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    instance._snapshot_category_id = instance.__dict__.get('category_id')
+
+
+@receiver([post_save, post_delete], sender=Product)
+def rebuild_product_category(sender, instance, **kwargs):
+    schedule_rebuild(category_ids={instance.category_id, instance._snapshot_category_id} - {None})
+    instance._snapshot_category_id = instance.category_id
+
+
+@receiver([post_save, post_delete], sender=ProductInfo)
+@receiver([post_save, post_delete], sender=ProductAdditive)
+@receiver([post_save, post_delete], sender=ProductExcludeChannel)
+def rebuild_product(sender, instance, **kwargs):
+    schedule_rebuild(product_ids=[instance.product_id])
+
+
+# Variant and gallery changes arrive once the product app has refreshed the
+# min_price and preview image the cards show: outside a transaction the snapshot
+# is built right away.
+@receiver(product_refreshed, sender=Product)
+def rebuild_refreshed_product(sender, product_ids, **kwargs):
+    schedule_rebuild(product_ids=product_ids)
+
+
+@receiver([post_save, post_delete], sender=Additive)
+@receiver([post_save, post_delete], sender=AdditiveInfo)
+def rebuild_additive_products(sender, instance, **kwargs):
+    additive_id = instance.pk if sender is Additive else instance.additive_id
+    schedule_rebuild(product_ids=ProductAdditive.objects.filter(additive_id=additive_id).values_list('product_id', flat=True))
+
+
+@receiver(renditions_ready, sender=Additive)
+def rebuild_rendered_additive_products(sender, pk, **kwargs):
+    schedule_rebuild(product_ids=ProductAdditive.objects.filter(additive_id=pk).values_list('product_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=CategoryInfo)
+def rebuild_category_channels(sender, instance, **kwargs):
+    category_id = instance.pk if sender is Category else instance.category_id
+    schedule_rebuild(channel_ids=_category_channel_ids(category_id))
+
+
+@receiver(post_save, sender=CategoryChannel)
+def rebuild_linked_channel(sender, instance, **kwargs):
+    schedule_rebuild(channel_ids=[instance.channel_id])
+
+
+@receiver(post_delete, sender=CategoryChannel)
+def rebuild_unlinked_channel(sender, instance, **kwargs):
+    delete_snapshots(instance.channel_id, [instance.category_id])
+    schedule_rebuild(channel_ids=[instance.channel_id])
+
+
+@receiver(post_save, sender=Channel)
+def rebuild_channel(sender, instance, **kwargs):
+    schedule_rebuild(channel_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Channel)
+def delete_channel_snapshots(sender, instance, **kwargs):
+    delete_snapshots(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Channel)
+def invalidate_channel_locator(sender, **kwargs):
+    transaction.on_commit(channel_locator.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Channel)
+@receiver([post_save, post_delete], sender=DeliveryZone)
+def invalidate_delivery_zones(sender, **kwargs):
+    transaction.on_commit(delivery_zones.invalidate)
@@ -0,0 +1,260 @@
+import asyncio
+import threading
+from typing import Iterable, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from modules.base.concurrency import aprefetch_concurrently, run_concurrently
+from modules.base.forms import get_field_from_info, info_prefetch
+from modules.base.routers import read_from_primary
+from modules.product.choices import ProductStatus
+from modules.product.models import Category, CategoryChannel, CategoryInfo, Product
+from modules.store.models import Store
+from modules.store.registry import store_registry
+from .models import Channel
+from .payloads import build_product_payload, product_detail_prefetch_groups, product_detail_prefetches
+
+DEFAULT_CATEGORY = 'default'
+
+_pending = threading.local()
+
+
+def get_snapshot_cache():
+    return caches[settings.MENU_SNAPSHOT_CACHE]
+
+
+def get_snapshot_key(channel_id: int, store: Optional[Store], category_id=None) -> str:
+    store_code = store.code if store else '-'
+    return f'channel:menu:{channel_id}:{store_code}:{category_id or DEFAULT_CATEGORY}'
+
+
+def build_product_card(product: Product, store_code: str = None) -> dict:
+    return {
+        'id': product.id,
+        'name': get_field_from_info(product, 'info', 'name', store_code),
+        'preview': product.get_preview_media('card', 'jpeg'),
+        'preview_webp': product.get_preview_media('card', 'webp') if product.preview_image else None,
+        'lowest_price': str(product.min_price) if product.min_price is not None else None,
+    }
+
+
+def _load_categories(channel: Union[Channel, int], store: Optional[Store]) -> list[Category]:
+    store_code = store.code if store else None
+    return list(
+        Category.objects.filter(channels__channel=channel)
+        .distinct()
+        .order_by('pk')
+        .prefetch_related(info_prefetch('info', CategoryInfo, store_code))
+    )
+
+
+def _product_queryset(channel_id: int, category_id: int):
+    return (
+        Product.objects.filter(category_id=category_id, status=ProductStatus.online)
+        .exclude(productexcludechannel__channel_id=channel_id)
+        .order_by('pk')
+    )
+
+
+def _assemble_document(
+    channel: Channel, store_code: Optional[str], categories: list[Category], category: Category, products: list[Product]
+) -> dict:
+    return {
+        'channel': {'id': channel.id, 'name': channel.name, 'currency': channel.currency},
+        'categories': [
+            {'id': item.id, 'name': get_field_from_info(item, 'info', 'name', store_code)}
+            for item in categories
+        ],
+        'selected_category': {'id': category.id, 'name': get_field_from_info(category, 'info', 'name', store_code)},
+        'products': [build_product_card(product, store_code) for product in products],
+        'details': {
+            product.id: build_product_payload(product, channel.currency, store_code)
+            for product in products
+        },
+    }
+
+
+def _build_document(channel: Channel, store: Optional[Store], categories: list[Category], category: Category) -> dict:
+    store_code = store.code if store else None
+    products = list(_product_queryset(channel.id, category.id).prefetch_related(*product_detail_prefetches(store_code)))
+    return _assemble_document(channel, store_code, categories, category, products)
+
+
+def _empty_document(channel: Channel) -> dict:
+    return {
+        'channel': {'id': channel.id, 'name': channel.name, 'currency': channel.currency},
+        'categories': [],
+        'selected_category': None,
+        'products': [],
+        'details': {},
+    }
+
+
+def _select_category(categories: list[Category], category_id=None) -> Optional[Category]:
+    if category_id:
+        return next((item for item in categories if item.id == category_id), None)
+    return categories[0] if categories else None
+
+
+def build_menu_snapshot(channel_id: int, store: Optional[Store], category_id=None) -> Optional[dict]:
+    # Snapshots are kept until the next rebuild, so never loaded from a lagging replica.
+    with read_from_primary():
+        channel = Channel.objects.filter(pk=channel_id).first()
+        if not channel:
+            return None
+
+        categories = _load_categories(channel, store)
+        category = _select_category(categories, category_id)
+        if category_id and not category:
+            return None
+
+        document = _build_document(channel, store, categories, category) if category else _empty_document(channel)
+    get_snapshot_cache().set(
+        get_snapshot_key(channel.id, store, category_id), document, settings.MENU_SNAPSHOT_TIMEOUT
+    )
+    return document
+
+
+def get_menu_snapshot(channel_id: int, category_id=None, store: Optional[Store] = None) -> Optional[dict]:
+    document = get_snapshot_cache().get(get_snapshot_key(channel_id, store, category_id))
+    if document is None:
+        document = build_menu_snapshot(channel_id, store, category_id)
+    return document
+
+
+async def abuild_menu_snapshot(channel_id: int, store: Optional[Store], category_id=None) -> Optional[dict]:
+    """
+    Async build_menu_snapshot. The channel, its categories and, when the category
+    is known up front, its products load concurrently, then the product prefetches.
+    """
+    # The worker threads copy this context, so their queries go to the primary too.
+    with read_from_primary():
+        return await _abuild_menu_snapshot(channel_id, store, category_id)
+
+
+async def _abuild_menu_snapshot(channel_id: int, store: Optional[Store], category_id=None) -> Optional[dict]:
+    store_code = store.code if store else None
+    loads = [lambda: _load_categories(channel_id, store)]
+    if category_id:
+        # Thrown away below if the category turns out not to belong to the channel.
+        loads.append(lambda: list(_product_queryset(channel_id, category_id)))
+    channel, (categories, *products) = await asyncio.gather(
+        Channel.objects.filter(pk=channel_id).afirst(),
+        run_concurrently(*loads),
+    )
+    if not channel:
+        return None
+
+    category = _select_category(categories, category_id)
+    if category_id and not category:
+        return None
+
+    if category:
+        products = products[0] if products else [product async for product in _product_queryset(channel_id, category.id)]
+        groups = await sync_to_async(product_detail_prefetch_groups)(store_code)
+        await aprefetch_concurrently(products, groups)
+        # Rendition URLs check the storage, so the document is assembled off the event loop too.
+        document = await sync_to_async(_assemble_document, thread_sensitive=False)(
+            channel, store_code, categories, category, products
+        )
+    else:
+        document = _empty_document(channel)
+
+    await get_snapshot_cache().aset(
+        get_snapshot_key(channel.id, store, category_id), document, settings.MENU_SNAPSHOT_TIMEOUT
+    )
+    return document
+
+
+async def aget_menu_snapshot(channel_id: int, category_id=None, store: Optional[Store] = None) -> Optional[dict]:
+    document = await get_snapshot_cache().aget(get_snapshot_key(channel_id, store, category_id))
+    if document is None:
+        document = await abuild_menu_snapshot(channel_id, store, category_id)
+    return document
+
+
+def rebuild_channel_snapshots(channel: Channel, category_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Rewrites the snapshots of `channel` for every store. With `category_ids`
+    only those categories (and the default page, if it shows one of them) are rebuilt.
+    """
+    cache = get_snapshot_cache()
+
+    for store in store_registry.all() or [None]:
+        with read_from_primary():
+            categories = _load_categories(channel, store)
+            targets = categories if category_ids is None else [item for item in categories if item.id in category_ids]
+
+            documents = {}
+            for category in targets:
+                documents[get_snapshot_key(channel.id, store, category.id)] = _build_document(
+                    channel, store, categories, category
+                )
+
+        if not categories:
+            documents[get_snapshot_key(channel.id, store)] = _empty_document(channel)
+        elif category_ids is None or categories[0].id in category_ids:
+            documents[get_snapshot_key(channel.id, store)] = documents[
+                get_snapshot_key(channel.id, store, categories[0].id)
+            ]
+
+        cache.set_many(documents, settings.MENU_SNAPSHOT_TIMEOUT)
+
+
+def delete_snapshots(channel_id: int, category_ids: Iterable = (DEFAULT_CATEGORY,)) -> None:
+    get_snapshot_cache().delete_many([
+        get_snapshot_key(channel_id, store, category_id)
+        for store in store_registry.all() or [None]
+        for category_id in category_ids
+    ])
+
+
+def rebuild_snapshots(category_ids: Iterable[int] = (), channel_ids: Iterable[int] = ()) -> None:
+    category_ids, channel_ids = set(category_ids), set(channel_ids)
+
+    targets = {channel_id: None for channel_id in channel_ids}
+    with read_from_primary():
+        links = CategoryChannel.objects.filter(category_id__in=category_ids).values_list('channel_id', 'category_id')
+        for channel_id, category_id in links:
+            if channel_id not in channel_ids:
+                targets.setdefault(channel_id, set()).add(category_id)
+        channels = list(Channel.objects.filter(pk__in=targets))
+
+    for channel in channels:
+        rebuild_channel_snapshots(channel, targets[channel.id])
+
+
+def _flush_pending() -> None:
+    product_ids = _pending.__dict__.pop('product_ids', set())
+    category_ids = _pending.__dict__.pop('category_ids', set())
+    channel_ids = _pending.__dict__.pop('channel_ids', set())
+
+    if product_ids:
+        with read_from_primary():
+            category_ids.update(Product.objects.filter(pk__in=product_ids).values_list('category_id', flat=True))
+    if category_ids or channel_ids:
+        rebuild_snapshots(category_ids, channel_ids)
+
+
+def schedule_rebuild(
+    product_ids: Iterable[int] = (),
+    category_ids: Iterable[int] = (),
+    channel_ids: Iterable[int] = (),
+) -> None:
+    """
+    Collects the products, categories and channels touched by the current
+    transaction and rebuilds their snapshots once, after commit.
+
+    The rebuild runs synchronously in the on_commit hook of the request that
+    wrote: an admin save renders one document per store for each touched
+    category of every channel listing it, and every category of the channels
+    in `channel_ids`, before its response is sent. Bulk jobs should collect
+    their ids and call rebuild_snapshots once, as build_renditions does.
+    """
+    _pending.__dict__.setdefault('product_ids', set()).update(product_ids)
+    _pending.__dict__.setdefault('category_ids', set()).update(category_ids)
+    _pending.__dict__.setdefault('channel_ids', set()).update(channel_ids)
+    transaction.on_commit(_flush_pending)
@@ -1,3 +1,587 @@
-from django.test import TestCase
+import io
+import json
+import math
+import random
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from modules.base.instrumentation import RequestMetrics, wrap_queries
+from modules.base.repeated_queries import detect_repeated_queries
+from modules.product.choices import ProductStatus
+from modules.product.models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    Package,
+    PackageInfo,
+    Product,
+    ProductAdditive,
+    ProductInfo,
+    ProductMediaGallery,
+    ProductVariant,
+)
+from modules.product import renditions
+from modules.product.versions import catalog_versions
+from modules.store.models import Store
+from modules.store.registry import store_registry
+from . import async_views, views
+from .checks import check_async_views_connections
+from .geometry import polygon_area, polygon_bounds
+from .locator import KDTree, channel_locator, to_unit_vector
+from .management.commands.benchmark_connections import get_mode_settings
+from .models import Channel
+from .snapshots import abuild_menu_snapshot, build_menu_snapshot, get_menu_snapshot
+from .zones import Zone, ZoneIndex
+
+
+def create_catalog() -> tuple[Channel, Category, Product, Store]:
+    # The store migration creates it; TransactionTestCase flushes it after the first test.
+    store, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+    channel = Channel.objects.create(
+        code='main', name='Main', status='online', city='Warszawa', phone='1', base_language='en', currency='PLN',
+    )
+    category = Category.objects.create(code='pizza')
+    CategoryChannel.objects.create(category=category, channel=channel)
+    product = Product.objects.create(sku='margherita', category=category, status=ProductStatus.online)
+    return channel, category, product, store
+
+
+def create_product_details(product: Product, store: Store) -> None:
+    """
+    Info, variants, an additive and an image: a row of every model the product_detail payload reads.
+    """
+    ProductInfo.objects.create(product=product, store=store, name='Margherita', description='Tomato')
+    package = Package.objects.create(code='box', price=Decimal('2.00'))
+    PackageInfo.objects.create(package=package, store=store, name='Box')
+    for code, price in (('S', '20.00'), ('L', '28.00')):
+        ProductVariant.objects.create(product=product, code=code, price=Decimal(price), package=package)
+    additive = Additive.objects.create(code='basil', price=Decimal('1.00'))
+    AdditiveInfo.objects.create(additive=additive, store=store, name='Basil')
+    ProductAdditive.objects.create(product=product, additive=additive)
+    ProductMediaGallery.objects.create(product=product, image='product_images/front.jpg')
+
+
+class SnapshotRefreshTests(TransactionTestCase):
+    """
+    Saves outside a transaction, where on_commit callbacks (the snapshot
+    rebuilds) run as soon as they are scheduled.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        self.package = Package.objects.create(code='box', price=Decimal('1.00'))
+
+    def get_card(self) -> dict:
+        snapshot = get_menu_snapshot(self.channel.pk, self.category.pk, self.store)
+        return next(card for card in snapshot['products'] if card['id'] == self.product.pk)
+
+    def test_variant_price_is_in_rebuilt_snapshot(self):
+        ProductVariant.objects.create(product=self.product, code='S', price=Decimal('20.00'), package=self.package)
+        self.assertEqual(self.get_card()['lowest_price'], '20.00')
+
+        variant = ProductVariant.objects.create(
+            product=self.product, code='XS', price=Decimal('15.00'), package=self.package,
+        )
+        self.assertEqual(self.get_card()['lowest_price'], '15.00')
+
+        variant.delete()
+        self.assertEqual(self.get_card()['lowest_price'], '20.00')
+
+    @mock.patch('modules.product.signals.schedule_renditions')
+    def test_preview_image_is_in_rebuilt_snapshot(self, schedule_renditions):
+        media = ProductMediaGallery.objects.create(product=self.product, image='product_images/front.jpg', priority=0)
+        self.assertIn('front', self.get_card()['preview'])
+
+        ProductMediaGallery.objects.create(product=self.product, image='product_images/back.jpg', priority=1)
+        media.delete()
+        self.assertIn('back', self.get_card()['preview'])
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class AsyncViewTests(TransactionTestCase):
+    """
+    The async views load the same data as the sync ones, from several threads.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        create_product_details(self.product, self.store)
+
+    def test_product_detail(self, schedule_renditions):
+        path = f'/product/{self.product.pk}/'
+        with detect_repeated_queries():
+            sync_response = views.product_detail(RequestFactory().get(path), pk=self.product.pk)
+            async_response = async_to_sync(async_views.product_detail)(
+                AsyncRequestFactory().get(path), pk=self.product.pk
+            )
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+
+    def test_menu_snapshot(self, schedule_renditions):
+        for category_id in (None, self.category.pk):
+            snapshot = build_menu_snapshot(self.channel.pk, self.store, category_id)
+            self.assertEqual(len(snapshot['products']), 1)
+            self.assertEqual(async_to_sync(abuild_menu_snapshot)(self.channel.pk, self.store, category_id), snapshot)
+
+    def test_channel_page(self, schedule_renditions):
+        path = f'/{self.channel.pk}/'
+        with detect_repeated_queries():
+            sync_response = views.ChannelDetailView.as_view()(RequestFactory().get(path), pk=self.channel.pk)
+            sync_content = sync_response.render().content
+        cache.clear()
+        async_view = async_views.AsyncChannelDetailView.as_view()
+        with detect_repeated_queries():
+            async_response = async_to_sync(async_view)(AsyncRequestFactory().get(path), pk=self.channel.pk)
+            async_content = async_response.render().content
+        self.assertIn(b'Margherita', sync_content)
+        self.assertEqual(async_content, sync_content)
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class FragmentCacheTests(TransactionTestCase):
+    """
+    The channel page fragments, keyed by the catalog version of the channel and store.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        create_product_details(self.product, self.store)
+
+    def render(self) -> str:
+        response = views.ChannelDetailView.as_view()(RequestFactory().get(f'/{self.channel.pk}/'), pk=self.channel.pk)
+        return response.render().content.decode()
+
+    def grid_key(self) -> str:
+        version = catalog_versions.get(self.channel.pk, self.store.pk)
+        return make_template_fragment_key('channel_grid', [self.channel.pk, 'en', self.category.pk, version])
+
+    def test_fragments_follow_the_catalog_version(self, schedule_renditions):
+        self.assertIn('Margherita', self.render())
+        fragments = caches[settings.FRAGMENT_CACHE]
+        key = self.grid_key()
+        self.assertIn('Margherita', fragments.get(key))
+        # Served from the fragment while the version holds.
+        fragments.set(key, 'cached grid')
+        self.assertIn('cached grid', self.render())
+
+        ProductInfo.objects.filter(product=self.product).get().save()
+        self.assertNotEqual(self.grid_key(), key)
+        content = self.render()
+        self.assertNotIn('cached grid', content)
+        self.assertIn('Margherita', content)
+        self.assertIn('Margherita', fragments.get(self.grid_key()))
+
+    def test_other_channels_keep_their_fragments(self, schedule_renditions):
+        other = Channel.objects.create(
+            code='other', name='Other', status='online', city='Warszawa', phone='1', base_language='en', currency='PLN',
+        )
+        before = catalog_versions.get(other.pk, self.store.pk)
+        self.product.save()
+        self.assertEqual(catalog_versions.get(other.pk, self.store.pk), before)
+        self.assertNotEqual(catalog_versions.get(self.channel.pk, self.store.pk), before)
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class ProductDetailValidatorTests(TransactionTestCase):
+    """
+    Revalidation of product_detail with the ETag of an earlier response.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        create_product_details(self.product, self.store)
+        self.etag = self.get()['ETag']
+
+    def get(self, etag: str = None) -> HttpResponse:
+        headers = {'If-None-Match': etag} if etag else {}
+        request = RequestFactory().get(f'/product/{self.product.pk}/', headers=headers)
+        return views.product_detail(request, pk=self.product.pk)
+
+    def assertChanged(self) -> dict:
+        response = self.get(self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        self.assertEqual(self.get(response['ETag']).status_code, 304)
+        return json.loads(response.content)
+
+    def test_matching_etag(self, schedule_renditions):
+        response = self.get(self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        async_request = AsyncRequestFactory().get(f'/product/{self.product.pk}/', headers={'If-None-Match': self.etag})
+        self.assertEqual(async_to_sync(async_views.product_detail)(async_request, pk=self.product.pk).status_code, 304)
+
+    def test_related_row_changed(self, schedule_renditions):
+        AdditiveInfo.objects.update(name='Fresh basil')
+        self.assertEqual(self.get(self.etag).status_code, 304)
+        # Saved, so updated_at moves like it does in the admin.
+        info = AdditiveInfo.objects.get()
+        info.save()
+        self.assertEqual(self.assertChanged()['ingredients'][0]['name'], 'Fresh basil')
+
+    def test_related_row_deleted(self, schedule_renditions):
+        ProductVariant.objects.get(code='S').delete()
+        self.assertEqual([variant['code'] for variant in self.assertChanged()['variants']], ['L'])
+
+    @mock.patch('modules.product.renditions.create_renditions')
+    def test_renditions_ready(self, create_renditions, schedule_renditions):
+        media = ProductMediaGallery.objects.get()
+        renditions._run(ProductMediaGallery, media.pk, media.image.name)
+        image_renditions = self.assertChanged()['image_renditions']
+        self.assertIn('renditions/large/', image_renditions[0]['webp'])
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class ProductDetailsTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        create_product_details(self.product, self.store)
+        self.offline = Product.objects.create(sku='draft', category=self.category, status=ProductStatus.offline)
+
+    def get(self, query: str) -> HttpResponse:
+        return views.product_details(RequestFactory().get(f'/products/?{query}'))
+
+    def get_products(self, query: str) -> dict:
+        response = self.get(query)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['products']
+
+    def test_ids(self, schedule_renditions):
+        products = self.get_products(f'ids={self.product.pk},{self.offline.pk}&ids={self.product.pk},,0')
+        self.assertEqual(list(products), [str(self.product.pk), str(self.offline.pk)])
+        self.assertEqual(products[str(self.product.pk)]['name'], 'Margherita')
+
+    def test_category_lists_online_products(self, schedule_renditions):
+        products = self.get_products(f'category={self.category.pk}&category=0')
+        self.assertEqual(list(products), [str(self.product.pk)])
+        # Ids win over the category.
+        products = self.get_products(f'ids={self.offline.pk}&category={self.category.pk}')
+        self.assertEqual(list(products), [str(self.offline.pk)])
+
+    def test_channel_reads_the_snapshot(self, schedule_renditions):
+        expected = self.get_products(f'category={self.category.pk}')
+        with mock.patch.object(views, 'product_detail_queryset', side_effect=AssertionError):
+            products = self.get_products(f'category={self.category.pk}&channel={self.channel.pk}')
+            with self.assertRaises(Http404):
+                self.get(f'category={self.category.pk}&channel={self.channel.pk + 1}')
+        self.assertEqual(products, expected)
+
+    def test_id_limit(self, schedule_renditions):
+        ids = ','.join(str(pk) for pk in range(1, views.PRODUCT_DETAILS_LIMIT + 1))
+        self.assertEqual(list(self.get_products(f'ids={ids}')), [str(self.product.pk), str(self.offline.pk)])
+        self.assertEqual(self.get(f'ids={ids},{views.PRODUCT_DETAILS_LIMIT + 1}').status_code, 400)
+        # Repeated ids count once.
+        self.assertEqual(self.get(f'ids={ids}&ids={ids}').status_code, 200)
+
+    def test_bad_requests(self, schedule_renditions):
+        for query in ('', 'ids=', 'ids=1,x', 'ids=-1', 'ids=1.5', 'category=pizza', 'ids=1&channel=main'):
+            self.assertEqual(self.get(query).status_code, 400, query)
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class QuoteTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        create_product_details(self.product, self.store)
+
+    def post(self, body, pk: int = None) -> HttpResponse:
+        pk = pk or self.channel.pk
+        data = body if isinstance(body, str) else json.dumps(body)
+        return views.quote(RequestFactory().post(f'/{pk}/quote/', data, content_type='application/json'), pk=pk)
+
+    def test_prices_lines(self, schedule_renditions):
+        response = self.post({'items': [
+            {'sku': 'margherita', 'variant': 'S', 'additives': ['basil'], 'qty': 2},
+            {'sku': 'margherita', 'variant': 'L'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        quote = json.loads(response.content)
+        self.assertEqual(quote['currency'], 'PLN')
+        # Variant, package and additives.
+        prices = [(item['unit_price'], item['amount']) for item in quote['items']]
+        self.assertEqual(prices, [('23.00', '46.00'), ('30.00', '30.00')])
+        self.assertEqual(quote['total'], '76.00')
+
+    def test_bad_requests(self, schedule_renditions):
+        too_many = [{'sku': 'margherita', 'variant': 'S'}] * (views.QUOTE_LINES_LIMIT + 1)
+        for body in ('{', '[]', {}, {'items': []}, {'items': {'sku': 'margherita'}}, {'items': too_many}):
+            response = self.post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertNotIn(b'errors', response.content)
+
+    def test_line_errors(self, schedule_renditions):
+        response = self.post({'items': [
+            {'sku': 'margherita', 'variant': 'S'},
+            {'sku': 'margherita', 'variant': 'XL'},
+            {'sku': 'margherita', 'variant': 'S', 'additives': ['ham']},
+            {'sku': 'margherita', 'variant': 'S', 'qty': 0},
+            {'sku': 'margherita', 'variant': 'S', 'additives': 'basil'},
+            'margherita',
+            {'sku': 'hawaii', 'variant': 'S'},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['errors'], {
+            '1': "margherita has no variant 'XL' in this channel.",
+            '2': "margherita cannot be ordered with additive 'ham'.",
+            '3': 'qty must be a positive integer.',
+            '4': 'additives must be a list of codes.',
+            '5': 'Expected an object.',
+            '6': "hawaii has no variant 'S' in this channel.",
+        })
+
+    def test_unknown_channel(self, schedule_renditions):
+        with self.assertRaises(Http404):
+            self.post({'items': [{'sku': 'margherita', 'variant': 'S'}]}, pk=self.channel.pk + 1)
+
+    def test_get_not_allowed(self, schedule_renditions):
+        response = views.quote(RequestFactory().get(f'/{self.channel.pk}/quote/'), pk=self.channel.pk)
+        self.assertEqual(response.status_code, 405)
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class BenchmarkViewsTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.channel, self.category, self.product, self.store = create_catalog()
+        create_product_details(self.product, self.store)
+
+    def test_counts_queries_of_every_request(self, schedule_renditions):
+        out = io.StringIO()
+        call_command('benchmark_views', '--endpoint=product', '--requests=3', '--warmup=1', stdout=out)
+        report = json.loads(out.getvalue())['endpoints']['product']
+
+        metrics = RequestMetrics()
+        with wrap_queries(metrics):
+            views.product_detail(RequestFactory().get(f'/product/{self.product.pk}/'), pk=self.product.pk)
+        self.assertGreater(metrics.query_count, 0)
+        count = metrics.query_count
+        self.assertEqual(report['queries'], {'min': count, 'max': count, 'mean': count})
+        self.assertEqual(report['statuses'], {'200': 3})
+
+
+class BenchmarkConnectionsTests(TransactionTestCase):
+
+    def test_mode_settings(self):
+        base = {'NAME': 'horeca', 'CONN_MAX_AGE': 60, 'OPTIONS': {'pool': True, 'sslmode': 'require'}}
+        options = {'pool_min_size': 1, 'pool_max_size': 3}
+        new, persistent, pool = (get_mode_settings(mode, base, options) for mode in ('new', 'persistent', 'pool'))
+        self.assertEqual((new['CONN_MAX_AGE'], new['CONN_HEALTH_CHECKS']), (0, False))
+        self.assertEqual(new['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (600, True))
+        self.assertNotIn('pool', persistent['OPTIONS'])
+        self.assertEqual(pool['CONN_MAX_AGE'], 0)
+        self.assertEqual(pool['OPTIONS']['pool'], {'min_size': 1, 'max_size': 3})
+        self.assertEqual(base['OPTIONS'], {'pool': True, 'sslmode': 'require'})
+
+    def test_report(self):
+        out = io.StringIO()
+        # The command connects through aliases of its own, added while it runs.
+        aliases = {f'benchmark_{mode}' for mode in ('new', 'persistent', 'pool')}
+        with mock.patch.object(type(self), 'databases', {*self.databases, *aliases}):
+            call_command('benchmark_connections', '--requests=5', '--pool-max-size=2', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(list(report['modes']), ['new', 'persistent', 'pool'])
+        modes = {mode: result['server_connections'] for mode, result in report['modes'].items()}
+        # A new server process per request, one kept open, at most the pool size.
+        self.assertEqual(modes['new'], 5)
+        self.assertEqual(modes['persistent'], 1)
+        self.assertLessEqual(modes['pool'], 2)
+        self.assertFalse([alias for alias in connections.settings if alias.startswith('benchmark_')])
+
+    def test_pool_needs_postgresql(self):
+        with mock.patch.dict(connections.settings, {'other': {'ENGINE': 'django.db.backends.sqlite3'}}):
+            with self.assertRaises(CommandError):
+                call_command('benchmark_connections', '--database=other', '--mode=pool')
+
+
+class AsyncViewsCheckTests(SimpleTestCase):
+
+    def check(self, **database) -> list[str]:
+        database = {'OPTIONS': {}, **database}
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(mock.patch.dict(connections.settings[alias], database))
+            return [error.id for error in check_async_views_connections(None)]
+
+    @override_settings(ASYNC_VIEWS=True)
+    def test_async_views_need_persistent_or_pooled_connections(self):
+        self.assertIn('channel.E001', self.check(CONN_MAX_AGE=0))
+        self.assertEqual(self.check(CONN_MAX_AGE=60), [])
+        self.assertEqual(self.check(CONN_MAX_AGE=0, OPTIONS={'pool': True}), [])
+
+    @override_settings(ASYNC_VIEWS=False)
+    def test_sync_views(self):
+        self.assertEqual(self.check(CONN_MAX_AGE=0), [])
+
+
+def create_zone(pk: int, rng: random.Random) -> Zone:
+    """
+    Star-shaped, so concave but never self-intersecting, up to 0.2 degrees
+    across, around Warsaw or on both sides of the equator and the prime meridian.
+    """
+    center_latitude, center_longitude = rng.choice([(52.2, 21.0), (0.0, 0.0)])
+    center_latitude += rng.uniform(-0.15, 0.15)
+    center_longitude += rng.uniform(-0.15, 0.15)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(rng.randint(3, 12)))
+    polygon = tuple(
+        (center_latitude + radius * math.sin(angle), center_longitude + radius * math.cos(angle))
+        for angle, radius in ((angle, rng.uniform(0.02, 0.1)) for angle in angles)
+    )
+    return Zone(pk, pk % 4, f'Zone {pk}', rng.randint(0, 2), polygon, polygon_bounds(polygon), polygon_area(polygon))
+
+
+class ZoneIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.zones = [create_zone(pk, self.rng) for pk in range(1, 41)]
+
+    def random_points(self, count: int) -> list[tuple[float, float]]:
+        points = [
+            (center_latitude + self.rng.uniform(-0.3, 0.3), center_longitude + self.rng.uniform(-0.3, 0.3))
+            for center_latitude, center_longitude in self.rng.choices([(52.2, 21.0), (0.0, 0.0)], k=count)
+        ]
+        # Vertices and points on cell lines, where rounding matters most.
+        points += [vertex for zone in self.zones[:5] for vertex in zone.polygon]
+        points += [(52.2, 21.0), (0.0, 0.0), (0.01, -0.01), (52.25, 20.95)]
+        return points
+
+    def brute_force(self, latitude: float, longitude: float) -> list[Zone]:
+        return sorted((zone for zone in self.zones if zone.contains(latitude, longitude)), key=lambda zone: zone.order)
+
+    def test_locate_matches_brute_force(self):
+        points = self.random_points(3000)
+        expected = [self.brute_force(latitude, longitude) for latitude, longitude in points]
+        # Enough points fall in one zone, and in overlapping ones, for the comparison to mean something.
+        self.assertGreater(sum(len(zones) == 1 for zones in expected), 300)
+        self.assertGreater(sum(len(zones) > 1 for zones in expected), 100)
+
+        for cell_size, max_cells in ((0.001, 1_000_000), (0.01, 1_000_000), (0.3, 1_000_000), (0.001, 50)):
+            index = ZoneIndex(self.zones, cell_size, max_cells)
+            for (latitude, longitude), zones in zip(points, expected):
+                self.assertEqual(index.locate(latitude, longitude), zones, (cell_size, max_cells, latitude, longitude))
+
+    def test_cell_size_grows_to_max_cells(self):
+        self.assertEqual(ZoneIndex(self.zones, 0.01).cell_size, 0.01)
+        index = ZoneIndex(self.zones, 0.0001, max_cells=1000)
+        self.assertGreater(index.cell_size, 0.0001)
+        self.assertLessEqual(len(index._cells), 2000)
+
+    def test_classify(self):
+        index = ZoneIndex(self.zones, 0.01)
+        points = [(key, *point) for key, point in enumerate(self.random_points(200))]
+        self.assertEqual(
+            list(index.classify(points)),
+            [(key, self.brute_force(latitude, longitude)) for key, latitude, longitude in points],
+        )
+
+    def test_priority_then_area_wins(self):
+        square = ((52.0, 21.0), (52.0, 21.2), (52.2, 21.2), (52.2, 21.0))
+        small = ((52.05, 21.05), (52.05, 21.1), (52.1, 21.1), (52.1, 21.05))
+        zones = [
+            Zone(pk, pk, f'Zone {pk}', priority, polygon, polygon_bounds(polygon), polygon_area(polygon))
+            for pk, priority, polygon in ((1, 0, square), (2, 0, small), (3, 1, small))
+        ]
+        index = ZoneIndex(zones, 0.01)
+        self.assertEqual([zone.id for zone in index.locate(52.07, 21.07)], [2, 1, 3])
+        self.assertEqual([zone.id for zone in index.locate(52.15, 21.15)], [1])
+        self.assertEqual(index.locate(52.3, 21.15), [])
+
+
+class KDTreeTests(SimpleTestCase):
+
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(11)
+        points = [to_unit_vector(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(500)]
+        # Clustered points too, where most of the tree gets pruned.
+        points += [to_unit_vector(52.2 + rng.uniform(-0.5, 0.5), 21.0 + rng.uniform(-0.5, 0.5)) for _ in range(200)]
+        tree = KDTree([(point, index) for index, point in enumerate(points)])
+        self.assertEqual(len(tree), len(points))
+
+        for _ in range(200):
+            query = to_unit_vector(rng.uniform(-90, 90), rng.uniform(-180, 180))
+            if rng.random() < 0.5:
+                query = to_unit_vector(52.2 + rng.uniform(-0.6, 0.6), 21.0 + rng.uniform(-0.6, 0.6))
+            expected = sorted((math.dist(query, point), index) for index, point in enumerate(points))
+            for k in (1, 5, 30):
+                found = tree.nearest(query, k)
+                self.assertEqual([index for _, index in found], [index for _, index in expected[:k]])
+                for (distance, _), (expected_distance, _) in zip(found, expected):
+                    self.assertAlmostEqual(distance, expected_distance)
+
+    def test_nearest_edge_cases(self):
+        self.assertEqual(KDTree([]).nearest((1.0, 0.0, 0.0), 3), [])
+        tree = KDTree([((1.0, 0.0, 0.0), 'a'), ((0.0, 1.0, 0.0), 'b')])
+        self.assertEqual(tree.nearest((1.0, 0.0, 0.0), 0), [])
+        self.assertEqual([value for _, value in tree.nearest((1.0, 0.0, 0.0), 5)], ['a', 'b'])
+
+
+class NearestChannelsTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        for code, latitude, longitude in (('waw', '52.229676', '21.012229'), ('krk', '50.064650', '19.944980')):
+            Channel.objects.create(
+                code=code, name=code, status='online', city=code, phone='1', base_language='en', currency='PLN',
+                latitude=Decimal(latitude), longitude=Decimal(longitude),
+            )
+        channel_locator.invalidate()
+
+    def get(self, **params) -> HttpResponse:
+        return views.nearest_channels(RequestFactory().get('/nearest/', params))
+
+    def test_closest_first(self):
+        response = self.get(lat='52.2', lng='21.0', limit='5')
+        self.assertEqual(response.status_code, 200)
+        channels = json.loads(response.content)['channels']
+        self.assertEqual([channel['name'] for channel in channels], ['waw', 'krk'])
+        self.assertLess(channels[0]['distance_km'], 5)
+        self.assertAlmostEqual(channels[1]['distance_km'], 250, delta=10)
+
+    def test_radius_filter(self):
+        channels = json.loads(self.get(lat='52.2', lng='21.0', limit='5', radius='50').content)['channels']
+        self.assertEqual([channel['name'] for channel in channels], ['waw'])
+        self.assertEqual(json.loads(self.get(lat='0', lng='0', radius='50').content)['channels'], [])
+
+    def test_bad_requests(self):
+        for params in (
+            {'lng': '21.0'},
+            {'lat': 'north', 'lng': '21.0'},
+            {'lat': '90.5', 'lng': '21.0'},
+            {'lat': 'nan', 'lng': '21.0'},
+            {'lat': '52.2'},
+            {'lat': '52.2', 'lng': '180.5'},
+            {'lat': '52.2', 'lng': '21.0', 'limit': 'all'},
+            {'lat': '52.2', 'lng': '21.0', 'limit': '0'},
+            {'lat': '52.2', 'lng': '21.0', 'limit': str(views.NEAREST_CHANNELS_LIMIT + 1)},
+            {'lat': '52.2', 'lng': '21.0', 'radius': 'far'},
+        ):
+            self.assertEqual(self.get(**params).status_code, 400, params)
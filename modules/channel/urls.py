@@ -1,10 +1,20 @@
+from django.conf import settings
 from django.urls import path
-from .views import HomeView, ChannelDetailView, product_detail
+from . import async_views, views
+
+if settings.ASYNC_VIEWS:
+    home_view, channel_detail_view = async_views.AsyncHomeView, async_views.AsyncChannelDetailView
+    product_detail_view = async_views.product_detail
+else:
+    home_view, channel_detail_view, product_detail_view = views.HomeView, views.ChannelDetailView, views.product_detail
 
 app_name = 'channel'
 
 urlpatterns = [
-    path('', HomeView.as_view(), name='home'),
-    path('<int:pk>/', ChannelDetailView.as_view(), name='detail'),
-    path('product/<int:pk>/', product_detail, name='product-detail'),
+    path('', home_view.as_view(), name='home'),
+    path('nearest/', views.nearest_channels, name='nearest'),
+    path('<int:pk>/', channel_detail_view.as_view(), name='detail'),
+    path('product/<int:pk>/', product_detail_view, name='product-detail'),
+    path('products/', views.product_details, name='product-details'),
+    path('<int:pk>/quote/', views.quote, name='quote'),
 ]
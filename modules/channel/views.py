@@ -1,72 +1,227 @@
-from django.http import JsonResponse
+import json
+import math
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.http import JsonResponse, Http404, HttpResponseBadRequest
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
 from django.views.generic import TemplateView, ListView
 from django.shortcuts import redirect, get_object_or_404
+from django.urls import reverse
+from django.utils.translation import get_language
 
-from modules.product.models import Category, Product
+from modules.product.choices import ProductStatus
+from modules.product.pricing import PricingError, price_tables
+from modules.product.versions import catalog_versions
+from modules.store.models import Store
+from .locator import channel_locator
 from .models import Channel
-from ..product.choices import ProductStatus
+from .payloads import build_product_payload, get_product_currency, get_product_validators, product_detail_queryset
+from .snapshots import get_menu_snapshot
+
+
+PRODUCT_DETAILS_LIMIT = 100
+QUOTE_LINES_LIMIT = 500
+NEAREST_CHANNELS_LIMIT = 20
+
+
+def get_fragment_context(channel_id: int, store: Optional[Store]) -> dict:
+    """
+    Context of the fragment cache tags in channel/view.html. The catalog version
+    is part of every key, so fragments are never invalidated, only left to expire.
+    """
+    return {
+        'store_code': store.code if store else get_language(),
+        'catalog_version': catalog_versions.get(channel_id, store.pk if store else None),
+        'fragment_cache': settings.FRAGMENT_CACHE,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
 
 
 class HomeView(TemplateView):
     template_name = "channel/list.html"
 
     def dispatch(self, request, *args, **kwargs):
-        channels = Channel.objects.filter(active=True)
-        if channels.count() == 1:
-            return redirect('channel:detail', pk=channels.first().id)
+        # Read fresh: channel_locator only sees a channel (de)activated in another
+        # process through a shared cache.
+        self.channels = list(Channel.objects.filter(active=True))
+        if len(self.channels) == 1:
+            return redirect('channel:detail', pk=self.channels[0].id)
         return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['channels'] = Channel.objects.filter(active=True)
+        context['channels'] = self.channels
         return context
 
 
+def _parse_coordinate(value: Optional[str], limit: float) -> float:
+    coordinate = float(value)
+    if not math.isfinite(coordinate) or abs(coordinate) > limit:
+        raise ValueError
+    return coordinate
+
+
+def nearest_channels(request):
+    """
+    Active channels closest to ?lat=&lng=, optionally within ?radius= km.
+    """
+    try:
+        latitude = _parse_coordinate(request.GET.get('lat'), 90)
+        longitude = _parse_coordinate(request.GET.get('lng'), 180)
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest('Pass lat and lng in degrees.')
+    try:
+        limit = int(request.GET.get('limit', 1))
+        radius = float(request.GET['radius']) if 'radius' in request.GET else None
+    except ValueError:
+        return HttpResponseBadRequest('Limit must be an integer and radius a number.')
+    if not 0 < limit <= NEAREST_CHANNELS_LIMIT:
+        return HttpResponseBadRequest(f'Limit must be between 1 and {NEAREST_CHANNELS_LIMIT}.')
+
+    return JsonResponse({
+        'channels': [
+            {
+                'id': channel.id,
+                'name': channel.name,
+                'city': channel.city,
+                'address': channel.address,
+                'distance_km': round(distance, 3),
+                'url': reverse('channel:detail', kwargs={'pk': channel.id}),
+            }
+            for channel, distance in channel_locator.nearest(latitude, longitude, limit, radius)
+        ],
+    })
+
+
 class ChannelDetailView(ListView):
     template_name = "channel/view.html"
     context_object_name = 'products'
 
     def get_queryset(self):
-        self.channel = get_object_or_404(Channel, pk=self.kwargs.get('pk'))
         category_id = self.request.GET.get('category', None)
+        if category_id and not category_id.isdigit():
+            raise Http404
 
-        if category_id:
-            self.category = get_object_or_404(Category, pk=category_id, channels__channel=self.channel)
-        else:
-            self.category = Category.objects.filter(channels__channel=self.channel).first()
+        self.store = Store.get_by_code_or_default(get_language())
+        self.snapshot = get_menu_snapshot(self.kwargs.get('pk'), int(category_id) if category_id else None, self.store)
+        if self.snapshot is None:
+            raise Http404
 
-        if not self.category:
-            return Product.objects.none()
-
-        return Product.objects.filter(
-            category=self.category,
-            status=ProductStatus.online
-        )
+        return self.snapshot['products']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['channel'] = self.channel
-        context['categories'] = Category.objects.filter(channels__channel=self.channel).prefetch_related('info')
-        context['selected_category'] = self.category
+        context['channel'] = self.snapshot['channel']
+        context['categories'] = self.snapshot['categories']
+        context['selected_category'] = self.snapshot['selected_category']
+        context.update(get_fragment_context(self.snapshot['channel']['id'], self.store))
 
         return context
 
 
+def _product_validators(request, pk):
+    if not hasattr(request, '_product_validators'):
+        request._product_validators = get_product_validators(pk) or (None, None)
+    return request._product_validators
+
+
+def product_etag(request, pk):
+    return _product_validators(request, pk)[0]
+
+
+def product_last_modified(request, pk):
+    return _product_validators(request, pk)[1]
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=product_etag, last_modified_func=product_last_modified)
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
-    product_data = {
-        'name': product.name,
-        'description': product.description,
-        'variants': list(product.variants.values('id', 'price', 'code')),
-        'currency': product.category.channels.first().channel.currency,
-        'images': [media.image.url for media in product.media.all()],
-        'ingredients': [
+    product = get_object_or_404(product_detail_queryset(), pk=pk)
+    return JsonResponse(build_product_payload(product, get_product_currency(product)))
+
+
+def _parse_ids(values: list[str]) -> list[int]:
+    ids = [value for item in values for value in item.split(',') if value]
+    if not all(value.isdigit() for value in ids):
+        raise ValueError
+    return list(dict.fromkeys(int(value) for value in ids))
+
+
+def product_details(request):
+    try:
+        ids = _parse_ids(request.GET.getlist('ids'))
+        category_id = _parse_ids(request.GET.getlist('category'))[:1]
+        channel_id = _parse_ids(request.GET.getlist('channel'))[:1]
+    except ValueError:
+        return HttpResponseBadRequest('Ids must be integers.')
+
+    if len(ids) > PRODUCT_DETAILS_LIMIT:
+        return HttpResponseBadRequest(f'At most {PRODUCT_DETAILS_LIMIT} ids are allowed.')
+    if not ids and not category_id:
+        return HttpResponseBadRequest('Pass either ids or category.')
+
+    if category_id and channel_id and not ids:
+        store = Store.get_by_code_or_default(get_language())
+        snapshot = get_menu_snapshot(channel_id[0], category_id[0], store)
+        if snapshot is None:
+            raise Http404
+        return JsonResponse({'products': snapshot['details']})
+
+    products = product_detail_queryset()
+    if ids:
+        products = products.filter(pk__in=ids)
+    else:
+        products = products.filter(category_id=category_id[0], status=ProductStatus.online)
+
+    return JsonResponse({
+        'products': {
+            product.id: build_product_payload(product, get_product_currency(product))
+            for product in products.order_by('pk')[:PRODUCT_DETAILS_LIMIT]
+        },
+    })
+
+
+@csrf_exempt
+@require_POST
+def quote(request, pk):
+    """
+    Prices {"items": [{"sku", "variant", "additives": [codes], "qty"}]} with the
+    same price table the order ingestion uses.
+    """
+    try:
+        lines = json.loads(request.body).get('items')
+    except (ValueError, AttributeError):
+        return HttpResponseBadRequest('Invalid JSON.')
+    if not isinstance(lines, list) or not lines:
+        return HttpResponseBadRequest('Pass a non-empty list of items.')
+    if len(lines) > QUOTE_LINES_LIMIT:
+        return HttpResponseBadRequest(f'At most {QUOTE_LINES_LIMIT} items are allowed.')
+
+    table = price_tables.get(pk)
+    if table is None:
+        raise Http404
+
+    try:
+        priced = table.price_lines(lines)
+    except PricingError as error:
+        return JsonResponse({'errors': error.errors}, status=400)
+
+    return JsonResponse({
+        'currency': table.currency,
+        'items': [
             {
-                'name': additive.additive.name,
-                'price': str(additive.additive.price),
-                'image': additive.additive.image.url,
+                'sku': line.sku,
+                'variant': line.variant.code,
+                'additives': [additive.code for additive in line.additives],
+                'qty': line.qty,
+                'unit_price': str(line.unit_price),
+                'amount': str(line.amount),
             }
-            for additive in product.additives.select_related('additive').all()
+            for line in priced
         ],
-    }
-    return JsonResponse(product_data)
+        'total': str(sum((line.amount for line in priced), Decimal(0))),
+    })
@@ -0,0 +1,179 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+
+from modules.base.cache import bump_version, get_version
+from modules.base.routers import read_from_primary
+from .geometry import Point, decode_polygon, polygon_area, polygon_bounds, polygon_contains
+from .models import DeliveryZone
+
+
+@dataclass(frozen=True)
+class Zone:
+    id: int
+    channel_id: int
+    name: str
+    priority: int
+    polygon: tuple[Point, ...]
+    bounds: tuple[float, float, float, float]
+    area: float
+
+    @property
+    def order(self) -> tuple:
+        return self.priority, self.area, self.id
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        return polygon_contains(self.polygon, latitude, longitude)
+
+
+def load_zones() -> list[Zone]:
+    """
+    Active zones of active channels, read from the primary since they are kept
+    until the next invalidation.
+    """
+    with read_from_primary():
+        rows = list(
+            DeliveryZone.objects.filter(active=True, channel__active=True)
+            .order_by('pk')
+            .values_list('id', 'channel_id', 'name', 'priority', 'vertices')
+        )
+    zones = []
+    for pk, channel_id, name, priority, vertices in rows:
+        polygon = tuple(decode_polygon(bytes(vertices)))
+        if len(polygon) >= 3:
+            zones.append(Zone(pk, channel_id, name, priority, polygon, polygon_bounds(polygon), polygon_area(polygon)))
+    return zones
+
+
+class ZoneIndex:
+    """
+    Uniform grid over the zones. A cell lists the zones covering it whole, which
+    need no further test, and the zones whose border may cross it, which are
+    tested point-in-polygon. The cell size grows when the zones would need more
+    than `max_cells` cells.
+    """
+
+    def __init__(self, zones: Iterable[Zone], cell_size: float, max_cells: int = 1_000_000):
+        self.zones = sorted(zones, key=lambda zone: zone.order)
+        self.channel_ids = frozenset(zone.channel_id for zone in self.zones)
+        self.cell_size = self._fit_cell_size(cell_size, max_cells)
+        self._cells = {}
+        for zone in self.zones:
+            self._add(zone)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _fit_cell_size(self, cell_size: float, max_cells: int) -> float:
+        area = sum((zone.bounds[2] - zone.bounds[0]) * (zone.bounds[3] - zone.bounds[1]) for zone in self.zones)
+        return max(cell_size, math.sqrt(area / max_cells))
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def _add(self, zone: Zone) -> None:
+        size = self.cell_size
+        border = set()
+        # A cell no edge reaches lies wholly inside or wholly outside the zone.
+        for index, (latitude, longitude) in enumerate(zone.polygon):
+            previous_latitude, previous_longitude = zone.polygon[index - 1]
+            low_row, low_column = self._cell(min(latitude, previous_latitude), min(longitude, previous_longitude))
+            high_row, high_column = self._cell(max(latitude, previous_latitude), max(longitude, previous_longitude))
+            for row in range(low_row, high_row + 1):
+                for column in range(low_column, high_column + 1):
+                    border.add((row, column))
+
+        low_row, low_column = self._cell(zone.bounds[0], zone.bounds[1])
+        high_row, high_column = self._cell(zone.bounds[2], zone.bounds[3])
+        for row in range(low_row, high_row + 1):
+            for column in range(low_column, high_column + 1):
+                if (row, column) in border:
+                    self._cells.setdefault((row, column), ([], []))[1].append(zone)
+                elif zone.contains((row + 0.5) * size, (column + 0.5) * size):
+                    self._cells.setdefault((row, column), ([], []))[0].append(zone)
+
+    def locate(self, latitude: float, longitude: float) -> list[Zone]:
+        """
+        Zones holding the point, the winning one first.
+        """
+        cell = self._cells.get(self._cell(latitude, longitude))
+        if cell is None:
+            return []
+        inside, border = cell
+        found = inside + [zone for zone in border if zone.contains(latitude, longitude)]
+        if len(found) > 1:
+            found.sort(key=lambda zone: zone.order)
+        return found
+
+    def classify(self, points: Iterable[tuple[object, float, float]]) -> Iterator[tuple[object, list[Zone]]]:
+        """
+        Locates (key, latitude, longitude) points in bulk, yielding (key, zones).
+        """
+        locate = self.locate
+        for key, latitude, longitude in points:
+            yield key, locate(latitude, longitude)
+
+
+class DeliveryZones:
+    """
+    ZoneIndex of the active delivery zones, held in process memory and rebuilt
+    when another process bumps the version, at most every
+    DELIVERY_ZONES_CHECK_INTERVAL seconds.
+    """
+    version_key = 'channel:delivery_zones:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._index = ZoneIndex([], 1.0)
+
+    def _load(self, version: int) -> None:
+        self._index = ZoneIndex(load_zones(), settings.DELIVERY_ZONE_CELL_SIZE)
+        self._version = version
+
+    def _ensure_loaded(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < settings.DELIVERY_ZONES_CHECK_INTERVAL:
+            return
+
+        version = get_version(self.version_key)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+        self._checked_at = now
+
+    def get_index(self) -> ZoneIndex:
+        self._ensure_loaded()
+        return self._index
+
+    def locate(self, latitude: float, longitude: float) -> list[Zone]:
+        return self.get_index().locate(latitude, longitude)
+
+    def route(self, latitude: float, longitude: float) -> Optional[int]:
+        """
+        Channel of the winning zone holding the point, None when no zone does.
+        """
+        zones = self.locate(latitude, longitude)
+        return zones[0].channel_id if zones else None
+
+    def covers(self, channel_id: int, latitude: float, longitude: float) -> bool:
+        """
+        Whether the channel delivers to the point. A channel without zones delivers anywhere.
+        """
+        index = self.get_index()
+        if channel_id not in index.channel_ids:
+            return True
+        return any(zone.channel_id == channel_id for zone in index.locate(latitude, longitude))
+
+    def invalidate(self) -> None:
+        bump_version(self.version_key)
+        self._version = None
+
+
+delivery_zones = DeliveryZones()
@@ -1,3 +1,37 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import SalesDailyRollup, SkuSalesDailyRollup
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """
+    Read-only reports over the rollup tables; they never touch the order tables.
+    """
+    date_hierarchy = 'day'
+    list_filter = ('channel', 'status')
+    list_select_related = ('channel',)
+    ordering = ('-day', 'channel', 'status')
+
+    def get_queryset(self, request):
+        # Buckets emptied by status changes or deletions stay behind until the next rebuild.
+        return super().get_queryset(request).exclude(order_count=0)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(RollupAdmin):
+    list_display = ('day', 'channel', 'status', 'order_count', 'revenue')
+
+
+@admin.register(SkuSalesDailyRollup)
+class SkuSalesDailyRollupAdmin(RollupAdmin):
+    list_display = ('day', 'channel', 'status', 'sku', 'order_count', 'quantity', 'revenue')
+    search_fields = ('sku',)
@@ -0,0 +1,316 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from modules.channel.zones import delivery_zones
+from modules.customer.models import Customer
+from modules.product.pricing import PriceTable, price_tables
+from .choices import OrderAddressType
+from .models import Order, OrderAddress, OrderItem, OrderItemAdditive, OrderItemVariant, OrderPackage
+from .rollups import apply_orders
+
+ORDER_FIELDS = ('code', 'first_name', 'last_name', 'status', 'type', 'email', 'total_amount')
+ADDRESS_FIELDS = (
+    'type', 'first_name', 'last_name', 'street', 'city', 'country', 'postcode', 'phone', 'latitude', 'longitude',
+)
+ITEM_FIELDS = ('sku', 'qty')
+VARIANT_FIELDS = ('code', 'name')
+ADDITIVE_FIELDS = ('name',)
+CUSTOMER_FIELDS = ('first_name', 'last_name', 'phone')
+
+
+class OrderIngestionError(Exception):
+    def __init__(self, errors: dict):
+        super().__init__('Invalid order payload.')
+        self.errors = errors
+
+
+@dataclass
+class VariantTree:
+    variant: OrderItemVariant
+    packages: list[OrderPackage] = field(default_factory=list)
+
+
+@dataclass
+class ItemTree:
+    item: OrderItem
+    variants: list[VariantTree] = field(default_factory=list)
+    additives: list[OrderItemAdditive] = field(default_factory=list)
+    additive_codes: list[str] = field(default_factory=list)
+
+    @property
+    def amount(self) -> Decimal:
+        unit_price = sum(
+            (tree.variant.price + sum((package.price for package in tree.packages), Decimal(0)) for tree in self.variants),
+            Decimal(0),
+        )
+        unit_price += sum((additive.price for additive in self.additives), Decimal(0))
+        return unit_price * self.item.qty
+
+
+@dataclass
+class OrderTree:
+    order: Order
+    customer: Customer
+    addresses: list[OrderAddress] = field(default_factory=list)
+    items: list[ItemTree] = field(default_factory=list)
+    total_given: bool = False
+
+
+def _round_coordinates(data):
+    # Geocoders send more decimals than the columns keep (6, about 0.1 m).
+    if not isinstance(data, dict):
+        return data
+    return {
+        **data,
+        **{name: Decimal(f'{data[name]:.6f}') for name in ('latitude', 'longitude') if isinstance(data.get(name), float)},
+    }
+
+
+class _Parser:
+    """
+    Turns one order payload into unsaved model instances, collecting field errors
+    under dotted paths (e.g. "items.0.variants.1.price") instead of stopping at the first.
+    """
+
+    def __init__(self):
+        self.errors = {}
+
+    def build(self, model: type[Model], data, fields: Iterable[str], path: str, exclude: Iterable[str] = ()):
+        if not isinstance(data, dict):
+            self.errors[path or '__all__'] = ['Expected an object.']
+            return None
+
+        obj = model(**{name: data[name] for name in fields if name in data})
+        try:
+            obj.clean_fields(exclude=[*exclude, 'created_at', 'updated_at'])
+        except ValidationError as error:
+            for name, messages in error.message_dict.items():
+                self.errors[f'{path}.{name}' if path else name] = messages
+        return obj
+
+    def children(self, data: dict, key: str, path: str, required: bool = False) -> list:
+        value = data.get(key, [])
+        if not isinstance(value, list):
+            self.errors[f'{path}{key}'] = ['Expected a list.']
+            return []
+        if required and not value:
+            self.errors[f'{path}{key}'] = ['This list cannot be empty.']
+        return value
+
+    def parse(self, data) -> Optional[OrderTree]:
+        if not isinstance(data, dict):
+            self.errors['__all__'] = ['Expected an object.']
+            return None
+
+        # total_amount is optional; when sent it has to match the total priced by the server.
+        exclude = ['channel', 'customer'] + ([] if 'total_amount' in data else ['total_amount'])
+        order = self.build(Order, data, ORDER_FIELDS, '', exclude)
+
+        customer_data = data.get('customer') or {}
+        if isinstance(customer_data, dict):
+            customer_data = {name: customer_data.get(name) or getattr(order, name, None) for name in CUSTOMER_FIELDS}
+        customer = self.build(Customer, customer_data, CUSTOMER_FIELDS, 'customer', ['email', 'registered_at'])
+        tree = OrderTree(order, customer)
+
+        for index, address in enumerate(self.children(data, 'addresses', '')):
+            tree.addresses.append(
+                self.build(OrderAddress, _round_coordinates(address), ADDRESS_FIELDS, f'addresses.{index}', ['order'])
+            )
+
+        for index, item_data in enumerate(self.children(data, 'items', '', required=True)):
+            path = f'items.{index}'
+            item = self.build(OrderItem, item_data, ITEM_FIELDS, path, ['order'])
+            if item is None:
+                continue
+            if isinstance(item.qty, int) and item.qty < 1:
+                self.errors[f'{path}.qty'] = ['Ensure this value is greater than or equal to 1.']
+
+            item_tree = ItemTree(item)
+            for variant_index, variant_data in enumerate(self.children(item_data, 'variants', f'{path}.', required=True)):
+                variant = self.build(
+                    OrderItemVariant, variant_data, VARIANT_FIELDS, f'{path}.variants.{variant_index}',
+                    ['order_item', 'name', 'price'],
+                )
+                if variant is not None:
+                    item_tree.variants.append(VariantTree(variant))
+
+            for additive_index, additive_data in enumerate(self.children(item_data, 'additives', f'{path}.')):
+                additive_path = f'{path}.additives.{additive_index}'
+                additive = self.build(
+                    OrderItemAdditive, additive_data, ADDITIVE_FIELDS, additive_path, ['order_item', 'name', 'price']
+                )
+                if additive is None:
+                    continue
+                if not additive_data.get('code'):
+                    self.errors[f'{additive_path}.code'] = ['This field cannot be blank.']
+                item_tree.additives.append(additive)
+                item_tree.additive_codes.append(str(additive_data.get('code')))
+            tree.items.append(item_tree)
+
+        if self.errors:
+            return None
+        order.channel_id = data.get('channel')
+        tree.total_given = 'total_amount' in data
+        return tree
+
+
+def _route_order(tree: OrderTree) -> dict:
+    """
+    Sends an order without a channel to the channel delivering to its shipping
+    address, and rejects shipping addresses outside the zones of the given channel.
+    Addresses without coordinates are not checked.
+    """
+    for index, address in enumerate(tree.addresses):
+        if address.type != OrderAddressType.shipping or address.latitude is None or address.longitude is None:
+            continue
+        point = float(address.latitude), float(address.longitude)
+        channel_id = tree.order.channel_id
+        if channel_id is None:
+            tree.order.channel_id = delivery_zones.route(*point)
+            if tree.order.channel_id is None:
+                return {f'addresses.{index}': ['No channel delivers to this address.']}
+        elif isinstance(channel_id, int) and not delivery_zones.covers(channel_id, *point):
+            return {f'addresses.{index}': [f'Channel {channel_id} does not deliver to this address.']}
+    return {}
+
+
+def _price_order(tree: OrderTree, table: PriceTable) -> dict:
+    """
+    Fills in variant, package and additive prices from the channel's price table
+    and totals the order; any price sent by the client is ignored.
+    """
+    errors = {}
+    for index, item_tree in enumerate(tree.items):
+        sku = item_tree.item.sku
+        for variant_index, variant_tree in enumerate(item_tree.variants):
+            variant = variant_tree.variant
+            try:
+                price = table.get_variant(sku, variant.code)
+            except KeyError as error:
+                errors[f'items.{index}.variants.{variant_index}.code'] = [error.args[0]]
+                continue
+            variant.price = price.price
+            variant.name = variant.name or price.name or price.code
+            variant_tree.packages = [OrderPackage(
+                code=price.package_code,
+                name=price.package_name or price.package_code,
+                price=price.package_price,
+            )]
+
+        for additive_index, (additive, code) in enumerate(zip(item_tree.additives, item_tree.additive_codes)):
+            try:
+                price = table.get_additive(sku, code)
+            except KeyError as error:
+                errors[f'items.{index}.additives.{additive_index}.code'] = [error.args[0]]
+                continue
+            additive.price = price.price
+            additive.name = additive.name or price.name or price.code
+
+    if errors:
+        return errors
+
+    total_amount = sum((item_tree.amount for item_tree in tree.items), Decimal(0))
+    if tree.total_given and tree.order.total_amount != total_amount:
+        return {'total_amount': [f'Expected {total_amount}.']}
+    tree.order.total_amount = total_amount
+    return {}
+
+
+def parse_orders(payloads: list) -> list[OrderTree]:
+    """
+    Validates and prices every payload. Prices come from the in-memory price
+    tables, so no query is made per line. Raises OrderIngestionError keyed by payload index.
+    """
+    trees, errors = {}, {}
+    for index, data in enumerate(payloads):
+        parser = _Parser()
+        tree = parser.parse(data)
+        if tree is None:
+            errors[index] = parser.errors
+        else:
+            trees[index] = tree
+
+    for index, tree in trees.items():
+        if route_errors := _route_order(tree):
+            errors[index] = route_errors
+            continue
+        channel_id = tree.order.channel_id
+        table = price_tables.get(channel_id) if isinstance(channel_id, int) else None
+        if table is None:
+            errors[index] = {'channel': [f'Channel {channel_id!r} does not exist.']}
+        elif order_errors := _price_order(tree, table):
+            errors[index] = order_errors
+
+    if errors:
+        raise OrderIngestionError(errors)
+    return list(trees.values())
+
+
+def _get_customers(trees: list[OrderTree]) -> dict[str, int]:
+    now = timezone.now()
+    new_customers = {}
+    for tree in trees:
+        tree.customer.email, tree.customer.registered_at = tree.order.email, now
+        new_customers.setdefault(tree.order.email, tree.customer)
+
+    Customer.objects.bulk_create(new_customers.values(), ignore_conflicts=True)
+    return dict(Customer.objects.filter(email__in=list(new_customers)).values_list('email', 'pk'))
+
+
+def write_orders(trees: list[OrderTree], batch_size: int = None) -> list[Order]:
+    """
+    Writes the orders with one bulk INSERT per table (split by `batch_size`),
+    all in one transaction. Customers are matched on email and created when missing.
+    """
+    with transaction.atomic():
+        customers = _get_customers(trees)
+        for tree in trees:
+            tree.order.customer_id = customers[tree.order.email]
+        orders = Order.objects.bulk_create([tree.order for tree in trees], batch_size=batch_size)
+
+        addresses, items = [], []
+        for tree in trees:
+            for address in tree.addresses:
+                address.order_id, address.order_created_at = tree.order.pk, tree.order.created_at
+                addresses.append(address)
+            for item_tree in tree.items:
+                item_tree.item.order_id, item_tree.item.order_created_at = tree.order.pk, tree.order.created_at
+                items.append(item_tree)
+        OrderAddress.objects.bulk_create(addresses, batch_size=batch_size)
+        OrderItem.objects.bulk_create([item_tree.item for item_tree in items], batch_size=batch_size)
+
+        variants, additives = [], []
+        for item_tree in items:
+            item = item_tree.item
+            for variant_tree in item_tree.variants:
+                variant_tree.variant.order_item_id = item.pk
+                variant_tree.variant.order_created_at = item.order_created_at
+                variants.append(variant_tree)
+            for additive in item_tree.additives:
+                additive.order_item_id, additive.order_created_at = item.pk, item.order_created_at
+                additives.append(additive)
+        OrderItemVariant.objects.bulk_create([variant_tree.variant for variant_tree in variants], batch_size=batch_size)
+        OrderItemAdditive.objects.bulk_create(additives, batch_size=batch_size)
+
+        packages = []
+        for variant_tree in variants:
+            for package in variant_tree.packages:
+                package.order_item_variant_id = variant_tree.variant.pk
+                package.order_created_at = variant_tree.variant.order_created_at
+                packages.append(package)
+        OrderPackage.objects.bulk_create(packages, batch_size=batch_size)
+
+        # bulk_create sends no post_save, so the rollups are updated here.
+        apply_orders([order.pk for order in orders])
+
+    return orders
+
+
+def ingest_orders(payloads: list, batch_size: int = None) -> list[Order]:
+    return write_orders(parse_orders(payloads), batch_size)
@@ -0,0 +1,35 @@
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from modules.order.partitions import PARTITIONED_TABLES, archive_partitions, is_partitioned
+
+
+def _months_ago(months: int) -> datetime:
+    today = date.today()
+    month = today.year * 12 + today.month - 1 - months
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        'Detaches the order partitions older than the retention window, exports each one to '
+        'a gzip-compressed JSONL archive and drops it. The sales rollups keep the archived days; '
+        'rebuild_sales_rollups leaves them alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-months', type=int, default=settings.ORDER_RETENTION_MONTHS)
+        parser.add_argument('--directory', default=settings.ORDER_ARCHIVE_DIR)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql' or not all(is_partitioned(table) for table in PARTITIONED_TABLES):
+            raise CommandError('The order tables are not partitioned, see create_order_partitions.')
+
+        before = _months_ago(options['retention_months'])
+        archived = archive_partitions(before, options['directory'])
+        for name, count, path in archived:
+            self.stdout.write(f'{name}: {count} row(s) -> {path}')
+        self.stdout.write(self.style.SUCCESS(f'{len(archived)} partition(s) older than {before:%Y-%m-%d} archived.'))
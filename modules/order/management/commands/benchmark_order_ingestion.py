@@ -0,0 +1,102 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.channel.models import Channel
+from modules.customer.models import Customer
+from modules.order.choices import OrderAddressType, OrderStatus, OrderType
+from modules.order.ingestion import ingest_orders
+from modules.order.models import Order
+from modules.product.pricing import PriceTable, price_tables
+
+
+def build_sample_order(table: PriceTable, code: str, email: str, items: int) -> dict:
+    lines = random.sample(list(table.variants), min(items, len(table.variants)))
+    additives = {}
+    for sku, additive_code in table.additives:
+        additives.setdefault(sku, []).append(additive_code)
+
+    return {
+        'channel': table.channel_id,
+        'code': code,
+        'first_name': 'Bench',
+        'last_name': 'Mark',
+        'email': email,
+        'status': OrderStatus.processing,
+        'type': OrderType.online,
+        'addresses': [{
+            'type': OrderAddressType.shipping,
+            'first_name': 'Bench',
+            'last_name': 'Mark',
+            'street': 'Marszałkowska 1',
+            'city': 'Warszawa',
+            'country': 'PL',
+            'postcode': '00-001',
+            'phone': '+48123456789',
+        }],
+        'items': [
+            {
+                'sku': sku,
+                'qty': random.randint(1, 3),
+                'variants': [{'code': variant_code}],
+                'additives': [{'code': additive_code} for additive_code in additives.get(sku, [])[:2]],
+            }
+            for sku, variant_code in lines
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures order ingestion throughput: writes --batches batches of each --batch-size '
+        'and reports orders per second. The benchmark orders and customers are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, action='append', dest='batch_sizes', help='Can be repeated.')
+        parser.add_argument('--batches', type=int, default=20)
+        parser.add_argument('--items', type=int, default=3, help='Items per order.')
+        parser.add_argument('--customers', type=int, default=100, help='Distinct customers the orders are spread over.')
+        parser.add_argument('--channel', type=int, help='Channel id, defaults to the first channel.')
+        parser.add_argument('--keep', action='store_true', help='Keep the orders that were written.')
+
+    def handle(self, *args, **options):
+        channel = Channel.objects.filter(pk=options['channel']) if options['channel'] else Channel.objects.order_by('pk')
+        channel = channel.first()
+        if not channel:
+            raise CommandError('No channel to write the orders to.')
+        table = price_tables.get(channel.pk)
+        if not table.variants:
+            raise CommandError(f'Channel {channel.pk} has no products to order.')
+
+        run = uuid.uuid4().hex[:8]
+        prefix = f'bench-{run}-'
+        emails = [f'bench-{run}-{index}@example.invalid' for index in range(options['customers'])]
+
+        try:
+            for batch_size in options['batch_sizes'] or [1, 10, 50, 200]:
+                durations = []
+                for batch in range(options['batches']):
+                    payloads = [
+                        build_sample_order(
+                            table, f'{prefix}{batch_size}-{batch}-{index}', random.choice(emails), options['items']
+                        )
+                        for index in range(batch_size)
+                    ]
+                    started = time.perf_counter()
+                    ingest_orders(payloads)
+                    durations.append(time.perf_counter() - started)
+
+                durations.sort()
+                orders_per_second = batch_size * len(durations) / sum(durations)
+                self.stdout.write(
+                    f'batch size {batch_size:>5}: {orders_per_second:10.1f} orders/s, '
+                    f'p50 {durations[len(durations) // 2] * 1000:8.1f} ms, '
+                    f'max {durations[-1] * 1000:8.1f} ms per batch'
+                )
+        finally:
+            if not options['keep']:
+                Order.objects.filter(code__startswith=prefix).delete()
+                Customer.objects.filter(email__in=emails).delete()
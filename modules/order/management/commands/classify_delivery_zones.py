@@ -0,0 +1,91 @@
+import csv
+import json
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from modules.channel.zones import ZoneIndex, load_zones
+from modules.order.choices import OrderAddressType
+from modules.order.models import OrderAddress
+
+
+class Command(BaseCommand):
+    help = (
+        'Locates geocoded order addresses in the current delivery zones, e.g. to plan zone changes: '
+        'counts addresses per zone, outside every zone and outside the zones of their own channel, '
+        'and reports JSON. --output writes one CSV row per address.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day of orders, YYYY-MM-DD.')
+        parser.add_argument('--until', help='Last day of orders, YYYY-MM-DD.')
+        parser.add_argument('--type', choices=OrderAddressType.values, default=OrderAddressType.shipping)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--output', help='CSV path: address_id, order_id, channel_id, zone_ids, routed_channel_id.')
+
+    def get_addresses(self, options: dict):
+        addresses = OrderAddress.objects.filter(type=options['type'], latitude__isnull=False, longitude__isnull=False)
+        try:
+            if options['since']:
+                since = timezone.make_aware(datetime.combine(date.fromisoformat(options['since']), dt_time.min))
+                addresses = addresses.filter(order_created_at__gte=since)
+            if options['until']:
+                until = date.fromisoformat(options['until']) + timedelta(days=1)
+                until = timezone.make_aware(datetime.combine(until, dt_time.min))
+                addresses = addresses.filter(order_created_at__lt=until)
+        except ValueError as error:
+            raise CommandError(error)
+        return (
+            addresses.order_by()
+            .values_list('id', 'order_id', 'order__channel_id', 'latitude', 'longitude')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+    def handle(self, *args, **options):
+        index = ZoneIndex(load_zones(), settings.DELIVERY_ZONE_CELL_SIZE)
+        addresses = self.get_addresses(options)
+        points = (
+            ((pk, order_id, channel_id), float(latitude), float(longitude))
+            for pk, order_id, channel_id, latitude, longitude in addresses
+        )
+
+        per_zone = dict.fromkeys((zone.id for zone in index.zones), 0)
+        counts = {'addresses': 0, 'unzoned': 0, 'overlapping': 0, 'outside_own_channel': 0, 'rerouted': 0}
+        output = open(options['output'], 'w', newline='') if options['output'] else None
+        writer = csv.writer(output) if output else None
+        elapsed = 0.0
+        try:
+            if writer:
+                writer.writerow(['address_id', 'order_id', 'channel_id', 'zone_ids', 'routed_channel_id'])
+            started = time.perf_counter()
+            for (pk, order_id, channel_id), zones in index.classify(points):
+                counts['addresses'] += 1
+                for zone in zones:
+                    per_zone[zone.id] += 1
+                routed = zones[0].channel_id if zones else None
+                if not zones:
+                    counts['unzoned'] += 1
+                elif len(zones) > 1:
+                    counts['overlapping'] += 1
+                if channel_id in index.channel_ids and all(zone.channel_id != channel_id for zone in zones):
+                    counts['outside_own_channel'] += 1
+                if routed is not None and routed != channel_id:
+                    counts['rerouted'] += 1
+                if writer:
+                    writer.writerow([pk, order_id, channel_id, ' '.join(str(zone.id) for zone in zones), routed or ''])
+            elapsed = time.perf_counter() - started
+        finally:
+            if output:
+                output.close()
+
+        self.stdout.write(json.dumps({
+            **counts,
+            'zones': [
+                {'id': zone.id, 'channel_id': zone.channel_id, 'name': zone.name, 'addresses': per_zone[zone.id]}
+                for zone in index.zones
+            ],
+            'seconds': round(elapsed, 3),
+        }, indent=2, ensure_ascii=False))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from modules.order.partitions import PARTITIONED_TABLES, convert_to_partitioned, create_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates the monthly partitions of the order tables for the coming months (PostgreSQL only). '
+        'Run it from cron well ahead of the last partition; rows outside every partition go to <table>_default.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='First rebuild unpartitioned order tables as partitioned ones. Locks and copies the tables.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+
+        unpartitioned = [table for table in PARTITIONED_TABLES if not is_partitioned(table)]
+        if unpartitioned and not options['convert']:
+            raise CommandError(f'Not partitioned yet: {", ".join(unpartitioned)}. Pass --convert to convert them.')
+        if unpartitioned:
+            with transaction.atomic():
+                convert_to_partitioned(connection, options['months_ahead'])
+            self.stdout.write(f'Converted: {", ".join(unpartitioned)}.')
+
+        created = create_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f'Created {name}.')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partition(s) created.'))
@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.order.partitions import read_archive
+
+
+class Command(BaseCommand):
+    help = 'Streams the rows of order archives as JSONL, optionally only those matching --where filters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Archives written by archive_order_partitions.')
+        parser.add_argument(
+            '--where', action='append', default=[],
+            help='column=value, can be repeated; e.g. --where code=A-1001 --where channel_id=2.',
+        )
+
+    def handle(self, *args, **options):
+        filters = []
+        for condition in options['where']:
+            column, separator, value = condition.partition('=')
+            if not separator:
+                raise CommandError(f'Invalid filter "{condition}", expected column=value.')
+            filters.append((column, value))
+
+        for path in options['paths']:
+            for row in read_archive(path):
+                if all(str(row.get(column)) == value for column, value in filters):
+                    self.stdout.write(json.dumps(row, ensure_ascii=False))
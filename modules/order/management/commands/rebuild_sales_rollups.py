@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.order.partitions import get_first_retained_day
+from modules.order.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the sales rollups of the given days and recomputes them from the order tables, e.g. after a '
+        'backfill or an import. Without --since, every day up to --until is rebuilt, except the archived days: '
+        'their orders are gone and their rollups are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild, YYYY-MM-DD; at most the first day not archived.')
+        parser.add_argument('--until', help='Last day to rebuild, YYYY-MM-DD.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as error:
+            raise CommandError(error)
+
+        first_day = get_first_retained_day()
+        if first_day and any(day and day < first_day for day in (since, until)):
+            raise CommandError(
+                f'The orders before {first_day:%Y-%m-%d} are archived; their rollups cannot be rebuilt.'
+            )
+
+        count = rebuild_rollups(since, until, options['chunk_size'])
+        if first_day and since is None:
+            self.stdout.write(f'Rollups before {first_day:%Y-%m-%d} were left as they are.')
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt from {count} order(s).'))
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channel', '0002_channel_currency'),
+        ('order', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending_payment', 'Pending Payment'), ('processing', 'Processing'), ('complete', 'Complete'), ('closed', 'Closed'), ('delivered', 'Delivered'), ('canceled', 'Canceled'), ('not_delivered', 'Not Delivered')], max_length=50)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='channel.channel')),
+            ],
+            options={
+                'db_table': 'sales_daily_rollup',
+                'indexes': [models.Index(fields=['day', 'channel'], name='sales_daily_day_5cfde2_idx')],
+                'unique_together': {('channel', 'day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SkuSalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending_payment', 'Pending Payment'), ('processing', 'Processing'), ('complete', 'Complete'), ('closed', 'Closed'), ('delivered', 'Delivered'), ('canceled', 'Canceled'), ('not_delivered', 'Not Delivered')], max_length=50)),
+                ('sku', models.CharField(max_length=255)),
+                ('order_count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sku_sales_rollups', to='channel.channel')),
+            ],
+            options={
+                'db_table': 'sku_sales_daily_rollup',
+                'indexes': [models.Index(fields=['day', 'channel'], name='sku_sales_d_day_fe28d9_idx'), models.Index(fields=['sku', 'day'], name='sku_sales_d_sku_ebd0a0_idx')],
+                'unique_together': {('channel', 'day', 'status', 'sku')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0002_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderaddress',
+            name='order',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='address', to='order.order'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='order.order'),
+        ),
+        migrations.AlterField(
+            model_name='orderitemadditive',
+            name='order_item',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='additives', to='order.orderitem'),
+        ),
+        migrations.AlterField(
+            model_name='orderitemvariant',
+            name='order_item',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='order.orderitem'),
+        ),
+        migrations.AlterField(
+            model_name='orderpackage',
+            name='order_item_variant',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='packages', to='order.orderitemvariant'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# (model, link to the row the timestamp is copied from, its field), parents first.
+COPIES = (
+    ('OrderAddress', 'order', 'created_at'),
+    ('OrderItem', 'order', 'created_at'),
+    ('OrderItemVariant', 'order_item', 'order_created_at'),
+    ('OrderItemAdditive', 'order_item', 'order_created_at'),
+    ('OrderPackage', 'order_item_variant', 'order_created_at'),
+)
+
+
+def fill_order_created_at(apps, schema_editor):
+    for model_name, link, source in COPIES:
+        model = apps.get_model('order', model_name)
+        parent = model._meta.get_field(link).related_model
+        model.objects.update(
+            order_created_at=Subquery(parent.objects.filter(pk=OuterRef(f'{link}_id')).values(source)[:1])
+        )
+        # Rows of a deleted parent (the links have no database constraint) keep their own date.
+        model.objects.filter(order_created_at__isnull=True).update(order_created_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_order_address_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderaddress',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitemvariant',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitemadditive',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpackage',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_order_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderaddress',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='orderitemvariant',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='orderitemadditive',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='orderpackage',
+            name='order_created_at',
+            field=models.DateTimeField(editable=False),
+        ),
+    ]
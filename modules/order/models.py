@@ -5,6 +5,12 @@ from modules.customer.models import Customer
 from .choices import OrderStatus, OrderType, OrderAddressType
 
 
+# The order tables can be range-partitioned by month on PostgreSQL (see partitions.py): the
+# order on created_at, the rows under it on order_created_at, a copy of the order's created_at
+# (set by the pre_save signals, or by the caller for bulk_create), so that a whole order lands
+# in one month and is archived together. A foreign key cannot reference a partitioned table
+# whose key does not include the partition key, so the links between them are kept by Django
+# only (db_constraint=False).
 class Order(models.Model):
     channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name='orders')
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
@@ -35,7 +41,7 @@ class Order(models.Model):
 
 
 class OrderAddress(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='address')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='address', db_constraint=False)
     type = models.CharField(
         max_length=50,
         choices=OrderAddressType.choices,
@@ -48,7 +54,11 @@ class OrderAddress(models.Model):
     country = models.CharField(max_length=255)
     postcode = models.CharField(max_length=20)
     phone = models.CharField(max_length=15)
+    # Geocoded position, checked against the delivery zones of the channel.
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     
+    order_created_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -57,10 +67,11 @@ class OrderAddress(models.Model):
 
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_constraint=False)
     sku = models.CharField(max_length=255)
     qty = models.IntegerField()
     
+    order_created_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -72,11 +83,12 @@ class OrderItem(models.Model):
 
 
 class OrderItemVariant(models.Model):
-    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='variants')
+    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='variants', db_constraint=False)
     code = models.CharField(max_length=255)
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     
+    order_created_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -88,10 +100,11 @@ class OrderItemVariant(models.Model):
 
 
 class OrderItemAdditive(models.Model):
-    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='additives')
+    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='additives', db_constraint=False)
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     
+    order_created_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -103,11 +116,12 @@ class OrderItemAdditive(models.Model):
 
 
 class OrderPackage(models.Model):
-    order_item_variant = models.ForeignKey(OrderItemVariant, on_delete=models.CASCADE, related_name='packages')
+    order_item_variant = models.ForeignKey(OrderItemVariant, on_delete=models.CASCADE, related_name='packages', db_constraint=False)
     code = models.CharField(max_length=255)
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     
+    order_created_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -116,3 +130,42 @@ class OrderPackage(models.Model):
 
     class Meta:
         db_table = "order_package"
+
+
+class SalesDailyRollup(models.Model):
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name='sales_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=50, choices=OrderStatus.choices)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "sales_daily_rollup"
+        unique_together = ('channel', 'day', 'status')
+        indexes = [
+            models.Index(fields=['day', 'channel']),
+        ]
+
+
+class SkuSalesDailyRollup(models.Model):
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name='sku_sales_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=50, choices=OrderStatus.choices)
+    sku = models.CharField(max_length=255)
+    order_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "sku_sales_daily_rollup"
+        unique_together = ('channel', 'day', 'status', 'sku')
+        indexes = [
+            models.Index(fields=['day', 'channel']),
+            models.Index(fields=['sku', 'day']),
+        ]
@@ -0,0 +1,270 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Iterator, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Table -> partition key. The rows under an order are partitioned by the order's
+# created_at, copied to order_created_at, so an order never spans two partitions.
+PARTITIONED_TABLES = {
+    'order': 'created_at',
+    'order_address': 'order_created_at',
+    'order_item': 'order_created_at',
+    'order_item_variant': 'order_created_at',
+    'order_item_additive': 'order_created_at',
+    'order_package': 'order_created_at',
+}
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def _bound(value: date) -> datetime:
+    return datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+
+
+def get_partition_name(table: str, month: date) -> str:
+    return f'{table}_p{month:%Y%m}'
+
+
+def is_partitioned(table: str, using=None) -> bool:
+    using = using or connection
+    if using.vendor != 'postgresql':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+            [using.ops.quote_name(table)],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table: str, using=None) -> list[tuple[str, Optional[datetime], Optional[datetime]]]:
+    """
+    Returns (name, lower bound, upper bound) of the range partitions of `table`,
+    oldest first. The default partition is not included.
+    """
+    using = using or connection
+    with using.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [using.ops.quote_name(table)],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        if bound == 'DEFAULT':
+            continue
+        # FOR VALUES FROM ('2026-01-01 00:00:00+00') TO ('2026-02-01 00:00:00+00')
+        lower, upper = [part.split("'")[1] for part in bound.split(' TO ')]
+        partitions.append((name, datetime.fromisoformat(lower), datetime.fromisoformat(upper)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def get_first_retained_day(using=None) -> Optional[date]:
+    """
+    First local day whose orders are all still in the order partitions, i.e.
+    after every archived month; None when the order table is not partitioned.
+    """
+    using = using or connection
+    if not is_partitioned('order', using):
+        return None
+    partitions = list_partitions('order', using)
+    if not partitions:
+        return None
+    # Months are bounded in UTC; the local day a month starts in is partly in the month before.
+    start = timezone.localtime(partitions[0][1])
+    return start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+
+
+def create_month_partition(cursor, table: str, month: date, quote_name) -> bool:
+    name = get_partition_name(table, month)
+    cursor.execute('SELECT to_regclass(%s)', [quote_name(name)])
+    if cursor.fetchone()[0] is not None:
+        return False
+    cursor.execute(
+        f'CREATE TABLE {quote_name(name)} PARTITION OF {quote_name(table)} FOR VALUES FROM (%s) TO (%s)',
+        [_bound(month), _bound(_add_months(month, 1))],
+    )
+    return True
+
+
+def create_partitions(months_ahead: int = 3, start: Optional[date] = None, using=None) -> list[str]:
+    """
+    Creates the missing monthly partitions of every order table from the month
+    of `start` (default: this month) up to `months_ahead` months later.
+    """
+    using = using or connection
+    start = _month_start(start or date.today())
+    created = []
+    with transaction.atomic(using=using.alias), using.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            for offset in range(months_ahead + 1):
+                month = _add_months(start, offset)
+                if create_month_partition(cursor, table, month, using.ops.quote_name):
+                    created.append(get_partition_name(table, month))
+    return created
+
+
+def convert_to_partitioned(using, months_ahead: int = 3) -> None:
+    """
+    Rebuilds the order tables as tables partitioned by month on their
+    PARTITIONED_TABLES key, copying their rows over. Indexes and constraints
+    keep their names; the primary key becomes (id, key) as PostgreSQL requires.
+    """
+    qn = using.ops.quote_name
+    with using.cursor() as cursor:
+        for table, key in PARTITIONED_TABLES.items():
+            if is_partitioned(table, using):
+                continue
+
+            cursor.execute(
+                """
+                SELECT pg_get_indexdef(pg_index.indexrelid)
+                FROM pg_index
+                WHERE pg_index.indrelid = to_regclass(%s)
+                AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE pg_constraint.conindid = pg_index.indexrelid)
+                """,
+                [qn(table)],
+            )
+            index_definitions = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND contype IN ('c', 'f')
+                """,
+                [qn(table)],
+            )
+            constraints = cursor.fetchall()
+            cursor.execute(f'SELECT min({qn(key)}), max(id) FROM {qn(table)}')
+            first_created_at, max_id = cursor.fetchone()
+
+            legacy = f'{table}_unpartitioned'
+            cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+            cursor.execute(
+                f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS) '
+                f'PARTITION BY RANGE ({qn(key)})'
+            )
+
+            first_day = first_created_at.astimezone(dt_timezone.utc).date() if first_created_at else date.today()
+            month = _month_start(first_day)
+            last_month = _add_months(_month_start(date.today()), months_ahead)
+            while month <= last_month:
+                create_month_partition(cursor, table, month, qn)
+                month = _add_months(month, 1)
+            cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+
+            cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}')
+            cursor.execute(f'DROP TABLE {qn(legacy)}')
+
+            # Identity columns are not supported on partitioned tables before PostgreSQL 17.
+            sequence = f'{table}_id_seq'
+            cursor.execute(f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id')
+            cursor.execute('SELECT setval(%s, %s, %s)', [qn(sequence), max_id or 1, max_id is not None])
+            cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{qn(sequence)}')")
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(key)})')
+
+            for definition in index_definitions:
+                cursor.execute(definition)
+            for name, definition in constraints:
+                cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def export_table(name: str, path: str, using=None, chunk_size: int = 5000) -> int:
+    """
+    Writes every row of table `name` to `path` as gzip-compressed JSONL, reading
+    through a server-side cursor so memory use does not depend on the table size.
+    """
+    using = using or connection
+    count = 0
+    tmp_path = f'{path}.tmp'
+    with transaction.atomic(using=using.alias):
+        using.ensure_connection()
+        cursor = using.connection.cursor(name=f'export_{name}')
+        with cursor, gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+            cursor.itersize = chunk_size
+            cursor.execute(f'SELECT * FROM {using.ops.quote_name(name)} ORDER BY id')
+            columns = None
+            for row in cursor:
+                columns = columns or [column.name for column in cursor.description]
+                file.write(json.dumps(dict(zip(columns, row)), default=_json_default) + '\n')
+                count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def archive_partitions(before: datetime, directory: str, using=None) -> list[tuple[str, int, str]]:
+    """
+    Detaches every partition whose range ends on or before `before`, exports it
+    to `<directory>/<partition>.jsonl.gz` and drops it. The months of all order
+    tables are detached in one transaction, so an order and its rows go together.
+    A partition whose export fails stays behind as a detached table and is
+    picked up by the next run. Returns (partition, row count, archive path) for
+    each archived partition.
+    """
+    using = using or connection
+    qn = using.ops.quote_name
+    os.makedirs(directory, exist_ok=True)
+
+    with transaction.atomic(using=using.alias), using.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            for name, lower, upper in list_partitions(table, using):
+                if upper <= before:
+                    cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+
+    archived = []
+    for table in PARTITIONED_TABLES:
+        for name in _detached_partitions(table, using):
+            path = os.path.join(directory, f'{name}.jsonl.gz')
+            count = export_table(name, path, using)
+            with using.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {qn(name)}')
+            archived.append((name, count, path))
+    return archived
+
+
+def _detached_partitions(table: str, using) -> list[str]:
+    with using.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT relname FROM pg_class
+            WHERE relkind = 'r' AND relname ~ %s AND NOT relispartition
+            ORDER BY relname
+            """,
+            [f'^{table}_p[0-9]{{6}}$'],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def read_archive(path: str) -> Iterator[dict]:
+    """
+    Streams the rows of an archive written by archive_partitions, one dict per row.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
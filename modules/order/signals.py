@@ -0,0 +1,81 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Order, OrderAddress, OrderItem, OrderItemAdditive, OrderItemVariant, OrderPackage
+from .rollups import move_orders, schedule_apply, withdraw_orders
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._rollup_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollups(sender, instance, created, **kwargs):
+    if created:
+        schedule_apply([instance.pk])
+    elif instance.status != instance._rollup_status:
+        move_orders([instance.pk], instance._rollup_status)
+    instance._rollup_status = instance.status
+
+
+@receiver(pre_delete, sender=Order)
+def remove_from_sales_rollups(sender, instance, **kwargs):
+    withdraw_orders([instance.pk])
+    # Clears the pending order once the delete commits; it is found no more.
+    schedule_apply([instance.pk])
+
+
+def get_line_order_id(instance) -> int:
+    if isinstance(instance, OrderItem):
+        return instance.order_id
+    if isinstance(instance, OrderPackage):
+        return instance.order_item_variant.order_item.order_id
+    return instance.order_item.order_id
+
+
+# A line changed after its order was counted takes the order out of the rollups
+# until the change commits. Deleting an order sends pre_delete for its lines first.
+@receiver(pre_save, sender=OrderItem)
+@receiver(pre_save, sender=OrderItemVariant)
+@receiver(pre_save, sender=OrderItemAdditive)
+@receiver(pre_save, sender=OrderPackage)
+@receiver(pre_delete, sender=OrderItem)
+@receiver(pre_delete, sender=OrderItemVariant)
+@receiver(pre_delete, sender=OrderItemAdditive)
+@receiver(pre_delete, sender=OrderPackage)
+def withdraw_line_order(sender, instance, **kwargs):
+    withdraw_orders([get_line_order_id(instance)])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_save, sender=OrderItemVariant)
+@receiver(post_save, sender=OrderItemAdditive)
+@receiver(post_save, sender=OrderPackage)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=OrderItemVariant)
+@receiver(post_delete, sender=OrderItemAdditive)
+@receiver(post_delete, sender=OrderPackage)
+def reapply_line_order(sender, instance, **kwargs):
+    schedule_apply([get_line_order_id(instance)])
+
+
+# The rows under an order are partitioned by the order's created_at (see partitions.py).
+@receiver(pre_save, sender=OrderAddress)
+@receiver(pre_save, sender=OrderItem)
+def copy_order_created_at(sender, instance, **kwargs):
+    if instance.order_created_at is None:
+        instance.order_created_at = instance.order.created_at
+
+
+@receiver(pre_save, sender=OrderItemVariant)
+@receiver(pre_save, sender=OrderItemAdditive)
+def copy_item_order_created_at(sender, instance, **kwargs):
+    if instance.order_created_at is None:
+        instance.order_created_at = instance.order_item.order_created_at
+
+
+@receiver(pre_save, sender=OrderPackage)
+def copy_variant_order_created_at(sender, instance, **kwargs):
+    if instance.order_created_at is None:
+        instance.order_created_at = instance.order_item_variant.order_created_at
@@ -1,3 +1,431 @@
-from django.test import TestCase
+import copy
+import io
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from modules.channel.models import Channel, DeliveryZone
+from modules.channel.zones import delivery_zones
+from modules.customer.models import Customer
+from modules.product.choices import ProductStatus
+from modules.product.models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    Package,
+    PackageInfo,
+    Product,
+    ProductAdditive,
+    ProductVariant,
+    ProductVariantInfo,
+)
+from modules.product.pricing import price_tables
+from modules.store.models import Store
+from .choices import OrderAddressType, OrderStatus, OrderType
+from .ingestion import OrderIngestionError, ingest_orders, parse_orders
+from .models import (
+    Order,
+    OrderAddress,
+    OrderItem,
+    OrderItemAdditive,
+    OrderItemVariant,
+    OrderPackage,
+    SalesDailyRollup,
+    SkuSalesDailyRollup,
+)
+from .partitions import (
+    PARTITIONED_TABLES,
+    archive_partitions,
+    convert_to_partitioned,
+    create_partitions,
+    get_first_retained_day,
+    is_partitioned,
+    read_archive,
+)
+from .rollups import get_rollup_day, rebuild_rollups
+
+ORDER_MODELS = {
+    'order': Order,
+    'order_address': OrderAddress,
+    'order_item': OrderItem,
+    'order_item_variant': OrderItemVariant,
+    'order_item_additive': OrderItemAdditive,
+    'order_package': OrderPackage,
+}
+
+
+def create_channel(code: str = 'main') -> Channel:
+    return Channel.objects.create(
+        code=code, name=code.title(), status='online', city='Warszawa', phone='1', base_language='en', currency='PLN',
+    )
+
+
+def create_menu(*channels: Channel) -> None:
+    """
+    Margherita in S (20.00) and L (28.00), both in a 2.00 box, with basil (1.50).
+    """
+    # The store migration creates it; TransactionTestCase flushes it after the first test.
+    store, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+    category = Category.objects.create(code='pizza')
+    for channel in channels:
+        CategoryChannel.objects.create(category=category, channel=channel)
+    product = Product.objects.create(sku='margherita', category=category, status=ProductStatus.online)
+    package = Package.objects.create(code='box', price=Decimal('2.00'))
+    PackageInfo.objects.create(package=package, store=store, name='Box')
+    for code, name, price in (('S', 'Small', '20.00'), ('L', 'Large', '28.00')):
+        variant = ProductVariant.objects.create(product=product, code=code, price=Decimal(price), package=package)
+        ProductVariantInfo.objects.create(product_variant=variant, store=store, name=name)
+    additive = Additive.objects.create(code='basil', price=Decimal('1.50'))
+    AdditiveInfo.objects.create(additive=additive, store=store, name='Basil')
+    ProductAdditive.objects.create(product=product, additive=additive)
+
+
+def create_order(channel: Channel, customer: Customer, code: str) -> dict[str, list[int]]:
+    """
+    Writes an order with one row in every order table, returning the ids per table.
+    """
+    order = Order.objects.create(
+        channel=channel, customer=customer, code=code, first_name='Jan', last_name='Kowalski',
+        status=OrderStatus.processing, type=OrderType.online, total_amount=Decimal('31.00'), email=customer.email,
+    )
+    address = OrderAddress.objects.create(
+        order=order, type=OrderAddressType.shipping, first_name='Jan', last_name='Kowalski',
+        street='ul. Testowa 1', city='Warszawa', country='PL', postcode='00-001', phone='1',
+    )
+    item = OrderItem.objects.create(order=order, sku='margherita', qty=1)
+    variant = OrderItemVariant.objects.create(order_item=item, code='L', name='Large', price=Decimal('28.00'))
+    additive = OrderItemAdditive.objects.create(order_item=item, name='Basil', price=Decimal('1.00'))
+    package = OrderPackage.objects.create(order_item_variant=variant, code='box', name='Box', price=Decimal('2.00'))
+    return {
+        'order': [order.pk],
+        'order_address': [address.pk],
+        'order_item': [item.pk],
+        'order_item_variant': [variant.pk],
+        'order_item_additive': [additive.pk],
+        'order_package': [package.pk],
+    }
+
+
+def get_rollups() -> dict:
+    # Rows emptied by a status change or a delete are kept at zero.
+    return {
+        'orders': sorted(
+            SalesDailyRollup.objects.exclude(order_count=0, revenue=0)
+            .values_list('day', 'status', 'order_count', 'revenue')
+        ),
+        'skus': sorted(
+            SkuSalesDailyRollup.objects.exclude(order_count=0, quantity=0, revenue=0)
+            .values_list('day', 'status', 'sku', 'order_count', 'quantity', 'revenue')
+        ),
+    }
+
+
+def move_order(ids: dict[str, list[int]], created_at: datetime) -> None:
+    Order.objects.filter(pk__in=ids['order']).update(created_at=created_at)
+    for table, table_ids in ids.items():
+        if table != 'order':
+            ORDER_MODELS[table].objects.filter(pk__in=table_ids).update(order_created_at=created_at)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL.')
+class PartitionTests(TransactionTestCase):
+    """
+    Converts the order tables, archives the old months and reads the archives back.
+    Leaves the tables partitioned for the tests that run after it.
+    """
+
+    def setUp(self):
+        self.channel = create_channel()
+        self.customer = Customer.objects.create(
+            first_name='Jan', last_name='Kowalski', email='jan@example.com', registered_at=timezone.now(),
+        )
+
+        self.before = datetime.combine(date.today().replace(day=1), datetime.min.time(), dt_timezone.utc)
+
+    def partition(self, start: date) -> None:
+        if not all(is_partitioned(table) for table in PARTITIONED_TABLES):
+            with transaction.atomic():
+                convert_to_partitioned(connection, months_ahead=1)
+        create_partitions(months_ahead=2, start=start)
+        self.assertTrue(all(is_partitioned(table) for table in PARTITIONED_TABLES))
+
+    def test_convert_create_archive_and_read_back(self):
+        before = self.before
+        # An order from the last minute of last month whose rows are written this month.
+        old_created_at = before - timedelta(minutes=1)
+        if is_partitioned('order'):
+            self.partition(old_created_at.date())
+        old = create_order(self.channel, self.customer, 'old')
+        move_order(old, old_created_at)
+        self.partition(old_created_at.date())
+
+        # Ids keep counting from the copied rows.
+        new = create_order(self.channel, self.customer, 'new')
+        for table, ids in new.items():
+            self.assertGreater(ids[0], old[table][0])
+            self.assertEqual(ORDER_MODELS[table].objects.filter(pk__in=old[table] + ids).count(), 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            archived = archive_partitions(before, directory)
+            read_back = {table: [] for table in PARTITIONED_TABLES}
+            for name, count, path in archived:
+                rows = list(read_archive(path))
+                self.assertEqual(len(rows), count)
+                read_back[name.rsplit('_p', 1)[0]] += [row['id'] for row in rows]
+
+        self.assertEqual(read_back, old)
+        self.assertEqual(Order.objects.get().code, 'new')
+        for table, ids in new.items():
+            self.assertEqual(list(ORDER_MODELS[table].objects.values_list('pk', flat=True)), ids)
+
+    def test_rebuild_keeps_archived_days(self):
+        old_created_at = self.before - timedelta(days=3)
+        self.partition(old_created_at.date())
+        move_order(create_order(self.channel, self.customer, 'old'), old_created_at)
+        create_order(self.channel, self.customer, 'new')
+        rebuild_rollups()
+        rollups = get_rollups()
+        old_day = get_rollup_day(old_created_at)
+        self.assertEqual(rollups['orders'][0], (old_day, OrderStatus.processing, 1, Decimal('31.00')))
+
+        with tempfile.TemporaryDirectory() as directory:
+            archive_partitions(self.before, directory)
+        self.assertGreater(get_first_retained_day(), old_day)
+        self.assertEqual(rebuild_rollups(), 1)
+        self.assertEqual(get_rollups(), rollups)
+
+        stdout = io.StringIO()
+        call_command('rebuild_sales_rollups', stdout=stdout)
+        self.assertIn('Rollups rebuilt from 1 order(s).', stdout.getvalue())
+        self.assertEqual(get_rollups(), rollups)
+        with self.assertRaisesMessage(CommandError, 'are archived'):
+            call_command('rebuild_sales_rollups', since=old_day.isoformat())
+        self.assertEqual(get_rollups(), rollups)
+
+
+ORDER_PAYLOAD = {
+    'code': 'A1',
+    'first_name': 'Jan',
+    'last_name': 'Kowalski',
+    'status': OrderStatus.processing,
+    'type': OrderType.online,
+    'email': 'jan@example.com',
+    'customer': {'phone': '500100200'},
+    'addresses': [{
+        'type': OrderAddressType.shipping, 'first_name': 'Jan', 'last_name': 'Kowalski', 'street': 'ul. Testowa 1',
+        'city': 'Warszawa', 'country': 'PL', 'postcode': '00-001', 'phone': '500100200',
+        'latitude': 52.2297001234, 'longitude': 21.0122001234,
+    }],
+    'items': [
+        # Prices sent by the client are ignored.
+        {'sku': 'margherita', 'qty': 2, 'variants': [{'code': 'L', 'price': '0.01'}], 'additives': [{'code': 'basil'}]},
+        {'sku': 'margherita', 'qty': 1, 'variants': [{'code': 'S', 'name': 'Kids'}]},
+    ],
+}
+
+
+class OrderIngestionTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        price_tables.invalidate()
+        delivery_zones.invalidate()
+        self.channel = create_channel()
+        create_menu(self.channel)
+
+    def payload(self, **changes) -> dict:
+        return {**copy.deepcopy(ORDER_PAYLOAD), 'channel': self.channel.pk, **changes}
+
+    def assertIngestionErrors(self, payloads: list, errors: dict) -> None:
+        with self.assertRaises(OrderIngestionError) as context:
+            parse_orders(payloads)
+        self.assertEqual(context.exception.errors, errors)
+
+    def test_prices_from_price_table(self):
+        tree, = parse_orders([self.payload()])
+        large, small = tree.items
+        variants = [item.variants[0].variant for item in (large, small)]
+        self.assertEqual(
+            [(variant.code, variant.name, variant.price) for variant in variants],
+            [('L', 'Large', Decimal('28.00')), ('S', 'Kids', Decimal('20.00'))],
+        )
+        packages = large.variants[0].packages
+        self.assertEqual([(package.code, package.price) for package in packages], [('box', Decimal('2.00'))])
+        additives = large.additives
+        self.assertEqual([(additive.name, additive.price) for additive in additives], [('Basil', Decimal('1.50'))])
+        # 2 * (28.00 + 2.00 + 1.50) + (20.00 + 2.00)
+        self.assertEqual(tree.order.total_amount, Decimal('85.00'))
+        self.assertEqual(tree.addresses[0].latitude, Decimal('52.229700'))
+
+    def test_total_amount_has_to_match(self):
+        self.assertEqual(parse_orders([self.payload(total_amount='85.00')])[0].order.total_amount, Decimal('85.00'))
+        self.assertIngestionErrors([self.payload(total_amount='80.00')], {0: {'total_amount': ['Expected 85.00.']}})
+
+    def test_errors_keyed_by_payload_and_path(self):
+        bad_qty = self.payload()
+        bad_qty['items'][1]['qty'] = 0
+        del bad_qty['email']
+        unknown_codes = self.payload()
+        unknown_codes['items'][0]['variants'][0]['code'] = 'XL'
+        unknown_codes['items'][0]['additives'][0]['code'] = 'ham'
+
+        with self.assertRaises(OrderIngestionError) as context:
+            parse_orders([
+                self.payload(), bad_qty, 'order', self.payload(items=[]), unknown_codes, self.payload(channel=0),
+            ])
+        errors = context.exception.errors
+        self.assertEqual(list(errors), [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(errors[1]), ['email', 'items.1.qty'])
+        self.assertEqual(errors[2], {'__all__': ['Expected an object.']})
+        self.assertEqual(errors[3], {'items': ['This list cannot be empty.']})
+        self.assertEqual(errors[4], {
+            'items.0.variants.0.code': ["margherita has no variant 'XL' in this channel."],
+            'items.0.additives.0.code': ["margherita cannot be ordered with additive 'ham'."],
+        })
+        self.assertEqual(errors[5], {'channel': ['Channel 0 does not exist.']})
+
+    def test_routing_by_delivery_zone(self):
+        other = create_channel('other')
+        CategoryChannel.objects.create(category=Category.objects.get(), channel=other)
+        zone = DeliveryZone(channel=other, name='Centre')
+        zone.polygon = [(52.2, 21.0), (52.3, 21.0), (52.3, 21.1), (52.2, 21.1)]
+        zone.save()
+
+        tree, = parse_orders([self.payload(channel=None)])
+        self.assertEqual(tree.order.channel_id, other.pk)
+
+        outside = self.payload(channel=None)
+        outside['addresses'][0]['latitude'] = 50.0
+        self.assertIngestionErrors([outside], {0: {'addresses.0': ['No channel delivers to this address.']}})
+
+        # A channel without zones delivers anywhere.
+        self.assertEqual(len(parse_orders([self.payload()])), 1)
+        # A channel with zones only delivers inside them.
+        north = DeliveryZone(channel=self.channel, name='North')
+        north.polygon = [(53.0, 21.0), (53.1, 21.0), (53.1, 21.1)]
+        north.save()
+        self.assertIngestionErrors(
+            [self.payload()], {0: {'addresses.0': [f'Channel {self.channel.pk} does not deliver to this address.']}},
+        )
+
+    def test_ingest_writes_orders_and_rollups(self):
+        second = self.payload(code='A2', email='anna@example.com', first_name='Anna')
+        orders = ingest_orders([self.payload(), second], batch_size=1)
+
+        self.assertEqual([order.code for order in Order.objects.order_by('code')], ['A1', 'A2'])
+        emails = sorted(Customer.objects.values_list('email', flat=True))
+        self.assertEqual(emails, ['anna@example.com', 'jan@example.com'])
+        self.assertEqual(Customer.objects.get(email='anna@example.com').phone, '500100200')
+        created_at = {order.pk: order.created_at for order in Order.objects.all()}
+        for model, order_path in (
+            (OrderAddress, 'order'),
+            (OrderItem, 'order'),
+            (OrderItemVariant, 'order_item__order'),
+            (OrderItemAdditive, 'order_item__order'),
+            (OrderPackage, 'order_item_variant__order_item__order'),
+        ):
+            rows = list(model.objects.values_list(order_path, 'order_created_at'))
+            self.assertTrue(rows)
+            self.assertEqual([created_at[order_id] for order_id, _ in rows], [value for _, value in rows])
+
+        day = timezone.localdate(orders[0].created_at)
+        self.assertEqual(
+            list(SalesDailyRollup.objects.values_list('channel', 'day', 'status', 'order_count', 'revenue')),
+            [(self.channel.pk, day, OrderStatus.processing, 2, Decimal('170.00'))],
+        )
+        self.assertEqual(
+            list(SkuSalesDailyRollup.objects.values_list('sku', 'order_count', 'quantity', 'revenue')),
+            [('margherita', 2, 6, Decimal('170.00'))],
+        )
+
+
+class SalesRollupTests(TransactionTestCase):
+    """
+    Orders saved one by one reach the rollups through the signals, once the
+    transaction holding their items commits.
+    """
+
+    def setUp(self):
+        self.channel = create_channel()
+        self.customer = Customer.objects.create(
+            first_name='Jan', last_name='Kowalski', email='jan@example.com', registered_at=timezone.now(),
+        )
+
+    def create_order(self, code: str) -> Order:
+        with transaction.atomic():
+            order_id = create_order(self.channel, self.customer, code)['order'][0]
+        return Order.objects.get(pk=order_id)
+
+    def rollups(self) -> dict:
+        return {name: [row[1:] for row in rows] for name, rows in get_rollups().items()}
+
+    def test_increments(self):
+        # Each order is one margherita: 28.00 + 2.00 box + 1.00 basil.
+        first = self.create_order('A1')
+        self.assertEqual(self.rollups(), {
+            'orders': [(OrderStatus.processing, 1, Decimal('31.00'))],
+            'skus': [(OrderStatus.processing, 'margherita', 1, 1, Decimal('31.00'))],
+        })
+
+        # Lines added after the order was committed.
+        second = self.create_order('A2')
+        item = OrderItem.objects.create(order=second, sku='margherita', qty=2)
+        OrderItemVariant.objects.create(order_item=item, code='S', name='Small', price=Decimal('20.00'))
+        self.assertEqual(self.rollups()['skus'], [(OrderStatus.processing, 'margherita', 2, 4, Decimal('102.00'))])
+
+        item.qty = 1
+        item.save()
+        self.assertEqual(self.rollups()['skus'], [(OrderStatus.processing, 'margherita', 2, 3, Decimal('82.00'))])
+
+        first.status = OrderStatus.complete
+        first.save()
+        self.assertEqual(self.rollups()['orders'], [
+            (OrderStatus.complete, 1, Decimal('31.00')), (OrderStatus.processing, 1, Decimal('31.00')),
+        ])
+
+        second.delete()
+        self.assertEqual(self.rollups(), {
+            'orders': [(OrderStatus.complete, 1, Decimal('31.00'))],
+            'skus': [(OrderStatus.complete, 'margherita', 1, 1, Decimal('31.00'))],
+        })
+
+    def test_order_and_lines_in_one_transaction(self):
+        with transaction.atomic():
+            order = self.create_order('A1')
+            order.status = OrderStatus.complete
+            order.save()
+            OrderItem.objects.filter(order=order).delete()
+            OrderItem.objects.create(order=order, sku='capricciosa', qty=2)
+        self.assertEqual(self.rollups(), {
+            'orders': [(OrderStatus.complete, 1, Decimal('31.00'))],
+            'skus': [(OrderStatus.complete, 'capricciosa', 1, 2, Decimal('0.00'))],
+        })
+
+    def test_order_deleted_before_commit(self):
+        with transaction.atomic():
+            create_order(self.channel, self.customer, 'A1')
+            Order.objects.get().delete()
+        self.assertEqual(self.rollups(), {'orders': [], 'skus': []})
+
+    def test_increments_match_rebuild(self):
+        for index in range(5):
+            order = self.create_order(f'A{index}')
+            if index % 2:
+                order.status = OrderStatus.canceled
+                order.save()
+        self.create_order('A9').delete()
+        item = OrderItem.objects.create(order=order, sku='capricciosa', qty=3)
+        OrderItemAdditive.objects.create(order_item=item, name='Ham', price=Decimal('4.00'))
+        OrderItemVariant.objects.filter(order_item__order__code='A0').delete()
+
+        incremented = self.rollups()
+        self.assertEqual(rebuild_rollups(chunk_size=2), 5)
+        self.assertEqual(self.rollups(), incremented)
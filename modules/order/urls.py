@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import order_ingest
+
+app_name = 'order'
+
+urlpatterns = [
+    path('ingest/', order_ingest, name='ingest'),
+]
@@ -1,3 +1,50 @@
-from django.shortcuts import render
+import hmac
+import json
 
-# Create your views here.
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .ingestion import OrderIngestionError, ingest_orders
+
+
+def _is_authorized(request) -> bool:
+    token = settings.ORDER_INGESTION_TOKEN
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+@csrf_exempt
+@require_POST
+def order_ingest(request):
+    """
+    Accepts one order object, a list of orders or {"orders": [...]} and writes
+    them all or none. Callers authenticate with "Authorization: Bearer <ORDER_INGESTION_TOKEN>".
+    """
+    if not _is_authorized(request):
+        return JsonResponse({'error': 'Invalid or missing token.'}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON.'}, status=400)
+
+    if isinstance(payload, dict):
+        payloads = payload['orders'] if 'orders' in payload else [payload]
+    else:
+        payloads = payload
+    if not isinstance(payloads, list) or not payloads:
+        return JsonResponse({'error': 'Expected an order or a non-empty list of orders.'}, status=400)
+    if len(payloads) > settings.ORDER_INGESTION_MAX_ORDERS:
+        return JsonResponse(
+            {'error': f'At most {settings.ORDER_INGESTION_MAX_ORDERS} orders per request.'}, status=400
+        )
+
+    try:
+        orders = ingest_orders(payloads)
+    except OrderIngestionError as error:
+        return JsonResponse({'errors': error.errors}, status=400)
+
+    return JsonResponse({'orders': [{'id': order.pk, 'code': order.code} for order in orders]}, status=201)
@@ -6,8 +6,9 @@ from django.utils.html import mark_safe, format_html
 from django.http.request import HttpRequest
 from django.utils.safestring import SafeString
 
-from modules.base.forms import get_field_from_info
+from modules.base.forms import info_subquery
 from modules.product.choices import ProductStatus
+from modules.product.completeness import set_products_status
 from modules.product.forms import (
     CategoryChannelFormSet,
     ProductVariantInfoInlineFormSet,
@@ -33,6 +34,33 @@ from modules.product.models import (
     CategoryInfo,
     Store,
 )
+from modules.product.renditions import rendition_url
+
+
+class TranslatedNameAdminMixin:
+    info_model = None
+    info_related_field = None
+
+    def get_queryset(self, request: HttpRequest):
+        return super().get_queryset(request).annotate(
+            translated_name=info_subquery(self.info_model, self.info_related_field),
+        )
+
+    def name_from_info(self, obj: Model) -> Optional[str]:
+        return obj.translated_name
+
+    name_from_info.short_description = 'Name'
+    name_from_info.admin_order_field = 'translated_name'
+
+
+class TranslatedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    def field_choices(self, field, request, model_admin):
+        info = field.related_model._meta.get_field('info')
+        return list(
+            field.related_model.objects.annotate(
+                translated_name=info_subquery(info.related_model, info.field.name),
+            ).order_by('translated_name').values_list('pk', 'translated_name')
+        )
 
 
 class CategoryChannelInline(admin.TabularInline):
@@ -48,20 +76,17 @@ class CategoryInfoInline(admin.TabularInline):
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(TranslatedNameAdminMixin, admin.ModelAdmin):
+    info_model = CategoryInfo
+    info_related_field = 'category'
     list_display = ('id', 'code', 'name_from_info')
-    search_fields = ('code', 'name_from_info')
+    search_fields = ('code', 'info__name')
     list_filter = ('created_at',)
     inlines = [
         CategoryChannelInline,
         CategoryInfoInline,
     ]
 
-    def name_from_info(self, obj: Model) -> Optional[str]:
-        return get_field_from_info(obj, related_name='info', field_name='name')
-
-    name_from_info.short_description = 'Name'
-
 
 class ProductVariantInfoInline(admin.TabularInline):
     model = ProductVariantInfo
@@ -72,7 +97,7 @@ class ProductVariantInfoInline(admin.TabularInline):
 @admin.register(ProductVariant)
 class ProductVariantAdmin(admin.ModelAdmin):
     list_display = ('id', 'code', 'price', 'product', 'package')
-    search_fields = ('code', 'product__name')
+    search_fields = ('code', 'product__sku')
     list_filter = ('product', 'created_at')
     inlines = [ProductVariantInfoInline]
 
@@ -84,17 +109,14 @@ class PackageInfoInline(admin.TabularInline):
 
 
 @admin.register(Package)
-class ProductVariantAdmin(admin.ModelAdmin):
+class PackageAdmin(TranslatedNameAdminMixin, admin.ModelAdmin):
+    info_model = PackageInfo
+    info_related_field = 'package'
     list_display = ('id', 'code', 'name_from_info', 'price')
-    search_fields = ('code', 'package__name')
+    search_fields = ('code', 'info__name')
     list_filter = ('code', 'created_at')
     inlines = [PackageInfoInline]
 
-    def name_from_info(self, obj: Model) -> Optional[str]:
-        return get_field_from_info(obj, related_name='info', field_name='name')
-
-    name_from_info.short_description = 'Name'
-
 
 class AdditiveInfoInline(admin.TabularInline):
     model = AdditiveInfo
@@ -103,17 +125,14 @@ class AdditiveInfoInline(admin.TabularInline):
 
 
 @admin.register(Additive)
-class AdditiveAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name_from_info', 'price', 'created_at')
-    search_fields = ('info__name',)
+class AdditiveAdmin(TranslatedNameAdminMixin, admin.ModelAdmin):
+    info_model = AdditiveInfo
+    info_related_field = 'additive'
+    list_display = ('id', 'code', 'name_from_info', 'price', 'created_at')
+    search_fields = ('code', 'info__name')
     list_filter = ('created_at', 'updated_at')
     inlines = [AdditiveInfoInline]
 
-    def name_from_info(self, obj: Model) -> Optional[str]:
-        return get_field_from_info(obj, related_name='info', field_name='name')
-
-    name_from_info.short_description = 'Name'
-
 
 class ProductInfoInline(admin.TabularInline):
     model = ProductInfo
@@ -130,7 +149,7 @@ class ProductMediaGalleryInline(admin.TabularInline):
     def image_preview_tag(self, obj: Model) -> Optional[SafeString]:
         if obj.image and obj.pk:
             return mark_safe(
-                f'<img src="{obj.image.url}" id="preview-{obj.pk}" class="image-preview" style="max-height: 100px; max-width: 100px;" />'
+                f'<img src="{rendition_url(obj.image, "thumb", rendered_image=obj.rendered_image)}" id="preview-{obj.pk}" class="image-preview" style="max-height: 100px; max-width: 100px;" />'
             )
         return mark_safe(
             f'<img id="preview-new" class="image-preview" style="max-height: 100px; max-width: 100px; display: none;" />'
@@ -158,7 +177,9 @@ class ProductVariantInline(admin.TabularInline):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(TranslatedNameAdminMixin, admin.ModelAdmin):
+    info_model = ProductInfo
+    info_related_field = 'product'
 
     def __init__(self, model, admin_site):
         super().__init__(model, admin_site)
@@ -167,7 +188,11 @@ class ProductAdmin(admin.ModelAdmin):
     validation_messages = {
         'create_missing_info': 'Product was created but set to "offline" because ProductInfo is missing for the following stores: {}',
         'update_missing_info': 'Cannot update to "online": missing ProductInfo for: {}',
+        'status_updated': '{} product(s) set to "{}".',
+        'publish_skipped': 'Skipped {}: {}',
+        'publish_skipped_more': '{} more product(s) skipped.',
     }
+    report_limit = 20
 
     class Media:
         css = {
@@ -176,9 +201,10 @@ class ProductAdmin(admin.ModelAdmin):
         js = ('admin/js/admin_custom.js',)
 
     change_list_template = "admin/product/change_list.html"
-    list_display = ('sku', 'name_from_info', 'status', 'category', 'created_at', 'preview_media')
-    search_fields = ('sku', 'category__name')
-    list_filter = ('status', 'category')
+    list_display = ('sku', 'name_from_info', 'status', 'category_name', 'created_at', 'preview_tag')
+    search_fields = ('sku', 'info__name', 'category__info__name')
+    list_filter = ('status', ('category', TranslatedRelatedFieldListFilter))
+    actions = ('publish', 'unpublish')
     inlines = [
         ProductInfoInline,
         ProductMediaGalleryInline,
@@ -187,19 +213,52 @@ class ProductAdmin(admin.ModelAdmin):
         ProductVariantInline
     ]
 
-    def name_from_info(self, obj):
-        return get_field_from_info(obj, related_name='info', field_name='name')
-    name_from_info.short_description = 'Name'
+    def get_queryset(self, request: HttpRequest):
+        return super().get_queryset(request).annotate(
+            category_name=info_subquery(CategoryInfo, 'category', outer_ref='category_id'),
+        )
 
-    def preview_media(self, obj: Product) -> str:
-        url = obj.get_preview_media()
+    def category_name(self, obj: Product) -> Optional[str]:
+        return obj.category_name
+
+    category_name.short_description = 'Category'
+    category_name.admin_order_field = 'category_name'
+
+    def preview_tag(self, obj: Product) -> str:
+        url = obj.get_preview_media('thumb')
         if url:
             return format_html(
                 f'<img src="{url}" class="image-preview" style="max-height: 100px; max-width: 100px; border: 1px solid #ddd; margin-top: 5px;">'
             )
         return "No Image"
 
-    preview_media.short_description = 'Preview'
+    preview_tag.short_description = 'Preview'
+
+    def set_status(self, request: HttpRequest, queryset, status: str) -> None:
+        updated_ids, skipped = set_products_status(queryset, status)
+        self.message_user(request, self.validation_messages['status_updated'].format(len(updated_ids), status))
+
+        skus = dict(Product.objects.filter(pk__in=list(skipped)[:self.report_limit]).values_list('pk', 'sku'))
+        for pk, sku in skus.items():
+            self.message_user(
+                request,
+                self.validation_messages['publish_skipped'].format(sku, '; '.join(skipped[pk])),
+                messages.WARNING,
+            )
+        if len(skipped) > self.report_limit:
+            self.message_user(
+                request,
+                self.validation_messages['publish_skipped_more'].format(len(skipped) - self.report_limit),
+                messages.WARNING,
+            )
+
+    @admin.action(description='Publish selected products')
+    def publish(self, request: HttpRequest, queryset) -> None:
+        self.set_status(request, queryset, ProductStatus.online)
+
+    @admin.action(description='Unpublish selected products')
+    def unpublish(self, request: HttpRequest, queryset) -> None:
+        self.set_status(request, queryset, ProductStatus.offline)
 
     def save_related(self, request: HttpRequest, form: Any, formsets: list, change: bool) -> None:
         super().save_related(request, form, formsets, change)
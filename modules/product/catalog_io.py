@@ -0,0 +1,320 @@
+import csv
+import json
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TextIO
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Model, Q
+
+from modules.channel.models import Channel
+from modules.channel.snapshots import rebuild_snapshots
+from modules.store.models import Store
+from .models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    CategoryInfo,
+    Package,
+    PackageInfo,
+    Product,
+    ProductAdditive,
+    ProductInfo,
+    ProductVariant,
+    ProductVariantInfo,
+)
+from .pricing import price_tables
+from .renditions import delete_renditions, schedule_renditions
+from .versions import catalog_versions
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Lookups identifying a row of each referenced model in a catalog file, all unique.
+NATURAL_KEYS = {
+    Category: ('code',),
+    Product: ('sku',),
+    Package: ('code',),
+    Additive: ('code',),
+    Store: ('code',),
+    Channel: ('code',),
+    ProductVariant: ('product__sku', 'code'),
+}
+
+
+class RecordError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class RecordType:
+    model: type[Model]
+    unique_fields: tuple[str, ...]
+    fields: tuple[str, ...] = ()
+    # Model foreign key -> the record columns holding the natural key of its target.
+    references: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        return tuple(column for key in self.references.values() for column in key) + self.fields
+
+    def get_update_fields(self) -> list[str]:
+        return [name for name in self.fields if name not in self.unique_fields] + ['updated_at']
+
+
+# In dependency order: parents are written before the rows referencing them.
+RECORD_TYPES = {
+    'category': RecordType(Category, ('code',), ('code',)),
+    'category_info': RecordType(
+        CategoryInfo, ('category', 'store'), ('name',),
+        {'category': ('category',), 'store': ('store',)},
+    ),
+    'category_channel': RecordType(
+        CategoryChannel, ('category', 'channel'),
+        references={'category': ('category',), 'channel': ('channel',)},
+    ),
+    'package': RecordType(Package, ('code',), ('code', 'price')),
+    'package_info': RecordType(
+        PackageInfo, ('package', 'store'), ('name',),
+        {'package': ('package',), 'store': ('store',)},
+    ),
+    'additive': RecordType(Additive, ('code',), ('code', 'price', 'image')),
+    'additive_info': RecordType(
+        AdditiveInfo, ('additive', 'store'), ('name',),
+        {'additive': ('additive',), 'store': ('store',)},
+    ),
+    'product': RecordType(
+        Product, ('sku',), ('sku', 'status'),
+        {'category': ('category',)},
+    ),
+    'product_info': RecordType(
+        ProductInfo, ('product', 'store'), ('name', 'description', 'info'),
+        {'product': ('product',), 'store': ('store',)},
+    ),
+    'variant': RecordType(
+        ProductVariant, ('product', 'code'), ('code', 'price'),
+        {'product': ('product',), 'package': ('package',)},
+    ),
+    'variant_info': RecordType(
+        ProductVariantInfo, ('product_variant', 'store'), ('name',),
+        {'product_variant': ('product', 'variant'), 'store': ('store',)},
+    ),
+    'product_additive': RecordType(
+        ProductAdditive, ('product', 'additive'),
+        references={'product': ('product',), 'additive': ('additive',)},
+    ),
+}
+
+
+def _export_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_records(type_names: Iterable[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Yields the catalog as flat records, parents first. Rows are read with
+    `.iterator()`, i.e. through a server-side cursor on PostgreSQL.
+    """
+    type_names = set(type_names or RECORD_TYPES)
+    for type_name, record_type in RECORD_TYPES.items():
+        if type_name not in type_names:
+            continue
+
+        paths = []
+        for model_field, columns in record_type.references.items():
+            related_model = record_type.model._meta.get_field(model_field).related_model
+            paths += [f'{model_field}__{lookup}' for lookup in NATURAL_KEYS[related_model]]
+        paths += record_type.fields
+
+        rows = record_type.model.objects.order_by('pk').values_list(*paths).iterator(chunk_size=chunk_size)
+        for row in rows:
+            record = {'type': type_name}
+            record.update(zip(record_type.columns, map(_export_value, row)))
+            yield record
+
+
+def write_jsonl(records: Iterable[dict], stream: TextIO) -> int:
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(records: Iterable[dict], stream: TextIO, type_name: str) -> int:
+    writer = csv.DictWriter(stream, fieldnames=RECORD_TYPES[type_name].columns, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def read_jsonl(stream: TextIO) -> Iterator[tuple[int, dict]]:
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            record = {'error': f'invalid JSON: {error}'}
+        if not isinstance(record, dict):
+            record = {'error': 'a record must be a JSON object'}
+        yield line_number, record
+
+
+def read_csv(stream: TextIO, type_name: str) -> Iterator[tuple[int, dict]]:
+    reader = csv.DictReader(stream)
+    for record in reader:
+        record['type'] = type_name
+        yield reader.line_num, record
+
+
+class CatalogImporter:
+    """
+    Upserts catalog records keyed on their natural keys. Records are processed
+    in chunks of `chunk_size`, each chunk in its own transaction with one
+    bulk INSERT ... ON CONFLICT DO UPDATE per record type, so memory use does not
+    depend on the size of the file and re-importing the same file changes nothing.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, on_error: Callable[[int, str], None] = None):
+        self.chunk_size = chunk_size
+        self.on_error = on_error or (lambda line_number, message: None)
+        self.counts = Counter()
+        self.error_count = 0
+
+    def run(self, records: Iterable[tuple[int, dict]]) -> Counter:
+        records = iter(records)
+        while chunk := list(islice(records, self.chunk_size)):
+            self._import_chunk(chunk)
+
+        if self.counts:
+            price_tables.invalidate()
+            rebuild_snapshots(channel_ids=Channel.objects.values_list('pk', flat=True))
+            # Only now, so fragments cached under the new version come from the new snapshots.
+            catalog_versions.bump_all()
+        return self.counts
+
+    def _error(self, line_number: int, message: str) -> None:
+        self.error_count += 1
+        self.on_error(line_number, message)
+
+    def _import_chunk(self, chunk: list[tuple[int, dict]]) -> None:
+        by_type = defaultdict(list)
+        for line_number, record in chunk:
+            type_name = record.get('type')
+            if 'error' in record:
+                self._error(line_number, record['error'])
+            elif type_name not in RECORD_TYPES:
+                self._error(line_number, f'unknown record type "{type_name}"')
+            else:
+                by_type[type_name].append((line_number, record))
+
+        with transaction.atomic():
+            for type_name, record_type in RECORD_TYPES.items():
+                if by_type[type_name]:
+                    self._import_type(type_name, record_type, by_type[type_name])
+
+    def _resolve(self, record_type: RecordType, records: list[tuple[int, dict]]) -> dict:
+        """
+        Maps (model field, natural key) to a pk with one query per referenced model.
+        """
+        resolved = {}
+        for model_field, columns in record_type.references.items():
+            related_model = record_type.model._meta.get_field(model_field).related_model
+            lookups = NATURAL_KEYS[related_model]
+            keys = {tuple(str(record.get(column) or '') for column in columns) for _, record in records}
+
+            filters = Q()
+            for index, lookup in enumerate(lookups):
+                filters &= Q(**{f'{lookup}__in': {key[index] for key in keys}})
+
+            for *key, pk in related_model.objects.filter(filters).values_list(*lookups, 'pk'):
+                resolved[(model_field, tuple(key))] = pk
+        return resolved
+
+    def _build(self, record_type: RecordType, record: dict, resolved: dict) -> Model:
+        values = {}
+        for model_field, columns in record_type.references.items():
+            key = tuple(str(record.get(column) or '') for column in columns)
+            if not all(key):
+                raise RecordError(f'missing {", ".join(columns)}')
+            if (model_field, key) not in resolved:
+                raise RecordError(f'{model_field} {"/".join(key)} does not exist')
+            values[record_type.model._meta.get_field(model_field).attname] = resolved[(model_field, key)]
+
+        for name in record_type.fields:
+            model_field = record_type.model._meta.get_field(name)
+            value = record.get(name)
+            if value == '' and model_field.null:
+                value = None
+            try:
+                values[name] = model_field.clean(value, None)
+            except ValidationError as error:
+                raise RecordError(f'{name}: {" ".join(error.messages)}')
+
+        return record_type.model(**values)
+
+    def _import_type(self, type_name: str, record_type: RecordType, records: list[tuple[int, dict]]) -> None:
+        resolved = self._resolve(record_type, records)
+
+        # The last record wins when a chunk repeats a key; ON CONFLICT cannot touch a row twice.
+        objects = {}
+        for line_number, record in records:
+            try:
+                obj = self._build(record_type, record, resolved)
+            except RecordError as error:
+                self._error(line_number, f'{type_name}: {error}')
+                continue
+            key = tuple(getattr(obj, record_type.model._meta.get_field(name).attname) for name in record_type.unique_fields)
+            objects[key] = obj
+
+        if not objects:
+            return
+
+        old_images = {}
+        if record_type.model is Additive:
+            old_images = dict(Additive.objects.filter(code__in=[key[0] for key in objects]).values_list('code', 'image'))
+
+        record_type.model.objects.bulk_create(
+            objects.values(),
+            update_conflicts=True,
+            unique_fields=record_type.unique_fields,
+            update_fields=record_type.get_update_fields(),
+        )
+        self.counts[type_name] += len(objects)
+
+        if record_type.model is ProductVariant:
+            Product.refresh_price_range({obj.product_id for obj in objects.values()})
+        elif record_type.model is Additive:
+            self._schedule_renditions(objects.values(), old_images)
+
+    def _schedule_renditions(self, additives: Iterable[Additive], old_images: dict) -> None:
+        changed = {
+            additive.code: additive.image.name
+            for additive in additives
+            if (additive.image.name or None) != (old_images.get(additive.code) or None)
+        }
+        if not changed:
+            return
+
+        for code, pk in Additive.objects.filter(code__in=list(changed)).values_list('code', 'pk'):
+            transaction.on_commit(lambda name=old_images.get(code): delete_renditions(name))
+            schedule_renditions(Additive, pk, changed[code])
+
+
+def import_records(
+    records: Iterable[tuple[int, dict]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_error: Callable[[int, str], None] = None,
+) -> tuple[Counter, int]:
+    importer = CatalogImporter(chunk_size, on_error)
+    counts = importer.run(records)
+    return counts, importer.error_count
@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from modules.channel.snapshots import schedule_rebuild
+from modules.store.registry import store_registry
+from .choices import ProductStatus
+from .models import Product, ProductVariant
+from .pricing import price_tables
+from .versions import catalog_versions, get_category_channel_ids
+
+
+def find_incomplete_products(products: QuerySet = None) -> dict[int, list[str]]:
+    """
+    Maps the pk of every product in `products` that cannot be published to the
+    reasons why: missing ProductInfo or ProductVariantInfo for a store, or no variants.
+    Runs two queries per store plus one, whatever the number of products.
+    """
+    products = Product.objects.all() if products is None else products
+    variants = ProductVariant.objects.filter(product__in=products.values('pk'))
+    report = defaultdict(list)
+
+    missing_info = defaultdict(list)
+    missing_variant_info = defaultdict(lambda: defaultdict(list))
+    for store in store_registry.all():
+        for pk in products.exclude(info__store=store).values_list('pk', flat=True):
+            missing_info[pk].append(store.name)
+        for product_id, code in variants.exclude(info__store=store).values_list('product_id', 'code'):
+            missing_variant_info[product_id][code].append(store.name)
+
+    for pk, store_names in missing_info.items():
+        report[pk].append(f'missing ProductInfo for: {", ".join(store_names)}')
+    for product_id, codes in missing_variant_info.items():
+        for code, store_names in codes.items():
+            report[product_id].append(f'missing ProductVariantInfo of variant {code} for: {", ".join(store_names)}')
+    for pk in products.filter(variants__isnull=True).values_list('pk', flat=True):
+        report[pk].append('has no variants')
+
+    return dict(report)
+
+
+def set_products_status(products: QuerySet, status: str) -> tuple[list[int], dict[int, list[str]]]:
+    """
+    Sets `status` on `products` with a single UPDATE. Products that are not
+    complete are skipped when publishing; returns the updated pks and the skip report.
+    """
+    skipped = find_incomplete_products(products) if status == ProductStatus.online else {}
+    updated_ids = list(products.exclude(pk__in=list(skipped)).exclude(status=status).values_list('pk', flat=True))
+
+    Product.objects.filter(pk__in=updated_ids).update(status=status, updated_at=timezone.now())
+    schedule_rebuild(product_ids=updated_ids)
+    catalog_versions.schedule_bump(get_category_channel_ids(category__products__in=updated_ids))
+    transaction.on_commit(price_tables.invalidate)
+
+    return updated_ids, skipped
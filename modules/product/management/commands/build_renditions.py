@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from modules.channel.models import Channel
+from modules.channel.snapshots import rebuild_snapshots
+from modules.product.models import Additive, Product, ProductMediaGallery
+from modules.product.renditions import create_renditions
+from modules.product.versions import catalog_versions
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates the image renditions of every ProductMediaGallery and Additive image and marks them ready; '
+        'until then the original images are served.'
+    )
+
+    def handle(self, *args, **options):
+        for model in (ProductMediaGallery, Additive):
+            names = model.objects.exclude(image='').exclude(image=None).values_list('image', flat=True)
+            for name in names.iterator():
+                try:
+                    create_renditions(name)
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    model.objects.filter(image=name).update(rendered_image=name, updated_at=timezone.now())
+            self.stdout.write(f'{model.__name__}: {names.count()} images processed.')
+
+        Product.refresh_preview_media(Product.objects.values_list('pk', flat=True))
+        rebuild_snapshots(channel_ids=Channel.objects.values_list('pk', flat=True))
+        # Only now, so fragments cached under the new version come from the new snapshots.
+        catalog_versions.bump_all()
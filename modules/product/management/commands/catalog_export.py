@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.product.catalog_io import DEFAULT_CHUNK_SIZE, RECORD_TYPES, export_records, write_csv, write_jsonl
+
+
+class Command(BaseCommand):
+    help = 'Streams the catalog to a JSONL file (every record type) or a CSV file (one record type).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file, "-" for stdout.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Defaults to the file extension, else jsonl.')
+        parser.add_argument(
+            '--type', action='append', default=[], choices=list(RECORD_TYPES), dest='types',
+            help='Record type to export, can be repeated. CSV takes exactly one.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        if file_format == 'csv' and len(options['types']) != 1:
+            raise CommandError('CSV exports hold one record type, select it with --type.')
+
+        records = export_records(options['types'], options['chunk_size'])
+        stream = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        try:
+            if file_format == 'csv':
+                count = write_csv(records, stream, options['types'][0])
+            else:
+                count = write_jsonl(records, stream)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        self.stderr.write(self.style.SUCCESS(f'{count} record(s) exported.'))
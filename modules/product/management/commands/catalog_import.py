@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.product.catalog_io import DEFAULT_CHUNK_SIZE, RECORD_TYPES, import_records, read_csv, read_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        'Upserts catalog records from a JSONL file (records carry a "type") or a CSV file '
+        '(one record type per file). Rows are matched on sku/code, so re-importing a file is safe.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, "-" for stdin.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Defaults to the file extension, else jsonl.')
+        parser.add_argument('--type', choices=list(RECORD_TYPES), help='Record type of a CSV file.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        if file_format == 'csv' and not options['type']:
+            raise CommandError('Select the record type of a CSV file with --type.')
+
+        def report_error(line_number, message):
+            self.stderr.write(f'line {line_number}: {message}')
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        try:
+            records = read_csv(stream, options['type']) if file_format == 'csv' else read_jsonl(stream)
+            counts, error_count = import_records(records, options['chunk_size'], report_error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for type_name, count in counts.items():
+            self.stdout.write(f'{type_name}: {count}')
+
+        message = f'{sum(counts.values())} record(s) imported, {error_count} rejected.'
+        self.stdout.write(self.style.ERROR(message) if error_count else self.style.SUCCESS(message))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from modules.product.choices import ProductStatus
+from modules.product.completeness import find_incomplete_products, set_products_status
+from modules.product.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Publishes (or unpublishes) products in bulk and reports the products that were skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', action='append', default=[], help='Category code, can be repeated.')
+        parser.add_argument('--sku', action='append', default=[], help='Product sku, can be repeated.')
+        parser.add_argument('--all', action='store_true', help='Select every product.')
+        parser.add_argument('--unpublish', action='store_true', help='Set the products offline instead.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be skipped.')
+
+    def handle(self, *args, **options):
+        if not (options['all'] or options['category'] or options['sku']):
+            raise CommandError('Select products with --all, --category or --sku.')
+
+        products = Product.objects.all()
+        if options['category']:
+            products = products.filter(category__code__in=options['category'])
+        if options['sku']:
+            products = products.filter(sku__in=options['sku'])
+
+        status = ProductStatus.offline if options['unpublish'] else ProductStatus.online
+
+        if options['dry_run']:
+            skipped = find_incomplete_products(products) if status == ProductStatus.online else {}
+            updated_count = products.exclude(pk__in=list(skipped)).exclude(status=status).count()
+        else:
+            with transaction.atomic():
+                updated_ids, skipped = set_products_status(products, status)
+            updated_count = len(updated_ids)
+
+        skus = dict(Product.objects.filter(pk__in=list(skipped)).values_list('pk', 'sku'))
+        for pk, reasons in sorted(skipped.items(), key=lambda item: skus[item[0]]):
+            self.stdout.write(f'{skus[pk]}: {"; ".join(reasons)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated_count} product(s) set to "{status}", {len(skipped)} skipped.'
+        ))
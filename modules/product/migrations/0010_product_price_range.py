@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:57
+
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery
+
+
+def fill_price_range(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductVariant = apps.get_model('product', 'ProductVariant')
+
+    variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    Product.objects.update(
+        min_price=Subquery(variants.annotate(value=Min('price')).values('value')),
+        max_price=Subquery(variants.annotate(value=Max('price')).values('value')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0009_additive_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_price',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'min_price'], name='product_categor_9423a9_idx'),
+        ),
+        migrations.RunPython(fill_price_range, migrations.RunPython.noop),
+    ]
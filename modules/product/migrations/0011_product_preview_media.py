@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_preview_media(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductMediaGallery = apps.get_model('product', 'ProductMediaGallery')
+
+    media = ProductMediaGallery.objects.filter(product=OuterRef('pk')).order_by('priority', 'pk')
+    Product.objects.update(
+        preview_media=Subquery(media.values('pk')[:1]),
+        preview_image=Subquery(media.values('image')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0010_product_price_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='preview_image',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='product_images/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='preview_media',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='product.productmediagallery'),
+        ),
+        migrations.RunPython(fill_preview_media, migrations.RunPython.noop),
+    ]
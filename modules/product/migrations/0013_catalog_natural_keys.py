@@ -0,0 +1,71 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+from modules.base.migration_checks import require_unique
+
+
+def fill_additive_code(apps, schema_editor):
+    Additive = apps.get_model('product', 'Additive')
+    Additive.objects.update(code=Concat(Value('additive-'), Cast('pk', output_field=CharField())))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0012_info_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='additive',
+            name='code',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_additive_code, migrations.RunPython.noop),
+        migrations.RunPython(
+            require_unique('product', {
+                'Category': [('code',)],
+                'Package': [('code',)],
+                'Product': [('sku',)],
+                'CategoryChannel': [('category', 'channel')],
+                'ProductAdditive': [('product', 'additive')],
+                'ProductVariant': [('product', 'code')],
+            }),
+            migrations.RunPython.noop,
+        ),
+        migrations.AlterField(
+            model_name='additive',
+            name='code',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='code',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='package',
+            name='code',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='categorychannel',
+            unique_together={('category', 'channel')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='productadditive',
+            unique_together={('product', 'additive')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='productvariant',
+            unique_together={('product', 'code')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0013_catalog_natural_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='additive',
+            name='rendered_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='preview_rendered_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='productmediagallery',
+            name='rendered_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+    ]
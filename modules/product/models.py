@@ -1,18 +1,23 @@
 import os
+from typing import Iterable
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.db.models.functions import Upper
 from django.core.validators import MinValueValidator
 from django.templatetags.static import static
 
 from .choices import ProductStatus
+from .renditions import delete_renditions, rendition_url
 from modules.base.forms import get_field_from_info
 from modules.channel.models import Channel
 from modules.store.models import Store
 
 
 class Category(models.Model):
-    code = models.CharField(max_length=255, db_index=True)
+    code = models.CharField(max_length=255, unique=True)
 
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,6 +51,9 @@ class CategoryInfo(models.Model):
     class Meta:
         db_table = "category_info"
         unique_together = ('category', 'store')
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='category_info_name_trgm'),
+        ]
 
 
 class CategoryChannel(models.Model):
@@ -57,10 +65,19 @@ class CategoryChannel(models.Model):
 
     class Meta:
         db_table = "category_channel"
+        unique_together = ('category', 'channel')
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_price_range(self):
+        return self.annotate(
+            variant_min_price=Min('variants__price'),
+            variant_max_price=Max('variants__price'),
+        )
 
 
 class Product(models.Model):
-    sku = models.CharField(max_length=255, db_index=True)
+    sku = models.CharField(max_length=255, unique=True)
     status = models.CharField(
         max_length=50,
         choices=ProductStatus.choices,
@@ -68,13 +85,39 @@ class Product(models.Model):
         db_index=True,
     )
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False, db_index=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    preview_media = models.ForeignKey(
+        'ProductMediaGallery',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    preview_image = models.ImageField(upload_to='product_images/', null=True, blank=True, editable=False)
+    preview_rendered_image = models.CharField(max_length=100, null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    # Written only by refresh_price_range and refresh_preview_media: an instance
+    # loaded before a variant or gallery change would save the old values back.
+    refreshed_fields = ('min_price', 'max_price', 'preview_media', 'preview_image', 'preview_rendered_image')
+
     def __str__(self):
         return self.sku
 
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.refreshed_fields
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     @property
     def name(self):
         return get_field_from_info(self, 'info', 'name')
@@ -89,14 +132,42 @@ class Product(models.Model):
 
     @property
     def lowest_price(self):
-        return min([variant.price for variant in self.variants.all()])
+        return self.min_price
+
+    @classmethod
+    def refresh_price_range(cls, product_ids: Iterable[int]) -> None:
+        with transaction.atomic():
+            # Lock the rows first so the update below sees variants committed by concurrent writers.
+            product_ids = list(
+                cls.objects.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk', flat=True)
+            )
+            variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+            cls.objects.filter(pk__in=product_ids).update(
+                min_price=Subquery(variants.annotate(value=Min('price')).values('value')),
+                max_price=Subquery(variants.annotate(value=Max('price')).values('value')),
+            )
+
+    @classmethod
+    def refresh_preview_media(cls, product_ids: Iterable[int]) -> None:
+        media = ProductMediaGallery.objects.filter(product=OuterRef('pk')).order_by('priority', 'pk')
+        cls.objects.filter(pk__in=product_ids).update(
+            preview_media=Subquery(media.values('pk')[:1]),
+            preview_image=Subquery(media.values('image')[:1]),
+            preview_rendered_image=Subquery(media.values('rendered_image')[:1]),
+        )
 
     class Meta:
         db_table = "product"
+        indexes = [
+            models.Index(fields=['category', 'min_price']),
+        ]
 
-    def get_preview_media(self):
-        media = self.media.order_by('priority').first()
-        return media.image.url if media else static('img/image-not-available.png')
+    def get_preview_media(self, preset: str = None, image_format: str = 'jpeg'):
+        if not self.preview_image:
+            return static('img/image-not-available.png')
+        if preset:
+            return rendition_url(self.preview_image, preset, image_format, self.preview_rendered_image)
+        return self.preview_image.url
 
 
 class ProductInfo(models.Model):
@@ -112,11 +183,16 @@ class ProductInfo(models.Model):
     class Meta:
         db_table = "product_info"
         unique_together = ('product', 'store')
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_info_name_trgm'),
+        ]
 
 
 class ProductMediaGallery(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='media')
     image = models.ImageField(upload_to='product_images/')
+    # The image the renditions were made from, set by the rendition worker.
+    rendered_image = models.CharField(max_length=100, null=True, blank=True, editable=False)
     priority = models.PositiveSmallIntegerField(default=0)
     alt_text = models.CharField(max_length=255, null=True, blank=True)  # Text for SEO
     
@@ -131,6 +207,7 @@ class ProductMediaGallery(models.Model):
 
     def delete(self, *args, **kwargs):
         if self.image:
+            delete_renditions(self.image)
             if os.path.isfile(self.image.path):
                 os.remove(self.image.path)
         super().delete(*args, **kwargs)
@@ -148,8 +225,11 @@ class ProductExcludeChannel(models.Model):
 
 
 class Additive(models.Model):
+    code = models.CharField(max_length=255, unique=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, db_index=True, validators=[MinValueValidator(0.01)])
     image = models.ImageField(upload_to='product_additive_images/', null=True, blank=True)
+    # The image the renditions were made from, set by the rendition worker.
+    rendered_image = models.CharField(max_length=100, null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -163,6 +243,7 @@ class Additive(models.Model):
 
     def delete(self, *args, **kwargs):
         if self.image:
+            delete_renditions(self.image)
             if os.path.isfile(self.image.path):
                 os.remove(self.image.path)
         super().delete(*args, **kwargs)
@@ -185,6 +266,9 @@ class AdditiveInfo(models.Model):
     class Meta:
         db_table = "additive_info"
         unique_together = ('additive', 'store')
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='additive_info_name_trgm'),
+        ]
 
 
 class ProductAdditive(models.Model):
@@ -196,10 +280,11 @@ class ProductAdditive(models.Model):
 
     class Meta:
         db_table = "product_additive"
+        unique_together = ('product', 'additive')
 
 
 class Package(models.Model):
-    code = models.CharField(max_length=255, db_index=True)
+    code = models.CharField(max_length=255, unique=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, db_index=True, validators=[MinValueValidator(0.01)])
 
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -227,6 +312,9 @@ class PackageInfo(models.Model):
     class Meta:
         db_table = "package_info"
         unique_together = ('package', 'store')
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='package_info_name_trgm'),
+        ]
 
 
 class ProductVariant(models.Model):
@@ -247,6 +335,7 @@ class ProductVariant(models.Model):
 
     class Meta:
         db_table = "product_variant"
+        unique_together = ('product', 'code')
 
 
 class ProductVariantInfo(models.Model):
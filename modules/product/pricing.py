@@ -0,0 +1,189 @@
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from modules.base.cache import bump_version, get_version
+from modules.base.forms import info_subquery
+from modules.base.routers import read_from_primary
+from modules.channel.models import Channel
+from .choices import ProductStatus
+from .models import AdditiveInfo, PackageInfo, Product, ProductAdditive, ProductVariant, ProductVariantInfo
+
+
+class PricingError(Exception):
+    def __init__(self, errors: dict):
+        super().__init__('Some lines cannot be priced.')
+        self.errors = errors
+
+
+@dataclass(frozen=True)
+class VariantPrice:
+    code: str
+    name: Optional[str]
+    price: Decimal
+    package_code: str
+    package_name: Optional[str]
+    package_price: Decimal
+
+
+@dataclass(frozen=True)
+class AdditivePrice:
+    code: str
+    name: Optional[str]
+    price: Decimal
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    sku: str
+    qty: int
+    variant: VariantPrice
+    additives: tuple[AdditivePrice, ...]
+
+    @property
+    def unit_price(self) -> Decimal:
+        return self.variant.price + self.variant.package_price + sum((item.price for item in self.additives), Decimal(0))
+
+    @property
+    def amount(self) -> Decimal:
+        return self.unit_price * self.qty
+
+
+@dataclass
+class PriceTable:
+    """
+    Prices of everything a channel sells, keyed by sku and variant/additive code.
+    Names are in the channel's base language.
+    """
+    channel_id: int
+    currency: str
+    variants: dict[tuple[str, str], VariantPrice] = field(default_factory=dict)
+    additives: dict[tuple[str, str], AdditivePrice] = field(default_factory=dict)
+
+    def get_variant(self, sku: str, code: str) -> VariantPrice:
+        try:
+            return self.variants[(sku, code)]
+        except KeyError:
+            raise KeyError(f'{sku} has no variant {code!r} in this channel.') from None
+
+    def get_additive(self, sku: str, code: str) -> AdditivePrice:
+        try:
+            return self.additives[(sku, code)]
+        except KeyError:
+            raise KeyError(f'{sku} cannot be ordered with additive {code!r}.') from None
+
+    def price_line(self, sku: str, variant_code: str, additive_codes: Iterable[str] = (), qty: int = 1) -> PricedLine:
+        variant = self.get_variant(sku, variant_code)
+        additives = tuple(self.get_additive(sku, code) for code in additive_codes)
+        return PricedLine(sku, qty, variant, additives)
+
+    def price_lines(self, lines: Iterable[dict]) -> list[PricedLine]:
+        """
+        Prices lines of the form {"sku", "variant", "additives": [codes], "qty"}.
+        Raises PricingError keyed by line index when any line is unknown.
+        """
+        priced, errors = [], {}
+        for index, line in enumerate(lines):
+            if not isinstance(line, dict):
+                errors[index] = 'Expected an object.'
+                continue
+            try:
+                qty = int(line.get('qty', 1))
+                if qty < 1:
+                    raise ValueError
+            except (TypeError, ValueError):
+                errors[index] = 'qty must be a positive integer.'
+                continue
+
+            additives = line.get('additives') or []
+            if not isinstance(additives, list):
+                errors[index] = 'additives must be a list of codes.'
+                continue
+
+            try:
+                priced.append(self.price_line(str(line.get('sku')), str(line.get('variant')), map(str, additives), qty))
+            except KeyError as error:
+                errors[index] = error.args[0]
+
+        if errors:
+            raise PricingError(errors)
+        return priced
+
+
+def _available_products(channel: Channel):
+    return (
+        Product.objects.filter(category__channels__channel=channel, status=ProductStatus.online)
+        .exclude(productexcludechannel__channel=channel)
+        .values('pk')
+    )
+
+
+def build_price_table(channel: Channel) -> PriceTable:
+    """
+    Loads the price table of `channel` with two queries.
+    """
+    table = PriceTable(channel.pk, channel.currency)
+    products = _available_products(channel)
+
+    variants = (
+        ProductVariant.objects.filter(product__in=products)
+        .annotate(
+            variant_name=info_subquery(ProductVariantInfo, 'product_variant', store_code=channel.base_language),
+            package_name=info_subquery(PackageInfo, 'package', store_code=channel.base_language, outer_ref='package_id'),
+        )
+        .values_list('product__sku', 'code', 'variant_name', 'price', 'package__code', 'package_name', 'package__price')
+    )
+    for sku, code, name, price, package_code, package_name, package_price in variants:
+        table.variants[(sku, code)] = VariantPrice(code, name, price, package_code, package_name, package_price)
+
+    additives = (
+        ProductAdditive.objects.filter(product__in=products)
+        .annotate(
+            additive_name=info_subquery(AdditiveInfo, 'additive', store_code=channel.base_language, outer_ref='additive_id'),
+        )
+        .values_list('product__sku', 'additive__code', 'additive_name', 'additive__price')
+    )
+    for sku, code, name, price in additives:
+        table.additives[(sku, code)] = AdditivePrice(code, name, price)
+
+    return table
+
+
+class PriceTables:
+    """
+    Per-process price tables, loaded on first use for each channel and dropped
+    together whenever a price, package, additive or assortment row changes.
+    """
+    version_key = 'product:pricing:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._tables = {}
+
+    def get(self, channel_id: int) -> Optional[PriceTable]:
+        version = get_version(self.version_key)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._tables, self._version = {}, version
+
+        # A table built while an invalidation lands goes into the dropped dict, not the new one.
+        tables = self._tables
+        table = tables.get(channel_id)
+        if table is None:
+            # Kept until the next invalidation, so never loaded from a lagging replica.
+            with read_from_primary():
+                channel = Channel.objects.filter(pk=channel_id).first()
+                if channel is None:
+                    return None
+                table = tables[channel_id] = build_price_table(channel)
+        return table
+
+    def invalidate(self) -> None:
+        bump_version(self.version_key)
+        self._version = None
+
+
+price_tables = PriceTables()
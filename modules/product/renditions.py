@@ -0,0 +1,136 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional, Union
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.fields.files import FieldFile
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_PRESETS = {
+    'thumb': (100, 100),
+    'card': (400, 400),
+    'large': (1200, 1200),
+}
+
+RENDITION_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+# Sent from a worker thread once every rendition of an image exists and the
+# row's `rendered_image` names it.
+renditions_ready = Signal()
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.RENDITION_WORKERS, thread_name_prefix='renditions')
+    return _executor
+
+
+def _get_name(image: Union[FieldFile, str, None]) -> Optional[str]:
+    return getattr(image, 'name', image) or None
+
+
+def get_rendition_name(image: Union[FieldFile, str], preset: str, image_format: str) -> str:
+    # The source extension is kept, so foo.jpg and foo.png get renditions of their own.
+    return f'renditions/{preset}/{_get_name(image)}.{image_format}'
+
+
+def rendition_url(
+    image: Union[FieldFile, str, None], preset: str, image_format: str = 'jpeg', rendered_image: str = None,
+) -> Optional[str]:
+    """
+    URL of the rendition when `rendered_image`, the image the row's renditions
+    were made from, is the current image; of the original while it is not.
+    """
+    name = _get_name(image)
+    if not name:
+        return None
+    if name == rendered_image:
+        return default_storage.url(get_rendition_name(name, preset, image_format))
+    return default_storage.url(name)
+
+
+def get_rendition_urls(image: Union[FieldFile, str, None], preset: str, rendered_image: str = None) -> Optional[dict]:
+    if not _get_name(image):
+        return None
+    return {
+        image_format: rendition_url(image, preset, image_format, rendered_image) for image_format in RENDITION_FORMATS
+    }
+
+
+def _render(original: Image.Image, size: tuple[int, int], image_format: str) -> bytes:
+    image = original.copy()
+    image.thumbnail(size, Image.LANCZOS)
+
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image_format == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    buffer = BytesIO()
+    image.save(buffer, **RENDITION_FORMATS[image_format])
+    return buffer.getvalue()
+
+
+def create_renditions(image: Union[FieldFile, str]) -> None:
+    name = _get_name(image)
+    with default_storage.open(name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+
+    for preset, size in RENDITION_PRESETS.items():
+        for image_format in RENDITION_FORMATS:
+            rendition_name = get_rendition_name(name, preset, image_format)
+            if default_storage.exists(rendition_name):
+                default_storage.delete(rendition_name)
+            default_storage.save(rendition_name, ContentFile(_render(original, size, image_format)))
+
+
+def delete_renditions(image: Union[FieldFile, str, None]) -> None:
+    name = _get_name(image)
+    if not name:
+        return
+
+    for preset in RENDITION_PRESETS:
+        for image_format in RENDITION_FORMATS:
+            rendition_name = get_rendition_name(name, preset, image_format)
+            if default_storage.exists(rendition_name):
+                default_storage.delete(rendition_name)
+
+
+def _run(sender: type, pk: int, name: str) -> None:
+    try:
+        create_renditions(name)
+        # Unless the image was replaced in the meantime. updated_at changes the
+        # validators of the payloads that now carry the rendition URLs.
+        if sender.objects.filter(pk=pk, image=name).update(rendered_image=name, updated_at=timezone.now()):
+            renditions_ready.send(sender=sender, pk=pk, name=name)
+    except Exception:
+        logger.exception('Failed to create renditions for %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(sender: type, pk: int, image: Union[FieldFile, str, None]) -> None:
+    """
+    Creates the renditions in the worker pool once the current transaction commits.
+    """
+    name = _get_name(image)
+    if name:
+        transaction.on_commit(lambda: _get_executor().submit(_run, sender, pk, name))
@@ -0,0 +1,180 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from modules.channel.models import Channel
+from modules.store.models import Store
+from .models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    CategoryInfo,
+    Package,
+    PackageInfo,
+    Product,
+    ProductAdditive,
+    ProductExcludeChannel,
+    ProductInfo,
+    ProductMediaGallery,
+    ProductVariant,
+    ProductVariantInfo,
+)
+from .pricing import price_tables
+from .renditions import delete_renditions, renditions_ready, schedule_renditions
+from .versions import catalog_versions, get_category_channel_ids
+
+# Sent with `product_ids` once the price range or preview image of products was
+# refreshed after a variant or gallery change or new renditions, for what is
+# built from them (the channel menu snapshots).
+product_refreshed = Signal()
+
+PRICED_MODELS = (
+    Product,
+    ProductVariant,
+    ProductVariantInfo,
+    Package,
+    PackageInfo,
+    Additive,
+    AdditiveInfo,
+    ProductAdditive,
+    ProductExcludeChannel,
+    CategoryChannel,
+    Channel,
+)
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def refresh_product_price_range(sender, instance, **kwargs):
+    Product.refresh_price_range([instance.product_id])
+    product_refreshed.send(sender=Product, product_ids=[instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=ProductMediaGallery)
+def refresh_product_preview_media(sender, instance, **kwargs):
+    Product.refresh_preview_media([instance.product_id])
+    product_refreshed.send(sender=Product, product_ids=[instance.product_id])
+
+
+@receiver(renditions_ready, sender=ProductMediaGallery)
+def refresh_rendered_preview_media(sender, pk, **kwargs):
+    product_ids = list(ProductMediaGallery.objects.filter(pk=pk).values_list('product_id', flat=True))
+    Product.refresh_preview_media(product_ids)
+    product_refreshed.send(sender=Product, product_ids=product_ids)
+
+
+@receiver(post_init, sender=ProductMediaGallery)
+@receiver(post_init, sender=Additive)
+def remember_image_name(sender, instance, **kwargs):
+    image = instance.__dict__.get('image')
+    instance._rendition_image_name = getattr(image, 'name', image) or None
+
+
+@receiver(post_save, sender=ProductMediaGallery)
+@receiver(post_save, sender=Additive)
+def create_image_renditions(sender, instance, **kwargs):
+    if (instance.image.name or None) == instance._rendition_image_name:
+        return
+
+    delete_renditions(instance._rendition_image_name)
+    schedule_renditions(sender, instance.pk, instance.image)
+    instance._rendition_image_name = instance.image.name or None
+
+
+def invalidate_price_tables(sender, **kwargs):
+    transaction.on_commit(price_tables.invalidate)
+
+
+for model in PRICED_MODELS:
+    post_save.connect(invalidate_price_tables, sender=model, dispatch_uid=f'price_tables_{model.__name__}')
+    post_delete.connect(invalidate_price_tables, sender=model, dispatch_uid=f'price_tables_delete_{model.__name__}')
+
+
+# Catalog versions. Texts live in the info models and are versioned per store;
+# everything else changes what channels sell and is versioned per channel.
+INFO_MODELS = (ProductInfo, ProductVariantInfo, CategoryInfo, AdditiveInfo, PackageInfo)
+PRODUCT_CHILD_MODELS = (ProductVariant, ProductMediaGallery, ProductAdditive)
+CATALOG_MODELS = (
+    Category, CategoryChannel, Product, ProductExcludeChannel, Additive, Package,
+    *INFO_MODELS, *PRODUCT_CHILD_MODELS, Channel, Store,
+)
+
+
+@receiver(post_init, sender=Product)
+def remember_version_category(sender, instance, **kwargs):
+    instance._version_category_id = instance.__dict__.get('category_id')
+
+
+@receiver([post_save, post_delete], sender=Product)
+def bump_product_channels(sender, instance, **kwargs):
+    category_ids = {instance.category_id, instance._version_category_id} - {None}
+    catalog_versions.schedule_bump(get_category_channel_ids(category_id__in=category_ids))
+    instance._version_category_id = instance.category_id
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=ProductMediaGallery)
+@receiver([post_save, post_delete], sender=ProductAdditive)
+def bump_product_child_channels(sender, instance, **kwargs):
+    catalog_versions.schedule_bump(get_category_channel_ids(category__products=instance.product_id))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def bump_category_channels(sender, instance, **kwargs):
+    catalog_versions.schedule_bump(get_category_channel_ids(category_id=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=CategoryChannel)
+@receiver([post_save, post_delete], sender=ProductExcludeChannel)
+def bump_linked_channel(sender, instance, **kwargs):
+    catalog_versions.schedule_bump([instance.channel_id])
+
+
+@receiver([post_save, post_delete], sender=Additive)
+def bump_additive_channels(sender, instance, **kwargs):
+    catalog_versions.schedule_bump(get_category_channel_ids(category__products__additives__additive=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Package)
+def bump_package_channels(sender, instance, **kwargs):
+    catalog_versions.schedule_bump(get_category_channel_ids(category__products__variants__package=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Channel)
+def bump_channel(sender, instance, **kwargs):
+    catalog_versions.schedule_bump([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Store)
+def bump_store(sender, instance, **kwargs):
+    catalog_versions.schedule_bump(store_ids=[instance.pk])
+
+
+def bump_info_store(sender, instance, **kwargs):
+    catalog_versions.schedule_bump(store_ids=[instance.store_id])
+
+
+def bump_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        catalog_versions.schedule_bump(everything=True)
+
+
+@receiver(renditions_ready, sender=ProductMediaGallery)
+def bump_rendered_media_channels(sender, pk, **kwargs):
+    catalog_versions.schedule_bump(get_category_channel_ids(category__products__media=pk))
+
+
+@receiver(renditions_ready, sender=Additive)
+def bump_rendered_additive_channels(sender, pk, **kwargs):
+    catalog_versions.schedule_bump(get_category_channel_ids(category__products__additives__additive=pk))
+
+
+for model in INFO_MODELS:
+    post_save.connect(bump_info_store, sender=model, dispatch_uid=f'catalog_versions_{model.__name__}')
+    post_delete.connect(bump_info_store, sender=model, dispatch_uid=f'catalog_versions_delete_{model.__name__}')
+
+# No catalog model has a plain ManyToManyField today; links go through models
+# such as CategoryChannel. Any that is added is covered here.
+for model in CATALOG_MODELS:
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(bump_m2m, sender=field.remote_field.through, dispatch_uid=f'catalog_versions_m2m_{field}')
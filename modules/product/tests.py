@@ -1,3 +1,537 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from modules.channel.models import Channel
+from modules.store.models import Store
+from modules.store.registry import store_registry
+from . import renditions
+from .catalog_io import RECORD_TYPES, export_records, import_records, read_csv, read_jsonl, write_csv, write_jsonl
+from .choices import ProductStatus
+from .completeness import find_incomplete_products, set_products_status
+from .models import (
+    Additive,
+    AdditiveInfo,
+    Category,
+    CategoryChannel,
+    CategoryInfo,
+    Package,
+    PackageInfo,
+    Product,
+    ProductAdditive,
+    ProductExcludeChannel,
+    ProductInfo,
+    ProductMediaGallery,
+    ProductVariant,
+    ProductVariantInfo,
+)
+from .versions import catalog_versions
+
+
+class CatalogImportTests(TransactionTestCase):
+    """
+    Imports in chunks of two records, so every file spans several transactions.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        # The store migration creates it; TransactionTestCase flushes it after the first test.
+        self.store, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+        self.channel = Channel.objects.create(
+            code='main', name='Main', status='online', city='Warszawa', phone='1', base_language='en', currency='PLN',
+        )
+
+    def create_catalog(self) -> None:
+        category = Category.objects.create(code='pizza')
+        CategoryInfo.objects.create(category=category, store=self.store, name='Pizza')
+        CategoryChannel.objects.create(category=category, channel=self.channel)
+        package = Package.objects.create(code='box', price=Decimal('2.00'))
+        PackageInfo.objects.create(package=package, store=self.store, name='Box')
+        additive = Additive.objects.create(code='basil', price=Decimal('1.50'))
+        AdditiveInfo.objects.create(additive=additive, store=self.store, name='Basil')
+        product = Product.objects.create(sku='margherita', category=category, status=ProductStatus.online)
+        ProductInfo.objects.create(product=product, store=self.store, name='Margherita', description='Tomato')
+        for code, price in (('S', '20.00'), ('L', '28.00')):
+            variant = ProductVariant.objects.create(product=product, code=code, price=Decimal(price), package=package)
+            ProductVariantInfo.objects.create(product_variant=variant, store=self.store, name=code)
+        ProductAdditive.objects.create(product=product, additive=additive)
+
+    def export(self) -> str:
+        stream = io.StringIO()
+        write_jsonl(export_records(), stream)
+        return stream.getvalue()
+
+    def import_jsonl(self, content: str) -> tuple[dict, list[tuple[int, str]]]:
+        errors = []
+        counts, error_count = import_records(
+            read_jsonl(io.StringIO(content)), chunk_size=2, on_error=lambda *error: errors.append(error),
+        )
+        self.assertEqual(error_count, len(errors))
+        return dict(counts), errors
+
+    def test_round_trip(self):
+        self.create_catalog()
+        exported = self.export()
+        self.assertEqual(len(exported.splitlines()), 14)
+
+        Category.objects.all().delete()
+        Package.objects.all().delete()
+        Additive.objects.all().delete()
+        self.assertEqual(self.export(), '')
+
+        counts, errors = self.import_jsonl(exported)
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(counts.values()), 14)
+        self.assertEqual(self.export(), exported)
+        product = Product.objects.get()
+        self.assertEqual((product.min_price, product.max_price), (Decimal('20.00'), Decimal('28.00')))
+
+    def test_reimport_changes_nothing(self):
+        self.create_catalog()
+        exported = self.export()
+        models = [record_type.model for record_type in RECORD_TYPES.values()]
+        pks = {model: list(model.objects.values_list('pk', flat=True)) for model in models}
+
+        for _ in range(2):
+            counts, errors = self.import_jsonl(exported)
+            self.assertEqual(errors, [])
+            self.assertEqual(sum(counts.values()), 14)
+            self.assertEqual(self.export(), exported)
+            for model, model_pks in pks.items():
+                self.assertEqual(list(model.objects.values_list('pk', flat=True)), model_pks)
+
+    def test_update(self):
+        self.create_catalog()
+        records = [json.loads(line) for line in self.export().splitlines()]
+        variant = next(record for record in records if record['type'] == 'variant' and record['code'] == 'S')
+        variant['price'] = '18.00'
+
+        counts, errors = self.import_jsonl(json.dumps(variant))
+        self.assertEqual((counts, errors), ({'variant': 1}, []))
+        self.assertEqual(ProductVariant.objects.get(code='S').price, Decimal('18.00'))
+        self.assertEqual(Product.objects.get().min_price, Decimal('18.00'))
+
+    def test_bad_records_reported_by_line(self):
+        lines = [
+            {'type': 'category', 'code': 'pizza'},
+            'not json',
+            ['a', 'list'],
+            {'type': 'drink', 'code': 'cola'},
+            {'type': 'product', 'sku': 'margherita', 'category': 'pasta', 'status': ProductStatus.online},
+            {'type': 'product', 'sku': 'hawaii', 'status': ProductStatus.online},
+            {'type': 'package', 'code': 'box', 'price': 'free'},
+            {'type': 'product', 'sku': 'capricciosa', 'category': 'pizza', 'status': ProductStatus.online},
+        ]
+        content = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines) + '\n'
+
+        counts, errors = self.import_jsonl(content)
+        self.assertEqual(counts, {'category': 1, 'product': 1})
+        self.assertEqual([line_number for line_number, _ in errors], [2, 3, 4, 5, 6, 7])
+        messages = dict(errors)
+        self.assertIn('invalid JSON', messages[2])
+        self.assertEqual(messages[3], 'a record must be a JSON object')
+        self.assertEqual(messages[4], 'unknown record type "drink"')
+        self.assertEqual(messages[5], 'product: category pasta does not exist')
+        self.assertEqual(messages[6], 'product: missing category')
+        self.assertTrue(messages[7].startswith('package: price:'))
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['capricciosa'])
+
+    def test_csv_lines(self):
+        stream = io.StringIO()
+        write_csv([{'code': 'box', 'price': '2.00'}, {'code': 'bag', 'price': '-1'}], stream, 'package')
+
+        errors = []
+        counts, _ = import_records(
+            read_csv(io.StringIO(stream.getvalue()), 'package'), on_error=lambda *error: errors.append(error),
+        )
+        self.assertEqual(dict(counts), {'package': 1})
+        # The header is line 1.
+        self.assertEqual([line_number for line_number, _ in errors], [3])
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class ProductRefreshTests(TransactionTestCase):
+    """
+    Saves outside a transaction, like the admin does for inlines it does not
+    wrap, and from instances loaded before the change.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(code='pizza')
+        self.product = Product.objects.create(sku='margherita', category=category)
+        self.package = Package.objects.create(code='box', price=Decimal('2.00'))
+
+    def get_price_range(self) -> tuple:
+        return tuple(Product.objects.values_list('min_price', 'max_price').get(pk=self.product.pk))
+
+    def test_price_range(self, schedule_renditions):
+        for code, price in (('S', '20.00'), ('L', '28.00')):
+            ProductVariant.objects.create(product=self.product, code=code, price=Decimal(price), package=self.package)
+        large = ProductVariant.objects.get(code='L')
+        self.assertEqual(self.get_price_range(), (Decimal('20.00'), Decimal('28.00')))
+
+        large.price = Decimal('18.00')
+        large.save()
+        self.assertEqual(self.get_price_range(), (Decimal('18.00'), Decimal('20.00')))
+
+        ProductVariant.objects.filter(code='S').delete()
+        self.assertEqual(self.get_price_range(), (Decimal('18.00'), Decimal('18.00')))
+        large.delete()
+        self.assertEqual(self.get_price_range(), (None, None))
+
+    def test_stale_save_keeps_price_range(self, schedule_renditions):
+        stale = Product.objects.get(pk=self.product.pk)
+        ProductVariant.objects.create(product=self.product, code='S', price=Decimal('20.00'), package=self.package)
+
+        stale.status = ProductStatus.online
+        stale.save()
+        self.assertEqual(self.get_price_range(), (Decimal('20.00'), Decimal('20.00')))
+        self.assertEqual(Product.objects.get().status, ProductStatus.online)
+
+    def get_preview(self) -> tuple:
+        return tuple(Product.objects.values_list('preview_media', 'preview_image').get(pk=self.product.pk))
+
+    def test_preview_media(self, schedule_renditions):
+        back = ProductMediaGallery.objects.create(product=self.product, image='product_images/back.jpg', priority=1)
+        self.assertEqual(self.get_preview(), (back.pk, 'product_images/back.jpg'))
+        front = ProductMediaGallery.objects.create(product=self.product, image='product_images/front.jpg', priority=0)
+        self.assertEqual(self.get_preview(), (front.pk, 'product_images/front.jpg'))
+
+        front.priority = 2
+        front.save()
+        self.assertEqual(self.get_preview(), (back.pk, 'product_images/back.jpg'))
+        ProductMediaGallery.objects.all().delete()
+        self.assertEqual(self.get_preview(), (None, None))
+
+    def test_stale_save_keeps_preview_media(self, schedule_renditions):
+        stale = Product.objects.get(pk=self.product.pk)
+        media = ProductMediaGallery.objects.create(product=self.product, image='product_images/front.jpg')
+
+        stale.save()
+        self.assertEqual(self.get_preview(), (media.pk, 'product_images/front.jpg'))
+
+
+class RenditionUrlTests(SimpleTestCase):
+
+    @mock.patch.object(default_storage, 'exists', side_effect=AssertionError('no storage lookup'))
+    def test_url_from_rendered_image(self, exists):
+        name = 'product_images/front.jpg'
+        self.assertEqual(renditions.rendition_url(name, 'card'), default_storage.url(name))
+        old = 'product_images/old.jpg'
+        self.assertEqual(renditions.rendition_url(name, 'card', 'webp', old), default_storage.url(name))
+        self.assertEqual(
+            renditions.get_rendition_urls(name, 'card', name),
+            {
+                'webp': default_storage.url('renditions/card/product_images/front.jpg.webp'),
+                'jpeg': default_storage.url('renditions/card/product_images/front.jpg.jpeg'),
+            },
+        )
+        self.assertIsNone(renditions.rendition_url(None, 'card'))
+
+    def test_name_keeps_extension(self):
+        self.assertNotEqual(
+            renditions.get_rendition_name('product_images/front.jpg', 'card', 'webp'),
+            renditions.get_rendition_name('product_images/front.png', 'card', 'webp'),
+        )
+
+
+class RenditionWorkerTests(TransactionTestCase):
+    """
+    Runs the worker in the test thread, against a temporary MEDIA_ROOT.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=directory.name))
+        self.enterContext(mock.patch('modules.product.signals.schedule_renditions'))
+        self.product = Product.objects.create(sku='margherita', category=Category.objects.create(code='pizza'))
+
+    def save_image(self, name: str) -> str:
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 10), 'red').save(buffer, 'PNG')
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_worker_marks_renditions_ready(self):
+        name = self.save_image('product_images/front.png')
+        media = ProductMediaGallery.objects.create(product=self.product, image=name)
+        self.assertEqual(Product.objects.get().get_preview_media('card'), default_storage.url(name))
+
+        ready = mock.Mock()
+        renditions.renditions_ready.connect(ready, sender=ProductMediaGallery)
+        self.addCleanup(renditions.renditions_ready.disconnect, ready, sender=ProductMediaGallery)
+        renditions._run(ProductMediaGallery, media.pk, name)
+
+        ready.assert_called_once()
+        self.assertEqual(ProductMediaGallery.objects.get().rendered_image, name)
+        rendition_name = renditions.get_rendition_name(name, 'card', 'jpeg')
+        self.assertTrue(default_storage.exists(rendition_name))
+        self.assertEqual(Product.objects.get().get_preview_media('card'), default_storage.url(rendition_name))
+
+    def test_replaced_image_is_not_marked(self):
+        name = self.save_image('product_images/front.png')
+        back = self.save_image('product_images/back.png')
+        media = ProductMediaGallery.objects.create(product=self.product, image=back)
+        renditions._run(ProductMediaGallery, media.pk, name)
+        self.assertIsNone(ProductMediaGallery.objects.get().rendered_image)
+
+
+class AdminChangelistTests(TransactionTestCase):
+    """
+    Changelists showing the names of the active store's info rows, annotated
+    on the queryset rather than read per row.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.store, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+        self.other_store = Store.objects.create(code='pl', name='PL')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.categories = []
+        for code, name in (('pizza', 'Pizza'), ('drinks', 'Drinks')):
+            category = Category.objects.create(code=code)
+            CategoryInfo.objects.create(category=category, store=self.store, name=name)
+            CategoryInfo.objects.create(category=category, store=self.other_store, name=f'{name} PL')
+            self.categories.append(category)
+
+    def create_products(self, count: int, start: int = 0) -> None:
+        for index in range(count):
+            product = Product.objects.create(sku=f'sku-{start + index}', category=self.categories[index % 2])
+            ProductInfo.objects.create(product=product, store=self.store, name=f'Name {count - index}', description='')
+
+    def get_changelist(self, model: type, **params):
+        response = self.client.get(reverse(f'admin:product_{model._meta.model_name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def count_queries(self) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            self.get_changelist(Product)
+        return len(queries)
+
+    def test_product_names(self):
+        self.create_products(3)
+        ProductInfo.objects.filter(product__sku='sku-2').update(store=self.other_store)
+        changelist = self.get_changelist(Product)
+        rows = {product.sku: (product.translated_name, product.category_name) for product in changelist.result_list}
+        self.assertEqual(rows, {
+            'sku-0': ('Name 3', 'Pizza'),
+            'sku-1': ('Name 2', 'Drinks'),
+            'sku-2': (None, 'Pizza'),
+        })
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_products(2)
+        # Loads the store registry first.
+        self.get_changelist(Product)
+        few = self.count_queries()
+        self.create_products(10, start=2)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_ordering_by_name(self):
+        self.create_products(4)
+        # The second list_display column, name_from_info.
+        changelist = self.get_changelist(Product, o='2')
+        self.assertEqual([product.sku for product in changelist.result_list], ['sku-3', 'sku-2', 'sku-1', 'sku-0'])
+
+    def test_category_changelist_and_filter(self):
+        changelist = self.get_changelist(Category, o='3')
+        self.assertEqual([category.translated_name for category in changelist.result_list], ['Drinks', 'Pizza'])
+
+        changelist = self.get_changelist(Product)
+        [category_filter] = [item for item in changelist.filter_specs if item.field_path == 'category']
+        self.assertEqual(category_filter.lookup_choices, [
+            (self.categories[1].pk, 'Drinks'), (self.categories[0].pk, 'Pizza'),
+        ])
+
+
+class PublishProductsTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.store, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+        self.other_store = Store.objects.create(code='pl', name='PL')
+        category = Category.objects.create(code='pizza')
+        package = Package.objects.create(code='box', price=Decimal('2.00'))
+        self.products = {}
+        for sku, info_stores, variants in (
+            ('complete', 'both', {'S': 'both'}),
+            ('untranslated', 'default', {'S': 'both'}),
+            ('no-variants', 'both', {}),
+            ('untranslated-variant', 'both', {'S': 'both', 'L': 'default'}),
+        ):
+            product = Product.objects.create(sku=sku, category=category)
+            for store in self.get_stores(info_stores):
+                ProductInfo.objects.create(product=product, store=store, name=sku, description='')
+            for code, variant_stores in variants.items():
+                variant = ProductVariant.objects.create(
+                    product=product, code=code, price=Decimal('10.00'), package=package,
+                )
+                for store in self.get_stores(variant_stores):
+                    ProductVariantInfo.objects.create(product_variant=variant, store=store, name=code)
+            self.products[sku] = product
+
+    def get_stores(self, which: str) -> list[Store]:
+        return [self.store, self.other_store] if which == 'both' else [self.store]
+
+    def statuses(self) -> dict[str, str]:
+        return dict(Product.objects.values_list('sku', 'status'))
+
+    def test_find_incomplete_products(self):
+        store_registry.all()
+        # Two per store, plus the products without variants.
+        with self.assertNumQueries(5):
+            report = find_incomplete_products()
+        self.assertEqual(report, {
+            self.products['untranslated'].pk: ['missing ProductInfo for: PL'],
+            self.products['no-variants'].pk: ['has no variants'],
+            self.products['untranslated-variant'].pk: ['missing ProductVariantInfo of variant L for: PL'],
+        })
+        self.assertEqual(find_incomplete_products(Product.objects.filter(sku='complete')), {})
+
+    def test_set_products_status(self):
+        updated_ids, skipped = set_products_status(Product.objects.all(), ProductStatus.online)
+        self.assertEqual(updated_ids, [self.products['complete'].pk])
+        self.assertEqual(len(skipped), 3)
+        self.assertEqual(self.statuses()['complete'], ProductStatus.online)
+        self.assertEqual(Product.objects.filter(status=ProductStatus.online).count(), 1)
+
+        # Publishing again updates nothing; unpublishing skips nothing.
+        self.assertEqual(set_products_status(Product.objects.all(), ProductStatus.online)[0], [])
+        updated_ids, skipped = set_products_status(Product.objects.all(), ProductStatus.offline)
+        self.assertEqual((updated_ids, skipped), ([self.products['complete'].pk], {}))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('publish_products', '--all', '--dry-run', stdout=out)
+        self.assertEqual(set(self.statuses().values()), {ProductStatus.offline})
+        self.assertIn('1 product(s) set to "online", 3 skipped.', out.getvalue())
+
+        out = io.StringIO()
+        call_command('publish_products', '--sku=complete', '--sku=no-variants', stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0], 'no-variants: has no variants')
+        self.assertEqual(self.statuses()['complete'], ProductStatus.online)
+
+        with self.assertRaises(CommandError):
+            call_command('publish_products')
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        response = self.client.post(reverse('admin:product_product_changelist'), {
+            'action': 'publish',
+            '_selected_action': [product.pk for product in self.products.values()],
+        }, follow=True)
+        messages = [str(message) for message in response.context['messages']]
+        self.assertEqual(messages[0], '1 product(s) set to "online".')
+        self.assertIn('Skipped no-variants: has no variants', messages)
+        self.assertEqual(self.statuses()['complete'], ProductStatus.online)
+
+
+@mock.patch('modules.product.signals.schedule_renditions')
+class CatalogVersionTests(TransactionTestCase):
+    """
+    Saves outside a transaction, where the bumps run as soon as they are scheduled.
+    """
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        self.store, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+        self.other_store = Store.objects.create(code='pl', name='PL')
+        self.channel, self.other_channel = (
+            Channel.objects.create(
+                code=code, name=code, status='online', city='Warszawa', phone='1', base_language='en', currency='PLN',
+            )
+            for code in ('main', 'other')
+        )
+        self.pizza, self.drinks = Category.objects.create(code='pizza'), Category.objects.create(code='drinks')
+        CategoryChannel.objects.create(category=self.pizza, channel=self.channel)
+        CategoryChannel.objects.create(category=self.drinks, channel=self.other_channel)
+        self.product = Product.objects.create(sku='margherita', category=self.pizza)
+        self.package = Package.objects.create(code='box', price=Decimal('2.00'))
+        self.variant = ProductVariant.objects.create(
+            product=self.product, code='S', price=Decimal('20.00'), package=self.package,
+        )
+        self.additive = Additive.objects.create(code='basil', price=Decimal('1.00'))
+        ProductAdditive.objects.create(product=self.product, additive=self.additive)
+        self.media = ProductMediaGallery.objects.create(product=self.product, image='product_images/front.jpg')
+
+    def versions(self) -> dict[str, str]:
+        return {
+            'main': catalog_versions.get(self.channel.pk),
+            'other': catalog_versions.get(self.other_channel.pk),
+            'en': catalog_versions.get(store_id=self.store.pk),
+            'pl': catalog_versions.get(store_id=self.other_store.pk),
+        }
+
+    def assertBumps(self, change, expected: set[str]) -> None:
+        before = self.versions()
+        change()
+        after = self.versions()
+        self.assertEqual({name for name in before if before[name] != after[name]}, expected)
+
+    def test_channel_models(self, schedule_renditions):
+        self.assertBumps(self.product.save, {'main'})
+        self.assertBumps(self.variant.save, {'main'})
+        self.assertBumps(self.package.save, {'main'})
+        self.assertBumps(self.additive.save, {'main'})
+        self.assertBumps(self.media.save, {'main'})
+        self.assertBumps(self.pizza.save, {'main'})
+        self.assertBumps(self.drinks.save, {'other'})
+        self.assertBumps(self.other_channel.save, {'other'})
+        self.assertBumps(
+            lambda: ProductExcludeChannel.objects.create(product=self.product, channel=self.other_channel), {'other'},
+        )
+        self.assertBumps(
+            lambda: CategoryChannel.objects.create(category=self.pizza, channel=self.other_channel), {'other'},
+        )
+
+    def test_moving_a_product_bumps_both_categories(self, schedule_renditions):
+        self.product.category = self.drinks
+        self.assertBumps(self.product.save, {'main', 'other'})
+        self.assertBumps(self.product.delete, {'other'})
+
+    def test_store_models(self, schedule_renditions):
+        self.assertBumps(
+            lambda: ProductInfo.objects.create(product=self.product, store=self.other_store, name='M', description=''),
+            {'pl'},
+        )
+        self.assertBumps(lambda: CategoryInfo.objects.create(category=self.drinks, store=self.store, name='D'), {'en'})
+        self.assertBumps(self.other_store.save, {'pl'})
+
+    def test_renditions_ready(self, schedule_renditions):
+        self.assertBumps(lambda: renditions.renditions_ready.send(ProductMediaGallery, pk=self.media.pk), {'main'})
+        self.assertBumps(lambda: renditions.renditions_ready.send(Additive, pk=self.additive.pk), {'main'})
+
+    def test_bumped_once_after_commit(self, schedule_renditions):
+        before = self.versions()
+
+        def change():
+            self.product.save()
+            self.variant.save()
+            self.assertEqual(self.versions(), before)
+
+        with transaction.atomic():
+            change()
+        channel_version = catalog_versions.get(self.channel.pk).split('.')
+        self.assertEqual(int(channel_version[1]), int(before['main'].split('.')[1]) + 1)
+
+    def test_bump_all(self, schedule_renditions):
+        self.assertBumps(catalog_versions.bump_all, {'main', 'other', 'en', 'pl'})
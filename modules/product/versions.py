@@ -0,0 +1,82 @@
+import threading
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+from modules.base.cache import bump_version, get_version
+from .models import CategoryChannel
+
+_pending = threading.local()
+
+
+class CatalogVersions:
+    """
+    Version numbers of what a channel sells (per channel) and of the texts shown
+    in a store (per store), kept in the default cache and bumped on commit by
+    the catalog signals. A cache key built from get() changes whenever anything
+    it depends on changes, so stale entries are never looked up again.
+    """
+    global_key = 'catalog:version'
+
+    def channel_key(self, channel_id: int) -> str:
+        return f'catalog:version:channel:{channel_id}'
+
+    def store_key(self, store_id: int) -> str:
+        return f'catalog:version:store:{store_id}'
+
+    def get(self, channel_id: Optional[int] = None, store_id: Optional[int] = None) -> str:
+        keys = [self.global_key]
+        if channel_id is not None:
+            keys.append(self.channel_key(channel_id))
+        if store_id is not None:
+            keys.append(self.store_key(store_id))
+
+        versions = cache.get_many(keys)
+        return '.'.join(str(versions[key] if key in versions else get_version(key)) for key in keys)
+
+    def bump(self, channel_ids: Iterable[int] = (), store_ids: Iterable[int] = ()) -> None:
+        for channel_id in set(channel_ids):
+            bump_version(self.channel_key(channel_id))
+        for store_id in set(store_ids):
+            bump_version(self.store_key(store_id))
+
+    def bump_all(self) -> None:
+        """
+        Invalidates every channel and store at once, e.g. after a bulk write that
+        sent no signals.
+        """
+        bump_version(self.global_key)
+
+    def _flush_pending(self) -> None:
+        everything = _pending.__dict__.pop('everything', False)
+        channel_ids = _pending.__dict__.pop('channel_ids', set())
+        store_ids = _pending.__dict__.pop('store_ids', set())
+        if everything:
+            self.bump_all()
+        else:
+            self.bump(channel_ids, store_ids)
+
+    def schedule_bump(
+        self, channel_ids: Iterable[int] = (), store_ids: Iterable[int] = (), everything: bool = False
+    ) -> None:
+        """
+        Collects the channels and stores touched by the current transaction and
+        bumps each of them once, after commit.
+        """
+        _pending.__dict__.setdefault('channel_ids', set()).update(channel_ids)
+        _pending.__dict__.setdefault('store_ids', set()).update(store_ids)
+        if everything:
+            _pending.everything = True
+        transaction.on_commit(self._flush_pending)
+
+
+catalog_versions = CatalogVersions()
+
+
+def get_category_channel_ids(**lookups) -> list[int]:
+    """
+    Channels selling the categories matched by `lookups`, e.g.
+    get_category_channel_ids(category__products=product_id).
+    """
+    return list(CategoryChannel.objects.filter(**lookups).values_list('channel_id', flat=True).distinct())
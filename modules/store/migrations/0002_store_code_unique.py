@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+from modules.base.migration_checks import require_unique
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(require_unique('store', {'Store': [('code',)]}), migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='store',
+            name='code',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 
 
 class Store(models.Model):
-    code = models.CharField(max_length=255, db_index=True)
+    code = models.CharField(max_length=255, unique=True)
     name = models.CharField(max_length=255)
     is_default = models.BooleanField(default=False)
     
@@ -17,7 +17,6 @@ class Store(models.Model):
 
     @classmethod
     def get_by_code_or_default(cls, code):
-        store = cls.objects.filter(code=code).first()
-        if not store:
-            store = cls.objects.filter(is_default=True).first()
-        return store
+        from .registry import store_registry
+
+        return store_registry.get_by_code_or_default(code)
@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+from modules.base.cache import bump_version, get_version
+from modules.base.routers import read_from_primary
+from .models import Store
+
+
+class StoreRegistry:
+    version_key = 'store:registry:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._by_id = {}
+        self._by_code = {}
+        self._default = None
+
+    def _load(self, version: int) -> None:
+        by_id, by_code, default = {}, {}, None
+        # Kept until the next invalidation, so never loaded from a lagging replica.
+        with read_from_primary():
+            stores = list(Store.objects.order_by('pk'))
+        for store in stores:
+            by_id[store.pk] = store
+            by_code.setdefault(store.code, store)
+            if store.is_default and default is None:
+                default = store
+        self._by_id, self._by_code, self._default = by_id, by_code, default
+        self._version = version
+
+    def _ensure_loaded(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < settings.STORE_REGISTRY_CHECK_INTERVAL:
+            return
+
+        version = get_version(self.version_key)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+        self._checked_at = now
+
+    def all(self) -> list[Store]:
+        self._ensure_loaded()
+        return list(self._by_id.values())
+
+    def get(self, pk: int) -> Optional[Store]:
+        self._ensure_loaded()
+        return self._by_id.get(pk)
+
+    def get_by_code_or_default(self, code: Optional[str]) -> Optional[Store]:
+        self._ensure_loaded()
+        return self._by_code.get(code) or self._default
+
+    def invalidate(self) -> None:
+        bump_version(self.version_key)
+        self._version = None
+
+
+store_registry = StoreRegistry()
@@ -0,0 +1,11 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Store
+from .registry import store_registry
+
+
+@receiver([post_save, post_delete], sender=Store)
+def invalidate_store_registry(sender, **kwargs):
+    transaction.on_commit(store_registry.invalidate)
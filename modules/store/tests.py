@@ -1,3 +1,55 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
 
-# Create your tests here.
+from .models import Store
+from .registry import StoreRegistry, store_registry
+
+
+class StoreRegistryTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        store_registry.invalidate()
+        # The store migration creates it; TransactionTestCase flushes it after the first test.
+        self.english, _ = Store.objects.get_or_create(code='en', defaults={'name': 'EN', 'is_default': True})
+
+    def test_lookups(self):
+        polish = Store.objects.create(code='pl', name='PL')
+        self.assertEqual(store_registry.get_by_code_or_default('pl'), polish)
+        self.assertEqual(store_registry.get_by_code_or_default('de'), self.english)
+        self.assertEqual(store_registry.get_by_code_or_default(None), self.english)
+        self.assertEqual(store_registry.get(polish.pk), polish)
+        self.assertIsNone(store_registry.get(polish.pk + 1))
+        self.assertEqual(store_registry.all(), [self.english, polish])
+
+    def test_loaded_once(self):
+        store_registry.all()
+        with self.assertNumQueries(0):
+            store_registry.get_by_code_or_default('en')
+            store_registry.all()
+
+    def test_save_and_delete_invalidate_after_commit(self):
+        store_registry.all()
+        with transaction.atomic():
+            polish = Store.objects.create(code='pl', name='PL')
+            self.assertEqual(store_registry.get_by_code_or_default('pl'), self.english)
+        self.assertEqual(store_registry.get_by_code_or_default('pl'), polish)
+
+        polish.name = 'Polski'
+        polish.save()
+        self.assertEqual(store_registry.get(polish.pk).name, 'Polski')
+
+        polish.delete()
+        self.assertEqual(store_registry.get_by_code_or_default('pl'), self.english)
+
+    def test_invalidation_reaches_other_registries(self):
+        other = StoreRegistry()
+        self.assertEqual(other.get_by_code_or_default('en').name, self.english.name)
+        # A write the signals do not see, then another process invalidates.
+        Store.objects.filter(pk=self.english.pk).update(name='Renamed')
+        store_registry.invalidate()
+        # Within the check interval, the version is not read again.
+        self.assertEqual(other.get_by_code_or_default('en').name, self.english.name)
+        with override_settings(STORE_REGISTRY_CHECK_INTERVAL=0):
+            self.assertEqual(other.get_by_code_or_default('en').name, 'Renamed')
@@ -1,3 +1,184 @@
+const productDetails = new Map(); // Кэш данных продуктов текущей категории
+
+function fetchProduct(productId) {
+    if (productDetails.has(productId)) {
+        return Promise.resolve(productDetails.get(productId));
+    }
+    return fetch(`/product/${productId}/`)
+        .then(response => response.json())
+        .then(data => {
+            productDetails.set(productId, data);
+            return data;
+        });
+}
+
+// Загружаем данные всех продуктов категории одним запросом, когда браузер простаивает
+function prefetchCategory() {
+    const grid = document.getElementById('productGrid');
+    if (!grid || !grid.dataset.category) {
+        return;
+    }
+
+    const params = new URLSearchParams({channel: grid.dataset.channel, category: grid.dataset.category});
+    fetch(`/products/?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            Object.entries(data.products).forEach(([productId, product]) => {
+                productDetails.set(productId, product);
+            });
+        })
+        .catch(error => console.error('Error prefetching products:', error));
+}
+
+// Итоговую цену считает сервер по тем же ценам, что и при оформлении заказа
+function fetchQuote(channelId, line) {
+    return fetch(`/${channelId}/quote/`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({items: [line]}),
+    }).then(response => response.ok ? response.json() : Promise.reject(response.status));
+}
+
+let quoteRequest = 0; // Номер последнего запроса цены, устаревшие ответы игнорируем
+
+function showProduct(data) {
+    let basePrice = data.variants.length > 0 ? parseFloat(data.variants[0].price) : 0;
+    let selectedVariant = data.variants.length > 0 ? data.variants[0] : null;
+    let selectedExtras = new Set(); // Храним выбранные ингредиенты
+    const selectedExtraCodes = new Set();
+
+    // Обновляем заголовок и описание
+    document.getElementById('productModalLabel').textContent = data.name;
+    document.getElementById('productName').textContent = data.name;
+    document.getElementById('productDescription').textContent = data.description;
+
+    // Обновляем цену (по умолчанию первый размер)
+    const priceElement = document.getElementById('productPrice');
+    priceElement.textContent = `${basePrice.toFixed(2)} ${data.currency}`;
+    priceElement.classList.remove('text-secondary');
+    priceElement.classList.add('text-primary');
+
+    // Обновляем карусель изображений
+    const carouselInner = document.querySelector('.carousel-inner');
+    carouselInner.innerHTML = '';
+
+    if (data.images.length > 0) {
+        data.images.forEach((url, index) => {
+            const rendition = data.image_renditions[index];
+            const item = document.createElement('div');
+            item.className = `carousel-item ${index === 0 ? 'active' : ''}`;
+            item.innerHTML = `
+                <picture>
+                    <source srcset="${rendition.webp}" type="image/webp">
+                    <img src="${rendition.jpeg || url}" class="d-block w-100 rounded" alt="Product Image">
+                </picture>
+            `;
+            carouselInner.appendChild(item);
+        });
+    } else {
+        carouselInner.innerHTML = `
+            <div class="carousel-item active">
+                <img src="https://via.placeholder.com/300" class="d-block w-100 rounded" alt="No Image Available">
+            </div>
+        `;
+    }
+
+    // Обновляем размеры продукта
+    const sizeContainer = document.getElementById('productSizes');
+    sizeContainer.innerHTML = '';
+    data.variants.forEach((variant, index) => {
+        const button = document.createElement('button');
+        button.className = `btn btn-outline-primary size-btn ${index === 0 ? 'active' : ''}`;
+        button.textContent = variant.code;
+        button.dataset.price = variant.price;
+
+        button.addEventListener('click', () => {
+            basePrice = parseFloat(variant.price);
+            selectedVariant = variant;
+            updateTotalPrice();
+            document.querySelectorAll('.size-btn').forEach(btn => btn.classList.remove('active'));
+            button.classList.add('active');
+        });
+
+        sizeContainer.appendChild(button);
+    });
+
+    // Обновляем ингредиенты
+    const ingredientsRow = document.getElementById('productIngredients');
+    ingredientsRow.innerHTML = '';
+    data.ingredients.forEach(ingredient => {
+        const col = document.createElement('div');
+        col.className = 'ingredient';
+        col.innerHTML = `
+            <img src="${ingredient.thumbnail ? ingredient.thumbnail.jpeg : (ingredient.image || 'https://via.placeholder.com/80')}" class="img-thumbnail" alt="${ingredient.name}">
+            <p class="small">${ingredient.name}</p>
+            <span class="price-badge btn btn-outline-primary" data-price="${ingredient.price}">
+                +${ingredient.price} ${data.currency}
+            </span>
+        `;
+        const priceBadge = col.querySelector('.price-badge');
+        col.addEventListener('click', function () {
+            if (selectedExtras.has(ingredient.name)) {
+                selectedExtras.delete(ingredient.name);
+                selectedExtraCodes.delete(ingredient.code);
+                col.classList.remove('selected');
+                priceBadge.classList.remove('btn-primary', 'text-white');
+                priceBadge.classList.add('btn-outline-primary');
+            } else {
+                selectedExtras.add(ingredient.name);
+                selectedExtraCodes.add(ingredient.code);
+                col.classList.add('selected');
+                priceBadge.classList.add('btn-primary', 'text-white');
+                priceBadge.classList.remove('btn-outline-primary');
+            }
+            updateTotalPrice();
+        });
+        ingredientsRow.appendChild(col);
+    });
+
+    // Функция для обновления цены
+    function updateTotalPrice() {
+        let totalPrice = basePrice;
+        document.querySelectorAll('.ingredient.selected .price-badge').forEach(el => {
+            totalPrice += parseFloat(el.dataset.price);
+        });
+        priceElement.textContent = `${totalPrice.toFixed(2)} ${data.currency}`;
+
+        const grid = document.getElementById('productGrid');
+        if (!data.sku || !selectedVariant || !grid || !grid.dataset.channel) {
+            return;
+        }
+        const requestId = ++quoteRequest;
+        fetchQuote(grid.dataset.channel, {
+            sku: data.sku,
+            variant: selectedVariant.code,
+            additives: [...selectedExtraCodes].filter(Boolean),
+            qty: 1,
+        })
+            .then(quote => {
+                if (requestId === quoteRequest) {
+                    priceElement.textContent = `${parseFloat(quote.total).toFixed(2)} ${quote.currency}`;
+                }
+            })
+            .catch(error => console.error('Error fetching quote:', error));
+    }
+
+    updateTotalPrice();
+
+    // Добавление в корзину
+    document.getElementById('addToCartBtn').onclick = () => {
+        console.log("Добавлено в корзину:", {
+            product: data.name,
+            size: document.querySelector('.size-btn.active').textContent,
+            ingredients: [...selectedExtras],
+            totalPrice: `${priceElement.textContent}`
+        });
+    };
+
+    // Открываем модальное окно
+    new bootstrap.Modal(document.getElementById('productModal')).show();
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     document.querySelectorAll('.card').forEach(card => {
         card.addEventListener('click', function (event) {
@@ -5,115 +186,15 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const productId = this.closest('a').dataset.id;
 
-            fetch(`/product/${productId}/`)
-                .then(response => response.json())
-                .then(data => {
-                    let basePrice = data.variants.length > 0 ? parseFloat(data.variants[0].price) : 0;
-                    let selectedExtras = new Set(); // Храним выбранные ингредиенты
-
-                    // Обновляем заголовок и описание
-                    document.getElementById('productModalLabel').textContent = data.name;
-                    document.getElementById('productName').textContent = data.name;
-                    document.getElementById('productDescription').textContent = data.description;
-
-                    // Обновляем цену (по умолчанию первый размер)
-                    const priceElement = document.getElementById('productPrice');
-                    priceElement.textContent = `${basePrice.toFixed(2)} ${data.currency}`;
-                    priceElement.classList.remove('text-secondary');
-                    priceElement.classList.add('text-primary');
-
-                    // Обновляем карусель изображений
-                    const carouselInner = document.querySelector('.carousel-inner');
-                    carouselInner.innerHTML = '';
-
-                    if (data.images.length > 0) {
-                        data.images.forEach((url, index) => {
-                            const item = document.createElement('div');
-                            item.className = `carousel-item ${index === 0 ? 'active' : ''}`;
-                            item.innerHTML = `<img src="${url}" class="d-block w-100 rounded" alt="Product Image">`;
-                            carouselInner.appendChild(item);
-                        });
-                    } else {
-                        carouselInner.innerHTML = `
-                            <div class="carousel-item active">
-                                <img src="https://via.placeholder.com/300" class="d-block w-100 rounded" alt="No Image Available">
-                            </div>
-                        `;
-                    }
-
-                    // Обновляем размеры продукта
-                    const sizeContainer = document.getElementById('productSizes');
-                    sizeContainer.innerHTML = '';
-                    data.variants.forEach((variant, index) => {
-                        const button = document.createElement('button');
-                        button.className = `btn btn-outline-primary size-btn ${index === 0 ? 'active' : ''}`;
-                        button.textContent = variant.code;
-                        button.dataset.price = variant.price;
-
-                        button.addEventListener('click', () => {
-                            basePrice = parseFloat(variant.price);
-                            updateTotalPrice();
-                            document.querySelectorAll('.size-btn').forEach(btn => btn.classList.remove('active'));
-                            button.classList.add('active');
-                        });
-
-                        sizeContainer.appendChild(button);
-                    });
-
-                    // Обновляем ингредиенты
-                    const ingredientsRow = document.getElementById('productIngredients');
-                    ingredientsRow.innerHTML = '';
-                    data.ingredients.forEach(ingredient => {
-                        const col = document.createElement('div');
-                        col.className = 'ingredient';
-                        col.innerHTML = `
-                            <img src="${ingredient.image || 'https://via.placeholder.com/80'}" class="img-thumbnail" alt="${ingredient.name}">
-                            <p class="small">${ingredient.name}</p>
-                            <span class="price-badge btn btn-outline-primary" data-price="${ingredient.price}">
-                                +${ingredient.price} ${data.currency}
-                            </span>
-                        `;
-                        const priceBadge = col.querySelector('.price-badge');
-                        col.addEventListener('click', function () {
-                            if (selectedExtras.has(ingredient.name)) {
-                                selectedExtras.delete(ingredient.name);
-                                col.classList.remove('selected');
-                                priceBadge.classList.remove('btn-primary', 'text-white');
-                                priceBadge.classList.add('btn-outline-primary');
-                            } else {
-                                selectedExtras.add(ingredient.name);
-                                col.classList.add('selected');
-                                priceBadge.classList.add('btn-primary', 'text-white');
-                                priceBadge.classList.remove('btn-outline-primary');
-                            }
-                            updateTotalPrice();
-                        });
-                        ingredientsRow.appendChild(col);
-                    });
-
-                    // Функция для обновления цены
-                    function updateTotalPrice() {
-                        let totalPrice = basePrice;
-                        document.querySelectorAll('.ingredient.selected .price-badge').forEach(el => {
-                            totalPrice += parseFloat(el.dataset.price);
-                        });
-                        priceElement.textContent = `${totalPrice.toFixed(2)} ${data.currency}`;
-                    }
-
-                    // Добавление в корзину
-                    document.getElementById('addToCartBtn').onclick = () => {
-                        console.log("Добавлено в корзину:", {
-                            product: data.name,
-                            size: document.querySelector('.size-btn.active').textContent,
-                            ingredients: [...selectedExtras],
-                            totalPrice: `${priceElement.textContent}`
-                        });
-                    };
-
-                    // Открываем модальное окно
-                    new bootstrap.Modal(document.getElementById('productModal')).show();
-                })
+            fetchProduct(productId)
+                .then(showProduct)
                 .catch(error => console.error('Error fetching product data:', error));
         });
     });
+
+    if ('requestIdleCallback' in window) {
+        requestIdleCallback(prefetchCategory);
+    } else {
+        setTimeout(prefetchCategory, 1000);
+    }
 });